@@ -0,0 +1,109 @@
+import asyncio
+import random
+import time
+from collections import deque
+
+
+def percentyl(wartosci: list[float], p: float) -> float:
+    if not wartosci:
+        return 0.0
+    posortowane = sorted(wartosci)
+    idx = min(int(round(p / 100 * (len(posortowane) - 1))), len(posortowane) - 1)
+    return posortowane[idx]
+
+
+class AdaptiveLimiter:
+    """
+    Limiter współbieżności AIMD (jak kontrola przeciążenia w TCP).
+
+    - po udanym zapytaniu limit rośnie addytywnie (+increase na „rundę” limit zapytań),
+    - gdy w oknie rośnie odsetek błędów albo p90 opóźnienia przekracza target_latency_s,
+      limit maleje multiplikatywnie (×decrease), najwyżej raz na cooldown_s; po cięciu
+      okno jest czyszczone i kolejne cięcie wymaga „rundy” nowych pomiarów (limit zapytań),
+    - Retry-After z odpowiedzi 429/503 wstrzymuje wydawanie nowych slotów.
+    """
+
+    def __init__(self, initial: int = 16, min_limit: int = 1, max_limit: int = 100,
+                 increase: float = 1.0, decrease: float = 0.5, target_latency_s: float = 3.0,
+                 error_threshold: float = 0.1, window: int = 50, cooldown_s: float = 1.0):
+        self.limit = float(min(max(initial, min_limit), max_limit))
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.increase = increase
+        self.decrease = decrease
+        self.target_latency_s = target_latency_s
+        self.error_threshold = error_threshold
+        self.cooldown_s = cooldown_s
+        self.in_flight = 0
+        self._cond = asyncio.Condition()
+        self._okno: deque[tuple[float, bool]] = deque(maxlen=window)
+        self._latencje: deque[float] = deque(maxlen=1000)
+        self._ostatnie_ciecie = 0.0
+        self._pauza_do = 0.0
+        self.stats = {"zapytania": 0, "bledy": 0, "ciecia": 0, "retry_after": 0, "max_limit_osiagniety": self.limit}
+
+    @property
+    def current_limit(self) -> int:
+        return max(int(self.limit), self.min_limit)
+
+    async def acquire(self):
+        while True:
+            pauza = self._pauza_do - time.monotonic()
+            if pauza > 0:
+                await asyncio.sleep(pauza)
+                continue
+            async with self._cond:
+                if self.in_flight < self.current_limit:
+                    self.in_flight += 1
+                    return
+                await self._cond.wait()
+
+    async def release(self, latency_s: float, ok: bool, retry_after_s: float | None = None):
+        """Zwalnia slot i aktualizuje limit na podstawie wyniku zapytania."""
+        async with self._cond:
+            self.in_flight -= 1
+            self.stats["zapytania"] += 1
+            self._okno.append((latency_s, ok))
+            self._latencje.append(latency_s)
+            if not ok:
+                self.stats["bledy"] += 1
+            if retry_after_s:
+                self.stats["retry_after"] += 1
+                self._pauza_do = max(self._pauza_do, time.monotonic() + retry_after_s)
+
+            bledy = sum(1 for _, sukces in self._okno if not sukces) / len(self._okno)
+            p90 = percentyl([lat for lat, _ in self._okno], 90)
+            przeciazenie = (not ok and bledy > self.error_threshold) or p90 > self.target_latency_s or retry_after_s
+            # Pomiary sprzed cięcia już je spowodowały – następne tylko na podstawie nowych (poza Retry-After)
+            nowe_pomiary = retry_after_s or len(self._okno) >= min(self.current_limit, self._okno.maxlen)
+            teraz = time.monotonic()
+            if przeciazenie:
+                if nowe_pomiary and teraz - self._ostatnie_ciecie >= self.cooldown_s:
+                    self.limit = max(self.min_limit, self.limit * self.decrease)
+                    self._ostatnie_ciecie = teraz
+                    self._okno.clear()
+                    self.stats["ciecia"] += 1
+            elif ok:
+                self.limit = min(self.max_limit, self.limit + self.increase / self.limit)
+                self.stats["max_limit_osiagniety"] = max(self.stats["max_limit_osiagniety"], self.limit)
+            self._cond.notify_all()
+
+    def backoff_s(self, attempt: int, retry_after_s: float | None = None,
+                  base_s: float = 0.5, cap_s: float = 30.0) -> float:
+        """Czas oczekiwania przed ponowieniem: Retry-After albo wykładniczy z pełnym jitterem."""
+        if retry_after_s:
+            return retry_after_s + random.uniform(0, min(1.0, retry_after_s * 0.1))
+        return random.uniform(0, min(cap_s, base_s * 2 ** attempt))
+
+    def percentyle_latencji(self) -> dict[str, float]:
+        lat = list(self._latencje)
+        return {f"p{p}": round(percentyl(lat, p), 3) for p in (50, 90, 99)}
+
+    def raport(self) -> str:
+        p = self.percentyle_latencji()
+        s = self.stats
+        return (
+            f"⚙️ AIMD: limit {self.current_limit} (maks. {int(s['max_limit_osiagniety'])}), "
+            f"zapytania {s['zapytania']}, błędy {s['bledy']}, cięcia {s['ciecia']}, "
+            f"Retry-After {s['retry_after']}, latencja p50 {p['p50']} s / p90 {p['p90']} s / p99 {p['p99']} s"
+        )
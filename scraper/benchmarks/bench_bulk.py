@@ -0,0 +1,77 @@
+"""
+Benchmark zapisu wsadowego: dotychczasowe batche po N wierszy wysyłane po kolei
+vs BulkWriter (batche po bajtach, kilka w locie, dzielenie batchy z błędem).
+
+Zamiast bazy – symulowany serwer: każde zapytanie kosztuje RTT + rozmiar/przepustowość,
+a wiersze z "zly": True powodują błąd całego batcha (jak naruszenie ograniczenia w Postgres).
+
+Użycie: python -m scraper.benchmarks.bench_bulk [--wiersze N] [--rtt-ms MS] [--bledne N]
+"""
+import argparse
+import contextlib
+import io
+import json
+import random
+import time
+
+from scraper.bulk_writer import BulkWriter
+
+
+def serwer(rtt_s: float, bajty_na_s: float):
+    zapisane = []
+
+    def wyslij(batch):
+        cialo = json.dumps(batch, default=str)
+        time.sleep(rtt_s + len(cialo) / bajty_na_s)
+        if any(r.get("zly") for r in batch):
+            raise RuntimeError("violates check constraint")
+        zapisane.extend(batch)
+
+    return wyslij, zapisane
+
+
+def wiersze(n: int, bledne: int):
+    rng = random.Random(0)
+    zle = set(rng.sample(range(n), bledne))
+    return [{
+        "uid": f"uid-{i}", "przedmiot": "Przedmiot " * rng.randint(1, 8), "od": "2025-03-01T08:00:00",
+        "do_": "2025-03-01T09:30:00", "rz": "W", "miejsce": "A-29 s. 10", "grupa_id": f"g{i % 300}",
+        "link_ics_zrodlowy": f"https://plan.uz.zgora.pl/grupy_ics.php?ID={i % 300}&KIND=GG",
+        **({"zly": True} if i in zle else {}),
+    } for i in range(n)]
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Benchmark zapisu wsadowego")
+    ap.add_argument("--wiersze", type=int, default=20000)
+    ap.add_argument("--rtt-ms", type=float, default=40.0)
+    ap.add_argument("--mb-s", type=float, default=5.0, help="Przepustowość symulowanego serwera")
+    ap.add_argument("--bledne", type=int, default=5, help="Liczba wierszy odrzucanych przez serwer")
+    args = ap.parse_args()
+    rows = wiersze(args.wiersze, args.bledne)
+
+    wyslij, zapisane = serwer(args.rtt_ms / 1000, args.mb_s * 1024 * 1024)
+    start = time.perf_counter()
+    for i in range(0, len(rows), 500):
+        batch = rows[i:i + 500]
+        try:
+            wyslij(batch)
+        except RuntimeError:
+            pass
+    t_przed = time.perf_counter() - start
+    print(f"Po kolei, po 500 wierszy: {t_przed:.2f} s, zapisano {len(zapisane)}/{len(rows)} "
+          f"({len(zapisane) / t_przed:.0f} wierszy/s)")
+
+    wyslij, zapisane = serwer(args.rtt_ms / 1000, args.mb_s * 1024 * 1024)
+    writer = BulkWriter("zajecia_grupy", wyslij, max_wierszy=500)
+    with contextlib.redirect_stdout(io.StringIO()):
+        writer.zapisz(rows)
+    t_po = writer.stats["czas_s"]
+    print(f"BulkWriter: {t_po:.2f} s, zapisano {len(zapisane)}/{len(rows)} ×{t_przed / t_po:.1f}")
+    print(writer.raport())
+    if len(zapisane) + len(writer.bledne) != len(rows) or len(writer.bledne) != args.bledne:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
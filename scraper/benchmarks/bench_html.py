@@ -0,0 +1,86 @@
+"""
+Benchmark parserów HTML: pełne drzewo html.parser (dotychczas) vs backendy
+z parsowaniem częściowym (html.parser, lxml, selectolax – jeśli zainstalowane).
+
+Sprawdza, że każdy backend daje te same wyniki co pełne drzewo, i mierzy
+czas parsowania jednej strony (ms) dla zapisanych stron planu UZ.
+
+Użycie: python -m scraper.benchmarks.bench_html [--fixtures KATALOG] [--powtorzenia N]
+"""
+import argparse
+import contextlib
+import io
+import os
+import time
+
+from scraper.benchmarks.bench_ics import FIXTURES_DIR
+from scraper.page_store import parse_grupa_page
+from scraper.parsers import html_backend
+from scraper.parsers.grupy_parser import find_ics_links, parse_grupa_details
+from scraper.parsers.nauczyciel_parser import parse_nauczyciel_details, parse_nauczyciele_from_group_page
+from scraper.scrapers.grupy_scraper import linki_grup
+from scraper.scrapers.kierunki_scraper import parse_departments_and_courses
+
+# (plik, parser) – parsery, które przy scrapowaniu dostają daną stronę
+PRZYPADKI = [
+    ("kierunki_uz.html", "parse_departments_and_courses", parse_departments_and_courses),
+    ("kierunek_uz.html", "linki_grup (parse_grupy)", linki_grup),
+    ("grupa_uz.html", "parse_grupa_details", parse_grupa_details),
+    ("grupa_uz.html", "find_ics_links", find_ics_links),
+    ("grupa_uz.html", "parse_nauczyciele_from_group_page", lambda h: parse_nauczyciele_from_group_page(h, "29001")),
+    ("grupa_uz.html", "page_store.parse_grupa_page", lambda h: parse_grupa_page(h, "29001")),
+    ("grupa_regularna_uz.html", "page_store.parse_grupa_page", lambda h: parse_grupa_page(h, "29001")),
+    ("nauczyciel_uz.html", "parse_nauczyciel_details", lambda h: parse_nauczyciel_details(h, "18007", sonduj_ics=False)),
+]
+
+
+def uruchom(fn, html: str, backend: str, czesciowe: bool):
+    html_backend.HTML_BACKEND = backend
+    html_backend.HTML_PARTIAL = czesciowe
+    with contextlib.redirect_stdout(io.StringIO()):
+        return fn(html)
+
+
+def zmierz(fn, html: str, backend: str, czesciowe: bool, powtorzenia: int) -> float:
+    """Najlepszy z 3 pomiarów, w ms na stronę."""
+    najlepszy = float("inf")
+    for _ in range(3):
+        start = time.perf_counter()
+        for _ in range(powtorzenia):
+            uruchom(fn, html, backend, czesciowe)
+        najlepszy = min(najlepszy, (time.perf_counter() - start) / powtorzenia)
+    return najlepszy * 1000
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Benchmark backendów HTML")
+    ap.add_argument("--fixtures", default=FIXTURES_DIR, help="Katalog z zapisanymi stronami .html")
+    ap.add_argument("--powtorzenia", type=int, default=20, help="Liczba parsowań na pomiar")
+    args = ap.parse_args()
+
+    backendy = html_backend.dostepne_backendy()
+    print(f"Backendy: {', '.join(backendy)} (niedostępne: "
+          f"{', '.join(b for b in html_backend.BACKENDY if b not in backendy) or 'brak'})\n")
+    zgodne = True
+    for plik, nazwa, fn in PRZYPADKI:
+        sciezka = os.path.join(args.fixtures, plik)
+        if not os.path.exists(sciezka):
+            print(f"⚠️ Brak pliku {sciezka}")
+            continue
+        with open(sciezka, encoding="utf-8") as f:
+            html = f.read()
+        wzorzec = uruchom(fn, html, "html.parser", czesciowe=False)
+        t_pelne = zmierz(fn, html, "html.parser", False, args.powtorzenia)
+        print(f"{plik} / {nazwa}: pełne drzewo html.parser {t_pelne:7.2f} ms")
+        for backend in backendy:
+            wynik = uruchom(fn, html, backend, czesciowe=True)
+            ok = wynik == wzorzec
+            zgodne &= ok
+            t = zmierz(fn, html, backend, True, args.powtorzenia)
+            print(f"  {'✅' if ok else '❌'} {backend:<12} częściowo {t:7.2f} ms  ×{t_pelne / t:.1f}")
+    if not zgodne:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
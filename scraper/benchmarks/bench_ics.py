@@ -0,0 +1,113 @@
+"""
+Benchmark parserów ICS: liniowy (fast) vs icalendar.
+
+Sprawdza zgodność wyników trzech parserów (ics_updater.parse_ics_file,
+grupy_parser.parse_ics, nauczyciel_scraper.parse_ics_for_nauczyciel) na plikach
+z katalogu fixtures, a potem mierzy wydarzenia/s i alokacje pamięci.
+
+Użycie: python -m scraper.benchmarks.bench_ics [--fixtures KATALOG] [--powtorzenia N]
+"""
+import argparse
+import glob
+import os
+import re
+import time
+import tracemalloc
+
+from scraper.ics_updater import parse_ics_file
+from scraper.parsers.grupy_parser import parse_ics
+from scraper.scrapers.nauczyciel_scraper import parse_ics_for_nauczyciel
+
+FIXTURES_DIR = os.path.join(os.path.dirname(__file__), "fixtures")
+
+PARSERY = {
+    "ics_updater.parse_ics_file": lambda tekst, p: parse_ics_file(tekst, "zrodlo", parser=p),
+    "grupy_parser.parse_ics": lambda tekst, p: parse_ics(tekst, "1", "zrodlo", parser=p),
+    "nauczyciel_scraper.parse_ics_for_nauczyciel": lambda tekst, p: parse_ics_for_nauczyciel(tekst, "1", parser=p),
+}
+
+
+def wczytaj_fixtures(katalog: str) -> dict[str, str]:
+    pliki = {}
+    for sciezka in sorted(glob.glob(os.path.join(katalog, "*.ics"))):
+        with open(sciezka, encoding="utf-8", newline="") as f:
+            pliki[os.path.basename(sciezka)] = f.read()
+    return pliki
+
+
+def powiel_wydarzenia(tekst: str, n: int) -> str:
+    """Powiela bloki VEVENT n razy (z unikalnymi UID), żeby uzyskać duży plik."""
+    poczatek = tekst.index("BEGIN:VEVENT")
+    koniec = tekst.rindex("END:VEVENT") + len("END:VEVENT")
+    wydarzenia = tekst[poczatek:koniec]
+    kopie = [re.sub(r"(\r?\nUID:)", rf"\g<1>{i}-", wydarzenia) for i in range(n)]
+    return tekst[:poczatek] + "\r\n".join(kopie) + tekst[koniec:]
+
+
+def sprawdz_zgodnosc(pliki: dict[str, str]) -> bool:
+    zgodne = True
+    for nazwa, tekst in pliki.items():
+        for parser_nazwa, fn in PARSERY.items():
+            fast, ref = fn(tekst, "fast"), fn(tekst, "icalendar")
+            if fast != ref:
+                zgodne = False
+                print(f"❌ {nazwa} / {parser_nazwa}: wyniki różne ({len(fast)} vs {len(ref)} wydarzeń)")
+                for a, b in zip(fast, ref):
+                    if a != b:
+                        print(f"   fast:      {a}\n   icalendar: {b}")
+                        break
+            else:
+                print(f"✅ {nazwa} / {parser_nazwa}: {len(fast)} wydarzeń zgodnych")
+    return zgodne
+
+
+def zmierz(tekst: str, parser: str, powtorzenia_pomiaru: int = 3) -> dict:
+    najlepszy = float("inf")
+    liczba = 0
+    for _ in range(powtorzenia_pomiaru):
+        start = time.perf_counter()
+        liczba = len(parse_ics_file(tekst, "zrodlo", parser=parser))
+        najlepszy = min(najlepszy, time.perf_counter() - start)
+    tracemalloc.start()
+    wynik = parse_ics_file(tekst, "zrodlo", parser=parser)
+    _, szczyt = tracemalloc.get_traced_memory()
+    # Bloki pamięci żyjące po parsowaniu (wynik + ewentualne pozostałości parsera)
+    bloki = sum(stat.count for stat in tracemalloc.take_snapshot().statistics("filename"))
+    tracemalloc.stop()
+    del wynik
+    return {
+        "wydarzenia": liczba,
+        "wydarzenia_na_s": liczba / najlepszy if najlepszy else 0.0,
+        "szczyt_kib": szczyt / 1024,
+        "bloki": bloki,
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Benchmark parserów ICS (fast vs icalendar)")
+    ap.add_argument("--fixtures", default=FIXTURES_DIR, help="Katalog z plikami .ics")
+    ap.add_argument("--powtorzenia", type=int, default=400, help="Ile razy powielić wydarzenia w pliku testowym")
+    args = ap.parse_args()
+
+    pliki = wczytaj_fixtures(args.fixtures)
+    if not pliki:
+        print(f"❌ Brak plików .ics w {args.fixtures}")
+        return
+    print("Zgodność wyników:")
+    zgodne = sprawdz_zgodnosc(pliki)
+
+    print("\nWydajność (ics_updater.parse_ics_file):")
+    for nazwa, tekst in pliki.items():
+        duzy = powiel_wydarzenia(tekst, args.powtorzenia)
+        wyniki = {p: zmierz(duzy, p) for p in ("icalendar", "fast")}
+        for p, w in wyniki.items():
+            print(f"  {nazwa:<22} {p:<10} {w['wydarzenia']:>7} wyd. {w['wydarzenia_na_s']:>10.0f} wyd./s "
+                  f"szczyt {w['szczyt_kib']:>9.1f} KiB, {w['bloki']:>7} bloków")
+        przyspieszenie = wyniki["fast"]["wydarzenia_na_s"] / max(wyniki["icalendar"]["wydarzenia_na_s"], 1e-9)
+        print(f"  {nazwa:<22} przyspieszenie: ×{przyspieszenie:.1f}")
+    if not zgodne:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
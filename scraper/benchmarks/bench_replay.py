@@ -0,0 +1,220 @@
+"""
+Benchmark etapów scraper.main na nagraniu plan.uz.zgora.pl (replay.py) – bez
+obciążania serwera uczelni i bez szumu sieci.
+
+Każdy etap to osobny proces `python -m scraper.main --etapy ETAP` w czystym
+katalogu roboczym (lokalny SQLite, pusty .cache), kierowany na serwer replay
+przez SCRAPER_UPSTREAM_URL. Mierzone są: czas, zapytania i bajty (po stronie
+serwera replay) oraz szczytowe RSS procesu etapu. Wyniki (mediana z powtórzeń)
+dopisywane są do pliku JSONL i porównywane z poprzednim przebiegiem o tej samej
+konfiguracji; wzrost ponad --prog oznaczany jest jako regresja.
+
+Użycie: python -m scraper.benchmarks.replay nagraj --kierunki 3
+        python -m scraper.benchmarks.bench_replay [--powtorzenia N] [--opoznienie-ms MS] [--bledy P]
+               [--limit-rps N] [--etapy ETAP ...] [--porownaj COMMIT] [--scisle]
+"""
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List, Optional
+
+from scraper.benchmarks.replay import NAGRANIA_DIR, Nagranie, SerwerReplay
+from scraper.main import ETAPY
+
+WYNIKI_PATH = os.path.join(".cache", "benchmarks", "replay.jsonl")
+KATALOG_REPO = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+METRYKI = ("czas_s", "zapytania", "bajty", "rss_mb")
+
+
+def _env_etapu(serwer: SerwerReplay) -> Dict[str, str]:
+    # Ścieżki stanu (SCRAPER_*_PATH/_DIR) z otoczenia wskazywałyby poza czysty katalog roboczy
+    env = {k: v for k, v in os.environ.items()
+           if not (k.startswith("SCRAPER_") and k.endswith(("_PATH", "_DIR")))}
+    env.update({
+        "PYTHONPATH": os.pathsep.join(p for p in (KATALOG_REPO, os.environ.get("PYTHONPATH")) if p),
+        "PYTHONUNBUFFERED": "1",
+        "SCRAPER_STORAGE": "sqlite",
+        "SCRAPER_UPSTREAM_URL": serwer.adres,
+    })
+    return env
+
+
+def uruchom_etap(etap: str, katalog: str, serwer: SerwerReplay) -> Dict[str, Any]:
+    przed = serwer.statystyki()
+    log_path = os.path.join(katalog, f"{etap}.log")
+    start = time.perf_counter()
+    with open(log_path, "w", encoding="utf-8") as log:
+        proc = subprocess.Popen([sys.executable, "-m", "scraper.main", "--etapy", etap],
+                                cwd=katalog, env=_env_etapu(serwer), stdout=log, stderr=subprocess.STDOUT)
+        # wait4: zużycie zasobów tego procesu (ru_maxrss obejmuje też jego procesy potomne, np. parsowania)
+        _, status, rusage = os.wait4(proc.pid, 0)
+    czas = time.perf_counter() - start
+    proc.returncode = os.waitstatus_to_exitcode(status)
+    po = serwer.statystyki()
+    statusy = {s: n - przed["statusy"].get(s, 0) for s, n in po["statusy"].items()
+               if n - przed["statusy"].get(s, 0)}
+    if proc.returncode != 0:
+        with open(log_path, encoding="utf-8", errors="replace") as f:
+            print("".join(f.readlines()[-15:]))
+        print(f"❌ Etap {etap} zakończony kodem {proc.returncode} (log: {log_path})")
+    return {
+        "czas_s": round(czas, 3),
+        "zapytania": po["zapytania"] - przed["zapytania"],
+        "bajty": po["bajty"] - przed["bajty"],
+        "brakujace": po["brakujace"] - przed["brakujace"],
+        # Linux: KiB, macOS: bajty
+        "rss_mb": round(rusage.ru_maxrss / (1024 * 1024 if sys.platform == "darwin" else 1024), 1),
+        "statusy": statusy,
+        "kod": proc.returncode,
+    }
+
+
+def przebieg(etapy: List[str], serwer: SerwerReplay, zachowaj: bool = False) -> Dict[str, Dict[str, Any]]:
+    """Etapy po kolei w jednym czystym katalogu – kolejny etap czyta wyniki poprzedniego z SQLite."""
+    katalog = tempfile.mkdtemp(prefix="bench-replay-")
+    wyniki = {etap: uruchom_etap(etap, katalog, serwer) for etap in etapy}
+    if zachowaj:
+        print(f"📁 Katalog przebiegu: {katalog}")
+    else:
+        shutil.rmtree(katalog, ignore_errors=True)
+    return wyniki
+
+
+def mediany(przebiegi: List[Dict[str, Dict[str, Any]]]) -> Dict[str, Dict[str, Any]]:
+    wynik = {}
+    for etap in przebiegi[0]:
+        pomiary = [p[etap] for p in przebiegi]
+        wynik[etap] = {m: statistics.median(p[m] for p in pomiary) for m in METRYKI + ("brakujace",)}
+        wynik[etap]["statusy"] = pomiary[-1]["statusy"]
+        wynik[etap]["kod"] = max(p["kod"] for p in pomiary)
+    return wynik
+
+
+def _commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=KATALOG_REPO, capture_output=True,
+                              text=True, timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def wczytaj_wyniki(path: str) -> List[Dict[str, Any]]:
+    try:
+        with open(path, encoding="utf-8") as f:
+            return [json.loads(linia) for linia in f if linia.strip()]
+    except OSError:
+        return []
+
+
+def znajdz_baze(historia: List[Dict[str, Any]], konfiguracja: Dict[str, Any],
+                commit: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    """Ostatni wynik o tej samej konfiguracji (opcjonalnie z danego commita)."""
+    for wpis in reversed(historia):
+        if wpis["konfiguracja"] == konfiguracja and (not commit or (wpis.get("commit") or "").startswith(commit)):
+            return wpis
+    return None
+
+
+def _fmt(m: str, v: float) -> str:
+    if m == "bajty":
+        return f"{v / 1024:.0f} KiB"
+    if m == "czas_s":
+        return f"{v:.2f} s"
+    if m == "rss_mb":
+        return f"{v:.0f} MB"
+    return f"{v:.0f}"
+
+
+def raport(etapy: Dict[str, Dict[str, Any]], baza: Optional[Dict[str, Any]], prog: float) -> List[str]:
+    """Tabela wyników; zwraca listę regresji (metryki wyższe od bazy o więcej niż prog)."""
+    regresje = []
+    print(f"{'etap':<22}" + "".join(f"{m:>24}" for m in METRYKI))
+    for etap, w in etapy.items():
+        wiersz = f"{etap:<22}"
+        for m in METRYKI:
+            komorka = _fmt(m, w[m])
+            stara = (baza or {}).get("etapy", {}).get(etap, {}).get(m)
+            if stara:
+                zmiana = w[m] / stara - 1
+                komorka += f" ({zmiana:+.0%})"
+                if zmiana > prog:
+                    komorka += " ⚠️"
+                    regresje.append(f"{etap}.{m}: {_fmt(m, stara)} → {_fmt(m, w[m])}")
+            wiersz += f"{komorka:>24}"
+        print(wiersz)
+        if w["kod"] or w["brakujace"] or set(w["statusy"]) - {"200"}:
+            print(f"{'':<22}kod {w['kod']}, statusy {w['statusy']}, brak w nagraniu: {w['brakujace']:.0f}")
+    return regresje
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Benchmark etapów scraper.main na nagraniu (serwer replay)")
+    ap.add_argument("--nagranie", default=NAGRANIA_DIR, help="Katalog nagrania (replay.py nagraj)")
+    ap.add_argument("--etapy", nargs="+", choices=ETAPY, default=list(ETAPY))
+    ap.add_argument("--powtorzenia", type=int, default=1)
+    ap.add_argument("--opoznienie-ms", type=float, default=20.0)
+    ap.add_argument("--jitter-ms", type=float, default=5.0)
+    ap.add_argument("--bledy", type=float, default=0.0, help="Odsetek odpowiedzi 503 (0–1)")
+    ap.add_argument("--limit-rps", type=float, default=0.0, help="Limit zapytań/s serwera, ponad nim 429")
+    ap.add_argument("--wyniki", default=WYNIKI_PATH, help="Plik JSONL z historią wyników")
+    ap.add_argument("--porownaj", metavar="COMMIT", help="Porównaj z wynikiem tego commita (domyślnie: ostatni)")
+    ap.add_argument("--prog", type=float, default=0.10, help="Próg regresji (względny wzrost metryki)")
+    ap.add_argument("--scisle", action="store_true", help="Kod wyjścia 1 przy regresji")
+    ap.add_argument("--opis", help="Etykieta przebiegu zapisywana z wynikami")
+    ap.add_argument("--zachowaj", action="store_true", help="Nie usuwaj katalogów przebiegów (logi etapów)")
+    args = ap.parse_args()
+
+    nagranie = Nagranie(args.nagranie)
+    konfiguracja = {
+        "nagranie": nagranie.odcisk(),
+        "etapy": args.etapy,
+        "opoznienie_ms": args.opoznienie_ms,
+        "jitter_ms": args.jitter_ms,
+        "bledy": args.bledy,
+        "limit_rps": args.limit_rps,
+    }
+    serwer = SerwerReplay(nagranie, opoznienie_s=args.opoznienie_ms / 1000, jitter_s=args.jitter_ms / 1000,
+                          bledy=args.bledy, limit_rps=args.limit_rps).uruchom_w_tle()
+    print(f"▶️ Replay {len(nagranie.wpisy)} odpowiedzi pod {serwer.adres}, {args.powtorzenia} powtórzeń")
+    try:
+        przebiegi = [przebieg(args.etapy, serwer, args.zachowaj) for _ in range(args.powtorzenia)]
+    finally:
+        serwer.shutdown()
+    etapy = mediany(przebiegi)
+    pomiary = list(etapy.values())
+    etapy["razem"] = {m: sum(w[m] for w in pomiary) for m in ("czas_s", "zapytania", "bajty", "brakujace")}
+    etapy["razem"].update(rss_mb=max(w["rss_mb"] for w in pomiary), statusy={}, kod=max(w["kod"] for w in pomiary))
+
+    historia = wczytaj_wyniki(args.wyniki)
+    baza = znajdz_baze(historia, konfiguracja, args.porownaj)
+    if baza:
+        print(f"📊 Porównanie z {baza.get('commit') or '?'} ({baza.get('opis') or baza['czas']})")
+    elif args.porownaj:
+        print(f"⚠️ Brak wyniku {args.porownaj} dla tej konfiguracji – bez porównania")
+    regresje = raport(etapy, baza, args.prog)
+
+    os.makedirs(os.path.dirname(args.wyniki) or ".", exist_ok=True)
+    with open(args.wyniki, "a", encoding="utf-8") as f:
+        f.write(json.dumps({
+            "czas": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "commit": _commit(),
+            "opis": args.opis,
+            "konfiguracja": konfiguracja,
+            "powtorzenia": args.powtorzenia,
+            "etapy": etapy,
+        }, ensure_ascii=False) + "\n")
+    print(f"💾 Wyniki dopisane do {args.wyniki}")
+    if regresje:
+        print("⚠️ Regresje: " + "; ".join(regresje))
+        if args.scisle:
+            raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+"""
+Mikrobenchmark rozkładu SUMMARY: dotychczasowy kod z parserów vs scraper.summary.
+
+Sprawdza zgodność wyników na opisach z plików fixtures i mierzy koszt na
+wydarzenie (µs) dla strumienia, w którym opisy powtarzają się co tydzień.
+
+Użycie: python -m scraper.benchmarks.bench_summary [--fixtures KATALOG] [--tygodnie N]
+"""
+import argparse
+import re
+import time
+
+from scraper.benchmarks.bench_ics import FIXTURES_DIR, wczytaj_fixtures
+from scraper.parsers.ics_fast import iter_vevents_fast
+from scraper import summary as summary_mod
+
+
+# --- Sekcja: Kod sprzed zmiany (wycięty z parserów, do porównania) ---
+
+def przed_plan(summary):
+    rz_match = re.search(r'\((W|C|Ć|L|P|S|E|I|T|K|X|Z|Zp)\)', summary)
+    rz = rz_match.group(1) if rz_match else None
+    przedmiot = summary
+    match_przedmiot = re.match(r'^([^(]+)', summary)
+    if match_przedmiot:
+        przedmiot = match_przedmiot.group(1).strip()
+    nauczyciel = None
+    if ': ' in summary:
+        parts = summary.split(': ', 1)
+        nauczyciel = parts[1].strip() if len(parts) > 1 else None
+    if nauczyciel and '(PG:' in nauczyciel:
+        nauczyciel = nauczyciel.split('(PG:')[0].strip()
+    podgrupa = None
+    podgrupa_match = re.search(r'\(PG:\s*([^)]+)\)', summary)
+    if podgrupa_match:
+        podgrupa = podgrupa_match.group(1).strip()
+    grupy = None
+    grupy_match = re.search(r'\)\s*:\s*([^\n]+)', summary)
+    if grupy_match:
+        grupy = grupy_match.group(1).strip()
+    elif ': ' in summary:
+        parts = summary.split(': ', 1)
+        if len(parts) > 1:
+            grupy = parts[1].strip()
+    return przedmiot, rz, nauczyciel, podgrupa, grupy
+
+
+def przed_grupa(summary):
+    przedmiot = summary
+    nauczyciel = None
+    pg = None
+    match = re.search(r"^(.*?)\s*\([^\)]+\):\s*(.+?)(?:\s*\(PG:.*\))?$", summary)
+    if match:
+        przedmiot = match.group(1).strip()
+        nauczyciel = match.group(2).strip()
+    else:
+        przedmiot = summary.strip()
+    pg_match = re.search(r"\(PG:\s*([^)]+)\)", summary)
+    if pg_match:
+        pg = pg_match.group(1).strip()
+    if nauczyciel:
+        nauczyciel = re.sub(r"\(PG:.*?\)", "", nauczyciel).strip()
+    return przedmiot, None, nauczyciel, pg, None
+
+
+def przed_nauczyciel(summary):
+    przedmiot = summary.split("(")[0].strip() if "(" in summary else summary.strip()
+    grupy = None
+    m = re.search(r":\s*([A-Za-z0-9\-/; ]+)", summary)
+    if m:
+        grupy = m.group(1).strip()
+    return przedmiot, None, None, None, grupy
+
+
+PRZED = {"plan": przed_plan, "grupa": przed_grupa, "nauczyciel": przed_nauczyciel}
+
+
+def opisy(pliki: dict[str, str]) -> list[str]:
+    wynik = []
+    for tekst in pliki.values():
+        wynik.extend(e["summary"] or "" for e in iter_vevents_fast(tekst))
+    return wynik
+
+
+def zmierz(fn, strumien: list[str], format: str) -> float:
+    """Najlepszy z 3 pomiarów, w µs na wydarzenie."""
+    najlepszy = float("inf")
+    for _ in range(3):
+        summary_mod.rozloz_summary.cache_clear()
+        start = time.perf_counter()
+        for s in strumien:
+            fn(s, format)
+        najlepszy = min(najlepszy, time.perf_counter() - start)
+    return najlepszy / len(strumien) * 1e6
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Mikrobenchmark rozkładu SUMMARY")
+    ap.add_argument("--fixtures", default=FIXTURES_DIR, help="Katalog z plikami .ics")
+    ap.add_argument("--tygodnie", type=int, default=15, help="Ile razy powtarza się każdy opis (tygodnie semestru)")
+    args = ap.parse_args()
+
+    unikalne = list(dict.fromkeys(opisy(wczytaj_fixtures(args.fixtures))))
+    if not unikalne:
+        print(f"❌ Brak wydarzeń w {args.fixtures}")
+        return
+    # Kilkaset unikalnych opisów, każdy powtórzony jak zajęcia co tydzień
+    unikalne = [f"{s} [{i}]" if i else s for i in range(20) for s in unikalne]
+    strumien = unikalne * args.tygodnie
+
+    zgodne = True
+    for format, przed in PRZED.items():
+        for s in unikalne:
+            if tuple(summary_mod.rozloz_summary(s, format)) != przed(s):
+                zgodne = False
+                print(f"❌ {format}: różny wynik dla {s!r}")
+                break
+    print("✅ Wyniki zgodne z dotychczasowym kodem" if zgodne else "❌ Wyniki niezgodne")
+
+    print(f"\n{len(strumien)} wydarzeń, {len(unikalne)} unikalnych opisów:")
+    for format, przed in PRZED.items():
+        t_przed = zmierz(lambda s, _f: przed(s), strumien, format)
+        t_po = zmierz(summary_mod.rozloz_summary, strumien, format)
+        print(f"  {format:<11} przed {t_przed:6.2f} µs/wyd.  po {t_po:6.2f} µs/wyd.  ×{t_przed / t_po:.1f}")
+    print(summary_mod.raport())
+    if not zgodne:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
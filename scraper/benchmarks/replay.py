@@ -0,0 +1,334 @@
+"""
+Nagrywanie odpowiedzi plan.uz.zgora.pl i lokalny serwer, który je odtwarza
+(opóźnienie, błędy, throttling) – pomiary bez obciążania serwera uczelni.
+
+Nagranie to katalog z index.jsonl (metoda, ścieżka, status, Content-Type, ETag)
+i treściami w pliki/<sha1>.gz. Nagrywane jest wszystko, co scraper pobiera przez
+http_client, przy wyłączonym cache: lista kierunków, strony kierunków i grup,
+grupy_ics.php, nauczyciel_plan.php, nauczyciel_ics.php (także HEAD sondowania).
+Przy --kierunki K lista kierunków przycinana jest do K nagranych, więc
+odtwarzany serwis jest zamknięty – scraper nie trafia na nienagrane strony.
+
+Użycie: python -m scraper.benchmarks.replay nagraj [--katalog DIR] [--kierunki K]
+        python -m scraper.benchmarks.replay serwer [--katalog DIR] [--port P] [--opoznienie-ms MS]
+               [--jitter-ms MS] [--bledy P] [--limit-rps N]
+"""
+import argparse
+import gzip
+import hashlib
+import json
+import os
+import random
+import re
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+
+from scraper.http_client import ORIGIN
+
+NAGRANIA_DIR = os.getenv("SCRAPER_REPLAY_DIR", os.path.join(".cache", "replay"))
+LISTA_KIERUNKOW = ORIGIN + "grupy_lista_kierunkow.php"
+
+
+def sciezka_url(url: str) -> str:
+    """Klucz nagrania: ścieżka z zapytaniem, jak w linii żądania HTTP."""
+    return "/" + url[len(ORIGIN):] if url.startswith(ORIGIN) else url
+
+
+# --- Sekcja: Nagrywanie ---
+
+class Nagrywarka:
+    """Obserwator http_client (ustaw_nagrywarke) zapisujący odpowiedzi z ORIGIN do katalogu nagrania."""
+
+    def __init__(self, katalog: str = NAGRANIA_DIR):
+        self.katalog = katalog
+        os.makedirs(os.path.join(katalog, "pliki"), exist_ok=True)
+        self._lock = threading.Lock()
+        self.wpisy: Dict[Tuple[str, str], Dict[str, Any]] = {}
+
+    def __call__(self, metoda: str, url: str, status: int, headers, body: Optional[bytes]):
+        if not url.startswith(ORIGIN):
+            return
+        wpis = {
+            "metoda": metoda,
+            "sciezka": sciezka_url(url),
+            "status": status,
+            "typ": headers.get("content-type", ""),
+            # Serwer uczelni kompresuje odpowiedzi albo nie – replay robi to samo
+            "gzip": "gzip" in headers.get("content-encoding", ""),
+        }
+        if body is not None:
+            wpis.update(self._zapisz_tresc(url, body))
+        with self._lock:
+            self.wpisy[(metoda, wpis["sciezka"])] = wpis
+
+    def _zapisz_tresc(self, url: str, body: bytes) -> Dict[str, str]:
+        plik = hashlib.sha1(url.encode("utf-8")).hexdigest() + ".gz"
+        sciezka = os.path.join(self.katalog, "pliki", plik)
+        tmp = f"{sciezka}.{threading.get_ident()}.tmp"
+        with gzip.open(tmp, "wb", compresslevel=6) as f:
+            f.write(body)
+        os.replace(tmp, sciezka)
+        return {"plik": plik, "etag": hashlib.sha1(body).hexdigest()[:16]}
+
+    def tresc(self, url: str) -> Optional[bytes]:
+        wpis = self.wpisy.get(("GET", sciezka_url(url)))
+        if not wpis or not wpis.get("plik"):
+            return None
+        with gzip.open(os.path.join(self.katalog, "pliki", wpis["plik"]), "rb") as f:
+            return f.read()
+
+    def podmien(self, url: str, body: bytes):
+        """Zastępuje treść nagranej odpowiedzi GET (np. przycięta lista kierunków)."""
+        with self._lock:
+            self.wpisy[("GET", sciezka_url(url))].update(self._zapisz_tresc(url, body))
+
+    def przytnij_liste_kierunkow(self, kierunki: List[Dict[str, Any]]):
+        from scraper.parsers.html_backend import zupa
+
+        html = self.tresc(LISTA_KIERUNKOW)
+        if html is None:
+            return
+        dozwolone = {k.get("link_strony_kierunku") for k in kierunki}
+        soup = zupa(html.decode("utf-8", errors="replace"))
+        for li in soup.find_all("li", class_="lista-grup-item"):
+            anchor = li.find("a", href=True)
+            if li.find("ul", class_="lista-grup") or not anchor or "ID=" not in anchor["href"]:
+                continue  # nagłówek wydziału albo element bez kierunku
+            link = anchor["href"] if anchor["href"].startswith("http") else ORIGIN + anchor["href"]
+            if link not in dozwolone:
+                li.decompose()
+        self.podmien(LISTA_KIERUNKOW, str(soup).encode("utf-8"))
+
+    def zapisz(self):
+        with self._lock:
+            tmp = os.path.join(self.katalog, "index.jsonl.tmp")
+            with open(tmp, "w", encoding="utf-8") as f:
+                for klucz in sorted(self.wpisy):
+                    f.write(json.dumps(self.wpisy[klucz], ensure_ascii=False) + "\n")
+            os.replace(tmp, os.path.join(self.katalog, "index.jsonl"))
+
+
+def nagraj(katalog: str = NAGRANIA_DIR, kierunki_limit: Optional[int] = None,
+           workers: int = 8) -> Dict[str, int]:
+    """
+    Przejście etapów 1–5 (bez zapisu do bazy) z nagrywaniem odpowiedzi.
+    Stan scrapera (.cache: sondowania ICS, warianty) jest tymczasowy, żeby
+    nagrać pełny zestaw zapytań zimnego przebiegu.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+
+    katalog = os.path.abspath(katalog)
+    os.environ["SCRAPER_HTTP_CACHE"] = "0"
+    os.chdir(tempfile.mkdtemp(prefix="replay-nagranie-"))
+
+    from scraper import http_client
+    from scraper.crawler import crawl_nauczyciele
+    from scraper.downloader import download_ics_for_groups_async
+    from scraper.ics_updater import pobierz_plan_ics_nauczyciela
+    from scraper.scrapers.grupy_scraper import scrape_grupy_for_kierunki
+    from scraper.scrapers.kierunki_scraper import scrape_kierunki
+    from scraper.shards import klucz_nauczyciela
+
+    nagrywarka = Nagrywarka(katalog)
+    http_client.ustaw_nagrywarke(nagrywarka)
+    try:
+        kierunki = scrape_kierunki()
+        if kierunki_limit:
+            kierunki = kierunki[:kierunki_limit]
+            nagrywarka.przytnij_liste_kierunkow(kierunki)
+        grupy = scrape_grupy_for_kierunki(kierunki)
+        nauczyciele = crawl_nauczyciele(grupy)
+        # ICS wszystkich odwiedzonych stron grup – także grup scalonych przy deduplikacji
+        grupa_ids = [g["grupa_id"] for g in grupy if g.get("grupa_id")]
+        grupa_ids += [m.group(1) for _, sciezka in list(nagrywarka.wpisy)
+                      if (m := re.match(r"/grupy_plan\.php\?ID=(\d+)", sciezka))]
+        download_ics_for_groups_async(list(dict.fromkeys(grupa_ids)))
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            list(pool.map(pobierz_plan_ics_nauczyciela, {klucz_nauczyciela(n) for n in nauczyciele} - {None}))
+    finally:
+        http_client.ustaw_nagrywarke(None)
+        nagrywarka.zapisz()
+    stats = {"kierunki": len(kierunki), "grupy": len(grupy), "nauczyciele": len(nauczyciele),
+             "odpowiedzi": len(nagrywarka.wpisy)}
+    print(f"🎙️ Nagranie w {katalog}: {stats}")
+    return stats
+
+
+# --- Sekcja: Odtwarzanie ---
+
+class Nagranie:
+    def __init__(self, katalog: str = NAGRANIA_DIR):
+        self.katalog = katalog
+        self.wpisy: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        with open(os.path.join(katalog, "index.jsonl"), encoding="utf-8") as f:
+            for linia in f:
+                wpis = json.loads(linia)
+                self.wpisy[(wpis["metoda"], wpis["sciezka"])] = wpis
+
+    def odcisk(self) -> str:
+        """Identyfikuje zestaw nagrań (porównywanie wyników tylko na tym samym nagraniu)."""
+        with open(os.path.join(self.katalog, "index.jsonl"), "rb") as f:
+            return hashlib.sha1(f.read()).hexdigest()[:12]
+
+    def znajdz(self, metoda: str, sciezka: str) -> Optional[Dict[str, Any]]:
+        wpis = self.wpisy.get((metoda, sciezka))
+        if wpis is None and metoda == "HEAD":
+            wpis = self.wpisy.get(("GET", sciezka))
+        return wpis
+
+    def tresc(self, wpis: Dict[str, Any], gzip_ok: bool) -> Tuple[bytes, bool]:
+        """(treść, czy_skompresowana) – plik nagrania to gotowa odpowiedź gzip."""
+        if not wpis.get("plik"):
+            return b"", False
+        with open(os.path.join(self.katalog, "pliki", wpis["plik"]), "rb") as f:
+            dane = f.read()
+        if wpis.get("gzip") and gzip_ok:
+            return dane, True
+        return gzip.decompress(dane), False
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive jak na prawdziwym serwerze
+
+    def do_GET(self):
+        self.server.odpowiedz(self, "GET")
+
+    def do_HEAD(self):
+        self.server.odpowiedz(self, "HEAD")
+
+    def log_message(self, *args):
+        pass
+
+
+class SerwerReplay(ThreadingHTTPServer):
+    """
+    Odtwarza nagranie pod http://127.0.0.1:PORT/ (SCRAPER_UPSTREAM_URL dla scrapera):
+    - opóźnienie każdej odpowiedzi: opoznienie_s ± jitter_s,
+    - bledy: odsetek odpowiedzi 503,
+    - limit_rps: token bucket, ponad limit 429 z Retry-After,
+    - ETag / If-None-Match → 304 (rewalidacja cache HTTP),
+    - /__stats: liczniki zapytań, bajtów i statusów (JSON).
+    """
+
+    daemon_threads = True
+
+    def __init__(self, nagranie: Nagranie, port: int = 0, opoznienie_s: float = 0.0, jitter_s: float = 0.0,
+                 bledy: float = 0.0, limit_rps: float = 0.0, seed: int = 0):
+        super().__init__(("127.0.0.1", port), _Handler)
+        self.nagranie = nagranie
+        self.opoznienie_s = opoznienie_s
+        self.jitter_s = jitter_s
+        self.bledy = bledy
+        self.limit_rps = limit_rps
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._tokeny = limit_rps
+        self._tokeny_ts = time.monotonic()
+        self.stats: Dict[str, Any] = {"zapytania": 0, "bajty": 0, "statusy": {}, "brakujace": 0}
+
+    @property
+    def adres(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}/"
+
+    def statystyki(self) -> Dict[str, Any]:
+        with self._lock:
+            return {**self.stats, "statusy": dict(self.stats["statusy"])}
+
+    def _losuj(self) -> Tuple[float, bool]:
+        with self._lock:
+            opoznienie = self.opoznienie_s + self._rng.uniform(-self.jitter_s, self.jitter_s)
+            return max(opoznienie, 0.0), self._rng.random() < self.bledy
+
+    def _zezwol(self) -> bool:
+        with self._lock:
+            teraz = time.monotonic()
+            self._tokeny = min(self.limit_rps, self._tokeny + (teraz - self._tokeny_ts) * self.limit_rps)
+            self._tokeny_ts = teraz
+            if self._tokeny < 1:
+                return False
+            self._tokeny -= 1
+            return True
+
+    def odpowiedz(self, h: BaseHTTPRequestHandler, metoda: str):
+        if h.path == "/__stats":
+            self._wyslij(h, metoda, 200, {"Content-Type": "application/json"},
+                         json.dumps(self.statystyki()).encode("utf-8"), licz=False)
+            return
+        opoznienie, blad = self._losuj()
+        time.sleep(opoznienie)
+        if self.limit_rps and not self._zezwol():
+            self._wyslij(h, metoda, 429, {"Retry-After": "1"}, b"")
+            return
+        if blad:
+            self._wyslij(h, metoda, 503, {}, b"")
+            return
+        wpis = self.nagranie.znajdz(metoda, h.path)
+        if wpis is None:
+            with self._lock:
+                self.stats["brakujace"] += 1
+            self._wyslij(h, metoda, 404, {"Content-Type": "text/html"}, b"")
+            return
+        naglowki = {"Content-Type": wpis.get("typ") or "text/html"}
+        if wpis.get("etag"):
+            naglowki["ETag"] = f'"{wpis["etag"]}"'
+            if h.headers.get("If-None-Match") == naglowki["ETag"]:
+                self._wyslij(h, metoda, 304, naglowki, b"")
+                return
+        body, skompresowana = self.nagranie.tresc(wpis, "gzip" in (h.headers.get("Accept-Encoding") or ""))
+        if skompresowana:
+            naglowki["Content-Encoding"] = "gzip"
+        self._wyslij(h, metoda, wpis["status"], naglowki, body)
+
+    def _wyslij(self, h: BaseHTTPRequestHandler, metoda: str, status: int, naglowki: Dict[str, str],
+                body: bytes, licz: bool = True):
+        h.send_response(status)
+        for nazwa, wartosc in naglowki.items():
+            h.send_header(nazwa, wartosc)
+        h.send_header("Content-Length", str(len(body)))
+        h.end_headers()
+        if metoda == "GET":
+            h.wfile.write(body)
+        if licz:
+            with self._lock:
+                self.stats["zapytania"] += 1
+                self.stats["bajty"] += len(body) if metoda == "GET" else 0
+                self.stats["statusy"][str(status)] = self.stats["statusy"].get(str(status), 0) + 1
+
+    def uruchom_w_tle(self) -> "SerwerReplay":
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Nagrywanie i odtwarzanie odpowiedzi plan.uz.zgora.pl")
+    sub = ap.add_subparsers(dest="tryb", required=True)
+    ap_n = sub.add_parser("nagraj", help="Nagraj odpowiedzi serwera uczelni (etapy 1–5 bez zapisu do bazy)")
+    ap_n.add_argument("--katalog", default=NAGRANIA_DIR)
+    ap_n.add_argument("--kierunki", type=int, help="Tylko K pierwszych kierunków (lista kierunków przycinana)")
+    ap_s = sub.add_parser("serwer", help="Odtwarzaj nagranie pod http://127.0.0.1:PORT/")
+    ap_s.add_argument("--katalog", default=NAGRANIA_DIR)
+    ap_s.add_argument("--port", type=int, default=8765)
+    ap_s.add_argument("--opoznienie-ms", type=float, default=0.0)
+    ap_s.add_argument("--jitter-ms", type=float, default=0.0)
+    ap_s.add_argument("--bledy", type=float, default=0.0, help="Odsetek odpowiedzi 503 (0–1)")
+    ap_s.add_argument("--limit-rps", type=float, default=0.0, help="Limit zapytań/s, ponad nim 429 (0 = brak)")
+    args = ap.parse_args()
+
+    if args.tryb == "nagraj":
+        nagraj(args.katalog, args.kierunki)
+        return
+    serwer = SerwerReplay(Nagranie(args.katalog), args.port, args.opoznienie_ms / 1000, args.jitter_ms / 1000,
+                          args.bledy, args.limit_rps)
+    print(f"▶️ Replay {len(serwer.nagranie.wpisy)} odpowiedzi pod {serwer.adres} "
+          f"(SCRAPER_UPSTREAM_URL={serwer.adres})")
+    try:
+        serwer.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+import json
+import os
+import random
+import sqlite3
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, Iterator, List
+
+# Maksymalny rozmiar jednego batcha po serializacji do JSON (PostgREST przyjmuje całe ciało naraz)
+BULK_MAX_BYTES = int(os.getenv("SCRAPER_BULK_MAX_BYTES", str(256 * 1024)))
+# Liczba batchy wysyłanych równolegle
+BULK_WORKERS = int(os.getenv("SCRAPER_BULK_WORKERS", "4"))
+# Ponowienia całego batcha po błędzie przejściowym (sieć, 5xx, blokada bazy), z backoffem
+BULK_RETRIES = int(os.getenv("SCRAPER_BULK_RETRIES", "3"))
+# Klasy błędów Postgresa (SQLSTATE) przejściowych: połączenie, serializacja/deadlock, zasoby, przerwanie
+KLASY_PRZEJSCIOWE = ("08", "40", "53", "57")
+
+
+def rozmiar_wiersza(row: Any) -> int:
+    return len(json.dumps(row, ensure_ascii=False, default=str).encode("utf-8")) + 1
+
+
+def batche(rows: Iterable[Any], max_bytes: int = BULK_MAX_BYTES, max_wierszy: int = 1000) -> Iterator[List[Any]]:
+    """Dzieli wiersze na batche o rozmiarze do max_bytes (po JSON) i najwyżej max_wierszy wierszy."""
+    batch, rozmiar = [], 2
+    for row in rows:
+        r = rozmiar_wiersza(row)
+        if batch and (rozmiar + r > max_bytes or len(batch) >= max_wierszy):
+            yield batch
+            batch, rozmiar = [], 2
+        batch.append(row)
+        rozmiar += r
+    if batch:
+        yield batch
+
+
+def przejsciowy(e: BaseException) -> bool:
+    """Błąd sieci albo serwera (timeout, zerwane połączenie, 5xx, 429, blokada SQLite), a nie danych."""
+    if isinstance(e, (ConnectionError, TimeoutError)):
+        return True
+    if isinstance(e, sqlite3.OperationalError):
+        return "locked" in str(e) or "busy" in str(e)
+    # httpx (klient PostgREST) – jeśli nie jest zaimportowany, to nie jego wyjątek
+    httpx = sys.modules.get("httpx")
+    if httpx is not None and isinstance(e, httpx.TransportError):
+        return True
+    # postgrest.APIError: code to SQLSTATE albo status HTTP, gdy odpowiedź nie była JSON-em (np. 502 z bramy)
+    kod = str(getattr(e, "code", "") or "")
+    if kod.isdigit() and len(kod) == 3:
+        return kod == "429" or kod.startswith("5")
+    return kod[:2] in KLASY_PRZEJSCIOWE
+
+
+class BulkWriter:
+    """
+    Równoległy zapis wsadowy: batche dobierane po rozmiarze w bajtach, kilka
+    naraz w locie. Błąd przejściowy (sieć, 5xx) ponawia cały batch z backoffem;
+    batch odrzucony z powodu danych jest dzielony na pół i ponawiany, aż do
+    pojedynczych wierszy – błędne wiersze trafiają do self.bledne razem
+    z komunikatem, reszta batcha zostaje zapisana.
+    """
+
+    def __init__(self, nazwa: str, wyslij: Callable[[List[Any]], Any],
+                 max_bytes: int = BULK_MAX_BYTES, max_wierszy: int = 1000, workers: int = BULK_WORKERS,
+                 ponowienia: int = BULK_RETRIES):
+        self.nazwa = nazwa
+        self.wyslij = wyslij
+        self.max_bytes = max_bytes
+        self.max_wierszy = max_wierszy
+        self.workers = max(workers, 1)
+        self.ponowienia = max(ponowienia, 0)
+        self.bledne: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+        self.stats = {"zapisane": 0, "bledne": 0, "batche": 0, "podzialy": 0, "ponowienia": 0, "bajty": 0,
+                      "czas_s": 0.0}
+
+    def _wyslij(self, batch: List[Any]):
+        """Wysyła batch; błędy przejściowe ponawia z wykładniczym backoffem (pełny jitter)."""
+        for proba in range(self.ponowienia + 1):
+            try:
+                return self.wyslij(batch)
+            except Exception as e:
+                if proba == self.ponowienia or not przejsciowy(e):
+                    raise
+                with self._lock:
+                    self.stats["ponowienia"] += 1
+                time.sleep(random.uniform(0, min(30.0, 0.5 * 2 ** proba)))
+
+    def _zapisz(self, batch: List[Any]):
+        try:
+            self._wyslij(batch)
+        except Exception as e:
+            # Awaria sieci/serwera dotyczy każdego kawałka – dzielenie mnożyłoby tylko zapytania
+            if len(batch) == 1 or przejsciowy(e):
+                with self._lock:
+                    self.stats["bledne"] += len(batch)
+                    self.bledne.extend({"row": row, "blad": str(e)} for row in batch)
+                return
+            with self._lock:
+                self.stats["podzialy"] += 1
+            polowa = len(batch) // 2
+            self._zapisz(batch[:polowa])
+            self._zapisz(batch[polowa:])
+            return
+        with self._lock:
+            self.stats["zapisane"] += len(batch)
+
+    def _zapisz_batch(self, batch: List[Any]):
+        with self._lock:
+            self.stats["batche"] += 1
+            self.stats["bajty"] += sum(rozmiar_wiersza(r) for r in batch)
+        self._zapisz(batch)
+
+    def zapisz(self, rows: Iterable[Any]) -> int:
+        """Zapisuje wszystkie wiersze; zwraca liczbę zapisanych."""
+        start = time.perf_counter()
+        przed = self.stats["zapisane"]
+        lista = list(batche(rows, self.max_bytes, self.max_wierszy))
+        if self.workers == 1 or len(lista) <= 1:
+            for batch in lista:
+                self._zapisz_batch(batch)
+        else:
+            with ThreadPoolExecutor(max_workers=min(self.workers, len(lista))) as executor:
+                list(executor.map(self._zapisz_batch, lista))
+        self.stats["czas_s"] += time.perf_counter() - start
+        return self.stats["zapisane"] - przed
+
+    def raport(self) -> str:
+        s = self.stats
+        tempo = s["zapisane"] / s["czas_s"] if s["czas_s"] else 0.0
+        tekst = (f"📦 {self.nazwa}: {s['zapisane']} wierszy w {s['batche']} batchach "
+                 f"({s['bajty'] / 1024:.0f} KB, {tempo:.0f} wierszy/s), podziały: {s['podzialy']}, "
+                 f"ponowienia: {s['ponowienia']}, "
+                 f"błędne wiersze: {s['bledne']}")
+        for b in self.bledne[:3]:
+            tekst += f"\n   ❌ {b['blad'][:200]} ← {b['row']}"
+        if len(self.bledne) > 3:
+            tekst += f"\n   … i {len(self.bledne) - 3} kolejnych"
+        return tekst
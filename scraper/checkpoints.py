@@ -0,0 +1,124 @@
+import gzip
+import json
+import os
+import shutil
+import threading
+import time
+from typing import Any, Dict, Iterable, Optional
+
+CHECKPOINT_DIR = os.getenv("SCRAPER_CHECKPOINT_DIR", os.path.join(".cache", "checkpoint"))
+
+
+class Postep:
+    """
+    Postęp wewnątrz etapu: klucze ukończonych elementów (grup, nauczycieli)
+    dopisywane do pliku JSONL – jedna linia na element, zapis od razu na dysk.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self.zrobione: set = set()
+        try:
+            with open(path, encoding="utf-8") as f:
+                for linia in f:
+                    try:
+                        self.zrobione.add(json.loads(linia))
+                    except ValueError:
+                        pass  # urwana ostatnia linia po awarii
+        except OSError:
+            pass
+        self._plik = open(path, "a", encoding="utf-8")
+
+    def oznacz(self, klucze: Iterable[Any]):
+        with self._lock:
+            nowe = [k for k in klucze if k not in self.zrobione]
+            if not nowe:
+                return
+            self.zrobione.update(nowe)
+            self._plik.write("".join(json.dumps(k) + "\n" for k in nowe))
+            self._plik.flush()
+
+    def zamknij(self):
+        with self._lock:
+            self._plik.close()
+
+
+class Checkpoint:
+    """
+    Punkty kontrolne przebiegu w katalogu SCRAPER_CHECKPOINT_DIR:
+    - wynik każdego ukończonego etapu jako skompresowany JSON (<etap>.json.gz),
+    - postęp wewnątrz długich etapów (<etap>.postep.jsonl),
+    - stan.json: ukończone etapy i parametry przebiegu.
+
+    Bez wznawiania katalog jest czyszczony na starcie. Przy wznawianiu
+    ukończone etapy są wczytywane z dysku, a w długich etapach pomijane są
+    elementy już zapisane do bazy. Parametry przebiegu (np. shard) muszą się
+    zgadzać, inaczej punkt kontrolny jest odrzucany.
+    """
+
+    def __init__(self, wznow: bool = False, katalog: str = CHECKPOINT_DIR,
+                 parametry: Optional[Dict[str, Any]] = None):
+        self.katalog = katalog
+        self.parametry = parametry or {}
+        self._postepy: Dict[str, Postep] = {}
+        stan = self._wczytaj_stan() if wznow else None
+        if stan is not None and stan.get("parametry") != self.parametry:
+            print(f"⚠️ Punkt kontrolny z innymi parametrami ({stan.get('parametry')}) – zaczynam od nowa")
+            stan = None
+        if stan is None:
+            shutil.rmtree(katalog, ignore_errors=True)
+            stan = {"parametry": self.parametry, "etapy": [], "start": time.time()}
+        elif stan["etapy"]:
+            print(f"⏯️ Wznawianie: ukończone etapy {', '.join(stan['etapy'])}")
+        self.stan = stan
+        os.makedirs(katalog, exist_ok=True)
+        self._zapisz_stan()
+
+    def _sciezka(self, nazwa: str) -> str:
+        return os.path.join(self.katalog, nazwa)
+
+    def _wczytaj_stan(self) -> Optional[Dict[str, Any]]:
+        try:
+            with open(self._sciezka("stan.json"), encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _zapisz_stan(self):
+        tmp = self._sciezka("stan.json.tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.stan, f)
+        os.replace(tmp, self._sciezka("stan.json"))
+
+    def ukonczony(self, etap: str) -> bool:
+        return etap in self.stan["etapy"]
+
+    def wczytaj(self, etap: str) -> Any:
+        with gzip.open(self._sciezka(f"{etap}.json.gz"), "rt", encoding="utf-8") as f:
+            return json.load(f)
+
+    def zapisz(self, etap: str, dane: Any):
+        """Zapisuje wynik etapu i oznacza go jako ukończony (atomowo: plik tymczasowy + rename)."""
+        tmp = self._sciezka(f"{etap}.json.gz.tmp")
+        with gzip.open(tmp, "wt", encoding="utf-8", compresslevel=5) as f:
+            json.dump(dane, f, ensure_ascii=False, separators=(",", ":"))
+        os.replace(tmp, self._sciezka(f"{etap}.json.gz"))
+        if etap not in self.stan["etapy"]:
+            self.stan["etapy"].append(etap)
+        self._zapisz_stan()
+        postep = self._postepy.pop(etap, None)
+        if postep is not None:
+            postep.zamknij()
+
+    def postep(self, etap: str) -> Postep:
+        if etap not in self._postepy:
+            self._postepy[etap] = Postep(self._sciezka(f"{etap}.postep.jsonl"))
+        return self._postepy[etap]
+
+    def zakoncz(self):
+        """Cały przebieg udany – punkt kontrolny nie jest już potrzebny."""
+        for postep in self._postepy.values():
+            postep.zamknij()
+        shutil.rmtree(self.katalog, ignore_errors=True)
+        print(f"🏁 Przebieg ukończony w {time.time() - self.stan['start']:.0f} s (licząc od pierwszego startu)")
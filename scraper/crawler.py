@@ -0,0 +1,194 @@
+import asyncio
+import time
+from urllib.parse import urlparse
+
+from scraper.http_client import AsyncHttpClient
+from scraper.metrics import get_metryki
+from scraper.ics_probe import probe_nauczyciele_ics_async
+from scraper.page_store import get_page_store
+from scraper.parsers.nauczyciel_parser import (
+    parse_nauczyciele_from_group_page,
+    parse_nauczyciel_details,
+    fetch_page,
+)
+
+
+async def _fetch_text(client: AsyncHttpClient, url: str, max_retries: int = 3,
+                      sleep_time: float = 2) -> str | None:
+    """
+    Asynchroniczny odpowiednik utils.fetch_page (te same retry i timeout).
+    """
+    for attempt in range(max_retries):
+        try:
+            resp = await client.get(url, timeout=15, use_cache=True)
+            resp.raise_for_status()
+            return resp.text
+        except Exception as e:
+            print(f"❌ Błąd pobierania strony: {url} — {e}")
+            if attempt < max_retries - 1:
+                get_metryki().licz("ponowienia", zrodlo="strona")
+                await asyncio.sleep(sleep_time)
+    get_metryki().licz("nieudane", zrodlo="strona")
+    return None
+
+
+async def crawl_nauczyciele_async(grupy: list[dict], max_concurrent: int = 32,
+                                  max_per_host: int = 16) -> tuple[list[dict], dict]:
+    """
+    Crawler ETAP 3: strony grup i strony nauczycieli pobierane są potokowo.
+
+    - max_concurrent: globalny limit równoległych pobrań (liczba workerów),
+    - max_per_host: limit równoległych pobrań na jeden host,
+    - wspólny zbiór `seen` gwarantuje, że każda strona nauczyciela pobierana jest raz.
+
+    Parsowanie HTML odbywa się w wątkach, żeby nie blokować pętli zdarzeń.
+    Strony grup pobrane w ETAP 2 brane są z magazynu artefaktów (page_store).
+    Linki ICS nauczycieli wybierane są na końcu zbiorczo (ics_probe), na tej samej puli połączeń.
+    Zwraca (lista nauczycieli, statystyki).
+    """
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue = asyncio.Queue()
+    host_limits: dict[str, asyncio.Semaphore] = {}
+    seen: set[str] = set()
+    nauczyciele_dict: dict[str, dict] = {}
+    do_sondowania: list[str] = []
+    store = get_page_store()
+    stats = {"strony_grup": 0, "strony_grup_z_magazynu": 0, "strony_nauczycieli": 0, "bledy": 0}
+
+    for grupa in grupy:
+        link = grupa.get("link_strony_grupy")
+        if link and link not in seen:
+            seen.add(link)
+            queue.put_nowait(("grupa", link, grupa))
+
+    async def fetch(client, url):
+        host = urlparse(url).netloc
+        if host not in host_limits:
+            host_limits[host] = asyncio.Semaphore(max_per_host)
+        async with host_limits[host]:
+            return await _fetch_text(client, url)
+
+    async def handle_grupa(client, url, grupa):
+        # Strona sparsowana już w ETAP 2 – bez ponownego pobierania i parsowania
+        artefakt = store.get(url)
+        if artefakt is not None:
+            stats["strony_grup_z_magazynu"] += 1
+            nauczyciele = artefakt["nauczyciele"]
+        else:
+            html = await fetch(client, url)
+            stats["strony_grup"] += 1
+            if html is None:
+                stats["bledy"] += 1
+                nauczyciele = parse_nauczyciele_from_group_page(html, grupa_id=grupa.get("grupa_id"))
+            else:
+                artefakt = await loop.run_in_executor(
+                    None, lambda: store.parsuj(url, html, grupa.get("grupa_id"))
+                )
+                nauczyciele = artefakt["nauczyciele"]
+        for n in nauczyciele:
+            link = n.get("link")
+            if link and link not in seen:
+                seen.add(link)
+                queue.put_nowait(("nauczyciel", link, n))
+
+    async def handle_nauczyciel(client, link, n):
+        html_n = await fetch(client, link)
+        stats["strony_nauczycieli"] += 1
+        if html_n:
+            details = await loop.run_in_executor(
+                None, lambda: parse_nauczyciel_details(html_n, n.get("nauczyciel_id"), sonduj_ics=False)
+            )
+        else:
+            stats["bledy"] += 1
+            details = {}
+        nauczyciele_dict[link] = {
+            "nazwa": n.get("nazwa"),
+            "instytut": details.get("instytut"),
+            "email": details.get("email"),
+            "link_strony_nauczyciela": link,
+            "link_ics_nauczyciela": details.get("link_ics_nauczyciela"),
+            "nauczyciel_id": n.get("nauczyciel_id"),
+        }
+        if html_n and n.get("nauczyciel_id"):
+            do_sondowania.append(link)
+
+    async def worker(client):
+        while True:
+            rodzaj, url, dane = await queue.get()
+            try:
+                if rodzaj == "grupa":
+                    await handle_grupa(client, url, dane)
+                else:
+                    await handle_nauczyciel(client, url, dane)
+            except Exception as e:
+                stats["bledy"] += 1
+                print(f"❌ Błąd przetwarzania {rodzaj}: {url} — {e}")
+            finally:
+                queue.task_done()
+
+    start = time.perf_counter()
+    async with AsyncHttpClient(limit=max_concurrent, limit_per_host=max_per_host) as client:
+        workers = [asyncio.create_task(worker(client)) for _ in range(max_concurrent)]
+        await queue.join()
+        for w in workers:
+            w.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+        linki_ics = await probe_nauczyciele_ics_async(
+            [nauczyciele_dict[link]["nauczyciel_id"] for link in do_sondowania],
+            max_concurrent=max_concurrent, client=client,
+        )
+        for link in do_sondowania:
+            n = nauczyciele_dict[link]
+            n["link_ics_nauczyciela"] = linki_ics.get(n["nauczyciel_id"])
+    elapsed = time.perf_counter() - start
+
+    strony = stats["strony_grup"] + stats["strony_nauczycieli"]
+    stats["czas_s"] = round(elapsed, 2)
+    stats["strony_na_s"] = round(strony / elapsed, 2) if elapsed > 0 else 0.0
+    return list(nauczyciele_dict.values()), stats
+
+
+def crawl_nauczyciele(grupy: list[dict], max_concurrent: int = 32, max_per_host: int = 16) -> list[dict]:
+    """
+    Synchroniczne wejście do crawlera ETAP 3 (wypisuje przepustowość w stronach/s).
+    """
+    nauczyciele, stats = asyncio.run(
+        crawl_nauczyciele_async(grupy, max_concurrent=max_concurrent, max_per_host=max_per_host)
+    )
+    print(
+        f"📊 ETAP 3: {stats['strony_grup']} stron grup (+{stats['strony_grup_z_magazynu']} z magazynu) "
+        f"+ {stats['strony_nauczycieli']} stron nauczycieli "
+        f"w {stats['czas_s']} s ({stats['strony_na_s']} stron/s, błędy: {stats['bledy']})"
+    )
+    return nauczyciele
+
+
+def crawl_nauczyciele_serial(grupy: list[dict]) -> list[dict]:
+    """
+    Dotychczasowa, szeregowa pętla ETAP 3 – zostawiona do porównań przepustowości.
+    """
+    start = time.perf_counter()
+    strony = 0
+    nauczyciele_dict = {}
+    for grupa in grupy:
+        html = fetch_page(grupa.get("link_strony_grupy"))
+        strony += 1
+        nauczyciele = parse_nauczyciele_from_group_page(html, grupa_id=grupa.get("grupa_id"))
+        for n in nauczyciele:
+            link = n.get("link")
+            if link and link not in nauczyciele_dict:
+                html_n = fetch_page(link)
+                strony += 1
+                details = parse_nauczyciel_details(html_n, n.get("nauczyciel_id")) if html_n else {}
+                nauczyciele_dict[link] = {
+                    "nazwa": n.get("nazwa"),
+                    "instytut": details.get("instytut"),
+                    "email": details.get("email"),
+                    "link_strony_nauczyciela": link,
+                    "link_ics_nauczyciela": details.get("link_ics_nauczyciela"),
+                    "nauczyciel_id": n.get("nauczyciel_id"),
+                }
+    elapsed = time.perf_counter() - start
+    print(f"📊 ETAP 3 (szeregowo): {strony} stron w {elapsed:.2f} s "
+          f"({strony / elapsed if elapsed > 0 else 0:.2f} stron/s)")
+    return list(nauczyciele_dict.values())
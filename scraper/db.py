@@ -1,32 +1,62 @@
-from dotenv import load_dotenv
+import hashlib
+import json
 import os
-from supabase import create_client
+import threading
+from datetime import datetime
+from scraper.bulk_writer import BulkWriter
+from scraper.id_map import KLUCZE_MAP, IdMapService, MapaId
+from scraper.metrics import get_metryki
+from scraper.storage import get_backend, wszystkie_wiersze
 from dataclasses import asdict, is_dataclass
 from typing import Dict, Any, List, Tuple
 
-load_dotenv()
-SUPABASE_URL = os.getenv("SUPABASE_URL")
-SUPABASE_SERVICE_ROLE_KEY = os.getenv("SUPABASE_SERVICE_ROLE_KEY")
-supabase = create_client(SUPABASE_URL, SUPABASE_SERVICE_ROLE_KEY)
+# Magazyn wybierany przez SCRAPER_STORAGE: Supabase (domyślnie) albo lokalny SQLite.
+# Tworzony przy pierwszym użyciu – sam import modułu nie łączy się z bazą ani nie importuje supabase.
+_storage = None
+# Mapy klucz → UUID (kierunki, grupy, nauczyciele), uzupełniane odpowiedziami upsertów
+_id_maps = None
+_lock = threading.Lock()
+
+
+def get_storage():
+    global _storage
+    with _lock:
+        if _storage is None:
+            _storage = get_backend()
+        return _storage
+
+
+def get_id_maps() -> IdMapService:
+    global _id_maps
+    storage = get_storage()
+    with _lock:
+        if _id_maps is None:
+            _id_maps = IdMapService(storage)
+        return _id_maps
+
+
+def __getattr__(nazwa):
+    # Zgodność wstecz: scraper.db.storage / scraper.db.id_maps
+    if nazwa == "storage":
+        return get_storage()
+    if nazwa == "id_maps":
+        return get_id_maps()
+    raise AttributeError(f"module {__name__!r} has no attribute {nazwa!r}")
 
 
 def get_uuid_map(table: str, key_col: str, id_col: str) -> Dict:
-    """Pobiera mapowanie kluczy do UUID z bazy."""
-    if table == "kierunki":
-        result = supabase.table(table).select(f"{key_col}, wydzial, {id_col}").execute()
-        return {
-            (str(row[key_col]).strip().casefold(), str(row["wydzial"]).strip().casefold()): row[id_col]
-            for row in result.data
-            if row.get(key_col) and row.get("wydzial")
-        }
-    else:
-        # Dla grup i nauczycieli - bez kolumny wydzial
-        result = supabase.table(table).select(f"{key_col}, {id_col}").execute()
-        return {
-            str(row[key_col]).strip().casefold(): row[id_col]
-            for row in result.data
-            if row.get(key_col)
-        }
+    """
+    Mapowanie kluczy do UUID z bazy (klucze po strip + casefold; dla kierunków (nazwa, wydzial)).
+    Dla tabel z KLUCZE_MAP mapa pochodzi z id_maps i nie wymaga ponownego czytania tabeli po zapisie.
+    """
+    kolumny = (key_col, "wydzial") if table == "kierunki" else (key_col,)
+    if KLUCZE_MAP.get(table) == kolumny and id_col == "id":
+        return get_id_maps().mapa(table)
+    mapa = MapaId()
+    for row in wszystkie_wiersze(get_storage(), table, ", ".join(kolumny + (id_col,))):
+        if all(row.get(k) for k in kolumny):
+            mapa.ustaw(tuple(row[k] for k in kolumny) if len(kolumny) > 1 else row[key_col], row[id_col])
+    return mapa
 
 
 def chunks(lst: List[Any], n: int):
@@ -35,31 +65,55 @@ def chunks(lst: List[Any], n: int):
         yield lst[i:i + n]
 
 
+def upsert_wsadowo(table, rows, on_conflict, batch_size=500, bledy=None, verbose=True, backend=None):
+    """
+    Upsert przez BulkWriter: batche po rozmiarze (najwyżej batch_size wierszy),
+    równolegle, z dzieleniem batchy z błędem. bledy: lista na wiersze niezapisane.
+    """
+    # Jawny backend (np. cel storage_sync) nie może wymuszać tworzenia domyślnego magazynu
+    backend = backend or get_storage()
+    if backend is _storage and table in KLUCZE_MAP:
+        # Upsert zwraca zapisane wiersze – ich id trafiają od razu do map UUID
+        id_maps = get_id_maps()
+        wyslij = lambda batch: id_maps.z_odpowiedzi(table, backend.upsert(table, batch, on_conflict, zwroc=True))  # noqa: E731
+    else:
+        wyslij = lambda batch: backend.upsert(table, batch, on_conflict)  # noqa: E731
+    metryki = get_metryki()
+
+    def wyslij_mierzone(batch):
+        with metryki.czas("db_batch_s", tabela=table, backend=backend.nazwa):
+            return wyslij(batch)
+
+    writer = BulkWriter(f"{table} ({backend.nazwa})", wyslij_mierzone, max_wierszy=batch_size)
+    zapisane = writer.zapisz(rows)
+    metryki.licz("db_wiersze", zapisane, tabela=table)
+    metryki.licz("db_czas_s", writer.stats["czas_s"], tabela=table)
+    if writer.bledne:
+        metryki.licz("db_bledne", len(writer.bledne), tabela=table)
+    if bledy is not None:
+        bledy.extend(b["row"] for b in writer.bledne)
+    if verbose or writer.bledne:
+        print(writer.raport())
+    return zapisane
+
+
 def save_kierunki(kierunki, batch_size=100):
     """Zapisuje kierunki do bazy z kontrolą duplikatów."""
     if not kierunki:
         return 0
 
-    total = 0
-    for batch in chunks(kierunki, batch_size):
-        data = []
-        for k in batch:
-            if is_dataclass(k):
-                k = asdict(k)
-            if not k.get("nazwa") or not k.get("wydzial"):
-                continue
-            data.append({
-                "nazwa": k["nazwa"],
-                "wydzial": k["wydzial"]
-            })
-
-        try:
-            supabase.table("kierunki").upsert(data, on_conflict="nazwa,wydzial").execute()
-            total += len(data)
-        except Exception as e:
-            print(f"❌ Błąd zapisu kierunków: {e}")
+    data = []
+    for k in kierunki:
+        if is_dataclass(k):
+            k = asdict(k)
+        if not k.get("nazwa") or not k.get("wydzial"):
+            continue
+        data.append({
+            "nazwa": k["nazwa"],
+            "wydzial": k["wydzial"]
+        })
 
-    return total
+    return upsert_wsadowo("kierunki", data, "nazwa,wydzial", batch_size)
 
 
 def save_grupy(grupy, batch_size=500):
@@ -75,28 +129,20 @@ def save_grupy(grupy, batch_size=500):
             seen.add(key)
             unique_grupy.append(g)
 
-    total = 0
-    for batch in chunks(unique_grupy, batch_size):
-        data = []
-        for g in batch:
-            if is_dataclass(g):
-                g = asdict(g)
-            data.append({
-                "kod_grupy": g.get("kod_grupy"),
-                "kierunek_id": g.get("kierunek_id"),
-                "link_strony_grupy": g.get("link_strony_grupy"),
-                "link_ics_grupy": g.get("link_ics_grupy"),
-                "tryb_studiow": g.get("tryb_studiow"),
-                "grupa_id": g.get("grupa_id")
-            })
-
-        try:
-            supabase.table("grupy").upsert(data, on_conflict="kod_grupy,kierunek_id").execute()
-            total += len(data)
-        except Exception as e:
-            print(f"❌ Błąd zapisu grup: {e}")
+    data = []
+    for g in unique_grupy:
+        if is_dataclass(g):
+            g = asdict(g)
+        data.append({
+            "kod_grupy": g.get("kod_grupy"),
+            "kierunek_id": g.get("kierunek_id"),
+            "link_strony_grupy": g.get("link_strony_grupy"),
+            "link_ics_grupy": g.get("link_ics_grupy"),
+            "tryb_studiow": g.get("tryb_studiow"),
+            "grupa_id": g.get("grupa_id")
+        })
 
-    return total
+    return upsert_wsadowo("grupy", data, "kod_grupy,kierunek_id", batch_size)
 
 
 def save_nauczyciele(nauczyciele, batch_size=500):
@@ -133,35 +179,12 @@ def save_nauczyciele(nauczyciele, batch_size=500):
 
     # Etap 2: Konwersja do listy i zapis
     nauczyciele_list = list(nauczyciele_by_link.values())
-    total = 0
-    for batch in chunks(nauczyciele_list, batch_size):
-        try:
-            # Upsert z konfliktem na link_strony_nauczyciela
-            supabase.table('nauczyciele').upsert(
-                batch,
-                on_conflict='link_strony_nauczyciela'
-            ).execute()
-            total += len(batch)
-        except Exception as e:
-            print(f"❌ Błąd zapisu batcha nauczycieli: {e}")
-            if batch:
-                print(f"Przykładowy rekord z błędem: {batch[0]}")
-
-    return total
-
-
-def save_zajecia_grupy(events, grupa_uuid_map, batch_size=500):
-    if not events:
-        return 0
-
-    # Diagnostyka - sprawdź mapowanie UUID
-    if not grupa_uuid_map:
-        print("⚠️ UWAGA: grupa_uuid_map jest puste! Najpierw dodaj grupy do bazy.")
-        return 0
+    # Upsert z konfliktem na link_strony_nauczyciela
+    return upsert_wsadowo('nauczyciele', nauczyciele_list, 'link_strony_nauczyciela', batch_size)
 
-    print(f"ℹ️ Znaleziono {len(grupa_uuid_map)} grup w mapowaniu UUID")
 
-    total = 0
+def _wiersze_zajec_grupy(events, grupa_uuid_map, verbose=True):
+    """Wiersze tabeli zajecia_grupy z wydarzeń, bez duplikatów (uid, grupa_id)."""
     pominiete = 0
 
     # Deduplikacja po (uid, grupa_id)
@@ -196,39 +219,32 @@ def save_zajecia_grupy(events, grupa_uuid_map, batch_size=500):
             'link_ics_zrodlowy': event.get('link_ics_zrodlowy')
         })
 
-    print(f"ℹ️ Pominięto {pominiete} zajęć bez UUID grupy")
-    print(f"ℹ️ Przygotowano {len(batch_data)} unikalnych zajęć do zapisu")
-
-    # Zapis w batchach
-    for batch in chunks(batch_data, batch_size):
-        # Deduplikacja w batchu (na wszelki wypadek)
-        batch_seen = set()
-        dedup_batch = []
-        for e in batch:
-            key = (e['uid'], e['grupa_id'])
-            if key in batch_seen:
-                continue
-            batch_seen.add(key)
-            dedup_batch.append(e)
-        if not dedup_batch:
-            continue
-        try:
-            supabase.table('zajecia_grupy').upsert(dedup_batch, on_conflict='uid,grupa_id').execute()
-            total += len(dedup_batch)
-        except Exception as e:
-            print(f"❌ Błąd podczas upsertowania batcha zajęć grup: {e}")
-            if dedup_batch:
-                print(f"Przykładowy rekord z błędem: {dedup_batch[0]}")
-    return total
+    if verbose:
+        print(f"ℹ️ Pominięto {pominiete} zajęć bez UUID grupy")
+        print(f"ℹ️ Przygotowano {len(batch_data)} unikalnych zajęć do zapisu")
+    return batch_data
 
 
-def save_zajecia_nauczyciela(events, nauczyciel_uuid_map=None, batch_size=1000):
+def save_zajecia_grupy(events, grupa_uuid_map, batch_size=500, verbose=True, bledy=None):
+    """bledy: lista, do której trafiają wiersze z batchy, których nie udało się zapisać."""
     if not events:
         return 0
 
-    total = 0
-    batch_data = []
+    # Diagnostyka - sprawdź mapowanie UUID
+    if not grupa_uuid_map:
+        print("⚠️ UWAGA: grupa_uuid_map jest puste! Najpierw dodaj grupy do bazy.")
+        return 0
+
+    if verbose:
+        print(f"ℹ️ Znaleziono {len(grupa_uuid_map)} grup w mapowaniu UUID")
 
+    batch_data = _wiersze_zajec_grupy(events, grupa_uuid_map, verbose)
+    return upsert_wsadowo('zajecia_grupy', batch_data, 'uid,grupa_id', batch_size, bledy, verbose)
+
+
+def _wiersze_zajec_nauczyciela(events):
+    """Wiersze tabeli zajecia_nauczyciela z wydarzeń (z wymaganymi polami)."""
+    batch_data = []
     for event in events:
         if is_dataclass(event):
             event = asdict(event)
@@ -253,16 +269,142 @@ def save_zajecia_nauczyciela(events, nauczyciel_uuid_map=None, batch_size=1000):
             'nauczyciel_id': uuid,
             'link_ics_zrodlowy': event.get('link_ics_zrodlowy')
         })
+    return batch_data
 
-    for batch in chunks(batch_data, batch_size):
-        if not batch:
-            continue
+
+def save_zajecia_nauczyciela(events, nauczyciel_uuid_map=None, batch_size=1000, bledy=None):
+    """bledy: lista, do której trafiają wiersze z batchy, których nie udało się zapisać."""
+    if not events:
+        return 0
+
+    batch_data = _wiersze_zajec_nauczyciela(events)
+    return upsert_wsadowo('zajecia_nauczyciela', batch_data, 'uid,nauczyciel_id', batch_size, bledy)
+
+
+# --- Sekcja: Synchronizacja zajęć przez różnicę (insert / update / delete) ---
+
+# Tryb zapisu zajęć: "diff" (tylko zmiany + usuwanie nieaktualnych) albo "upsert" (wszystko, bez usuwania)
+DB_SYNC = os.getenv("SCRAPER_DB_SYNC", "diff")
+
+# tabela → (kolumna właściciela, kolumny wchodzące do sumy kontrolnej wiersza)
+KOLUMNY_ZAJEC = {
+    "zajecia_grupy": ("grupa_id", ("uid", "podgrupa", "od", "do_", "przedmiot", "rz", "nauczyciel",
+                                   "miejsce", "link_ics_zrodlowy")),
+    "zajecia_nauczyciela": ("nauczyciel_id", ("uid", "od", "do_", "przedmiot", "rz", "grupy",
+                                              "miejsce", "link_ics_zrodlowy")),
+}
+
+
+def _normalizuj(kolumna, wartosc):
+    # Kolumny od/do_ to timestamp without time zone: Postgres pomija strefę i zwraca "YYYY-MM-DDTHH:MM:SS"
+    if kolumna in ("od", "do_") and wartosc:
         try:
-            supabase.table('zajecia_nauczyciela').upsert(batch, on_conflict='uid,nauczyciel_id').execute()
-            total += len(batch)
-        except Exception as e:
-            print(f"❌ Błąd podczas upsertowania batcha zajęć nauczyciela: {e}")
-            if batch:
-                print(f"Przykładowy rekord z błędem: {batch[0]}")
-
-    return total
+            return datetime.fromisoformat(str(wartosc)).replace(tzinfo=None).isoformat(timespec="seconds")
+        except ValueError:
+            return str(wartosc)
+    return wartosc if wartosc is not None else ""
+
+
+def suma_wiersza(row: Dict[str, Any], kolumny: Tuple[str, ...]) -> str:
+    """Suma kontrolna wiersza zajęć (porównywalna dla danych z ICS i z bazy)."""
+    return hashlib.sha1(
+        json.dumps([_normalizuj(k, row.get(k)) for k in kolumny], ensure_ascii=False).encode("utf-8")
+    ).hexdigest()
+
+
+def _pobierz_istniejace(backend, table, kol_wlasciciela, wlasciciele, kolumny, page=1000, owners_per_query=100):
+    """(właściciel, uid) → (id, suma, link_ics_zrodlowy) dla wierszy wskazanych właścicieli, stronicowanie po id."""
+    istniejace = {}
+    wybor = ",".join(("id", kol_wlasciciela) + kolumny)
+    for grupa_wl in chunks(sorted(wlasciciele), owners_per_query):
+        for row in wszystkie_wiersze(backend, table, wybor, in_=(kol_wlasciciela, grupa_wl), page=page):
+            istniejace[(row[kol_wlasciciela], row["uid"])] = (
+                row["id"], suma_wiersza(row, kolumny), row.get("link_ics_zrodlowy")
+            )
+    return istniejace
+
+
+def sync_zajecia(table, rows, wlasciciele, batch_size=500, bledy=None, verbose=True, backend=None):
+    """
+    Synchronizuje zajęcia wskazanych właścicieli (grup/nauczycieli) z bazą:
+    wczytuje istniejące uid i sumy kontrolne, a wysyła tylko nowe i zmienione
+    wiersze oraz usuwa wiersze, których nie ma już w źródle.
+
+    wlasciciele: UUID-y właścicieli, dla których rows to komplet zajęć (także puste plany);
+    tylko ich nieaktualne wiersze są usuwane. Pozostałe wiersze są po prostu zapisywane.
+    Zwraca statystyki {"dodane", "zmienione", "usuniete", "bez_zmian", "bledy"}.
+    """
+    backend = backend or get_storage()
+    kol_wlasciciela, kolumny = KOLUMNY_ZAJEC[table]
+    on_conflict = f"uid,{kol_wlasciciela}"
+    stats = {"dodane": 0, "zmienione": 0, "usuniete": 0, "bez_zmian": 0, "bledy": 0}
+    wlasciciele = set(wlasciciele)
+    if not wlasciciele and not rows:
+        return stats
+
+    try:
+        istniejace = _pobierz_istniejace(backend, table, kol_wlasciciela, wlasciciele, kolumny) if wlasciciele else {}
+    except Exception as e:
+        # Bez stanu bazy nie da się policzyć różnicy – zapis jak dotąd (upsert, bez usuwania)
+        print(f"⚠️ Nie udało się wczytać istniejących zajęć ({table}), zapisuję wszystko: {e}")
+        istniejace = None
+
+    do_zapisu = []
+    nowe_klucze = set()
+    for row in rows:
+        klucz = (row[kol_wlasciciela], row["uid"])
+        if klucz in nowe_klucze:
+            continue
+        nowe_klucze.add(klucz)
+        stary = istniejace.get(klucz) if istniejace is not None else None
+        if stary is None:
+            stats["dodane"] += 1
+            do_zapisu.append(row)
+        elif stary[1] != suma_wiersza(row, kolumny):
+            stats["zmienione"] += 1
+            do_zapisu.append(row)
+        else:
+            stats["bez_zmian"] += 1
+    do_usuniecia = [] if istniejace is None else [
+        (id_, wlasciciel, uid, link) for (wlasciciel, uid), (id_, _, link) in istniejace.items()
+        if (wlasciciel, uid) not in nowe_klucze
+    ]
+
+    niezapisane = []
+    upsert_wsadowo(table, do_zapisu, on_conflict, batch_size, niezapisane, verbose=False, backend=backend)
+    usuwanie = BulkWriter(
+        f"{table} (usuwanie, {backend.nazwa})",
+        lambda batch: backend.delete(table, "id", [id_ for id_, _, _, _ in batch]),
+        max_wierszy=100,
+    )
+    stats["usuniete"] = usuwanie.zapisz(do_usuniecia)
+    if usuwanie.bledne:
+        print(usuwanie.raport())
+    stats["bledy"] = len(niezapisane) + len(usuwanie.bledne)
+    if bledy is not None:
+        bledy.extend(niezapisane)
+        # Nieusunięty wiersz: id do ponowienia, właściciel i źródło, żeby nie zatwierdzić ich odcisku
+        bledy.extend({"id": id_, kol_wlasciciela: wlasciciel, "uid": uid, "link_ics_zrodlowy": link,
+                      "blad": b["blad"]}
+                     for b in usuwanie.bledne for id_, wlasciciel, uid, link in [b["row"]])
+
+    metryki = get_metryki()
+    for wynik in ("dodane", "zmienione", "usuniete", "bez_zmian"):
+        metryki.licz("db_sync", stats[wynik], tabela=table, wynik=wynik)
+    if verbose:
+        print(f"🔁 {table}: {stats['dodane']} nowych, {stats['zmienione']} zmienionych, "
+              f"{stats['usuniete']} usuniętych, {stats['bez_zmian']} bez zmian, błędy: {stats['bledy']}")
+    return stats
+
+
+def sync_zajecia_grupy(events, grupa_uuid_map, grupa_ids=(), batch_size=500, bledy=None, verbose=True):
+    """Synchronizacja zajęć grup; grupa_ids: grupy, których plany (także puste) są w events."""
+    rows = _wiersze_zajec_grupy(events, grupa_uuid_map, verbose=False)
+    wlasciciele = {grupa_uuid_map[str(g)] for g in grupa_ids if str(g) in grupa_uuid_map}
+    return sync_zajecia("zajecia_grupy", rows, wlasciciele, batch_size, bledy, verbose)
+
+
+def sync_zajecia_nauczyciela(events, nauczyciel_ids=(), batch_size=1000, bledy=None, verbose=True):
+    """Synchronizacja zajęć nauczycieli; nauczyciel_ids: UUID-y nauczycieli, których plany są w events."""
+    rows = _wiersze_zajec_nauczyciela(events)
+    return sync_zajecia("zajecia_nauczyciela", rows, set(nauczyciel_ids), batch_size, bledy, verbose)
@@ -1,69 +1,153 @@
-import aiohttp
 import asyncio
+import time
+
+from scraper.adaptive_limiter import AdaptiveLimiter
+from scraper.http_client import AsyncHttpClient, HttpResult, retry_after_s
+from scraper.metrics import get_metryki
+from scraper.variant_store import VariantStore, WARIANTY
 
 BASE_URL = "https://plan.uz.zgora.pl/"
 
 
-async def fetch_ics_with_fallback(session: aiohttp.ClientSession, grupa_id: str, max_retries: int = 3) -> dict:
+async def _get_ics(client: AsyncHttpClient, url: str, max_retries: int = 3,
+                   limiter: AdaptiveLimiter | None = None, zrodlo: str = "ics_grupy") -> tuple[HttpResult | None, int]:
+    """
+    GET z ponowieniami: wyjątki i statusy inne niż 200/404 ponawiane są z backoffem.
+    Zwraca (ostatnia odpowiedź albo None, liczba zapytań).
+    """
+    resp = None
+    for attempt in range(max_retries):
+        ostatnia = attempt == max_retries - 1
+        if limiter:
+            await limiter.acquire()
+        start = time.perf_counter()
+        odpowiedz, ponow_za = None, None
+        try:
+            odpowiedz = await client.get(url, timeout=15, use_cache=True)
+            ponow_za = retry_after_s(odpowiedz.headers) if odpowiedz.status in (429, 503) else None
+        except Exception:
+            pass
+        finally:
+            # Slot wraca do limitera także przy anulowaniu (CancelledError nie jest Exception)
+            if limiter:
+                ok = odpowiedz is not None and odpowiedz.status < 500 and odpowiedz.status != 429
+                await limiter.release(time.perf_counter() - start, ok=ok, retry_after_s=ponow_za)
+        if odpowiedz is None:
+            if not ostatnia:
+                get_metryki().licz("ponowienia", zrodlo=zrodlo, przyczyna="wyjatek")
+                await asyncio.sleep(limiter.backoff_s(attempt) if limiter else 1)
+            continue
+        resp = odpowiedz
+        if resp.status in (200, 404):
+            return resp, attempt + 1
+        # Po ostatniej próbie backoff tylko opóźniałby zwrócenie błędu
+        if not ostatnia:
+            get_metryki().licz("ponowienia", zrodlo=zrodlo, przyczyna=resp.status)
+            await asyncio.sleep(limiter.backoff_s(attempt, ponow_za) if limiter else 1)
+    return resp, max_retries
+
+
+def _jest_plan(resp: HttpResult | None) -> bool:
+    return resp is not None and resp.status == 200 and resp.text.strip().startswith("BEGIN:VCALENDAR") \
+        and "VEVENT" in resp.text
+
+
+async def fetch_ics_with_fallback(client: AsyncHttpClient, grupa_id: str, max_retries: int = 3,
+                                  warianty: VariantStore | None = None,
+                                  limiter: AdaptiveLimiter | None = None) -> dict:
     """
     Pobiera ICS-y dla grupy w kolejności:
     1. ...&s=0 (letni)
     2. ...&s=1 (zimowy)
     3. bez &s (domyślny)
-    Zwraca dict: {'status', 'ics_content', 'link_ics_zrodlowy', 'grupa_id'}
+    Jeśli podano `warianty`, zaczyna od wariantu, który ostatnio zadziałał.
+    Jeśli podano `limiter`, każde zapytanie zajmuje slot adaptacyjnego limitera (AIMD).
+    Zwraca dict: {'status', 'ics_content', 'link_ics_zrodlowy', 'grupa_id', 'zapytania'}
     """
-    urls = [
-        f"{BASE_URL}grupy_ics.php?ID={grupa_id}&KIND=GG&s=0",
-        f"{BASE_URL}grupy_ics.php?ID={grupa_id}&KIND=GG&s=1",
-        f"{BASE_URL}grupy_ics.php?ID={grupa_id}&KIND=GG"
-    ]
-    for url in urls:
-        for attempt in range(max_retries):
-            try:
-                async with session.get(url, timeout=15) as resp:
-                    if resp.status == 200:
-                        text = await resp.text()
-                        if text.strip().startswith("BEGIN:VCALENDAR") and "VEVENT" in text:
-                            return {
-                                'status': 'success',
-                                'ics_content': text,
-                                'link_ics_zrodlowy': url,
-                                'grupa_id': grupa_id
-                            }
-                        else:
-                            break  # To nie jest plik ICS
-                    elif resp.status == 404:
-                        break  # przejdź do kolejnego url
-                    else:
-                        await asyncio.sleep(1)
-            except Exception:
-                if attempt < max_retries - 1:
-                    await asyncio.sleep(1)
-                else:
-                    continue
+    kolejnosc = warianty.kolejnosc(grupa_id) if warianty else WARIANTY
+    base = f"{BASE_URL}grupy_ics.php?ID={grupa_id}&KIND=GG"
+    zapytania = 0
+    for wariant in kolejnosc:
+        url = base + wariant
+        resp, n = await _get_ics(client, url, max_retries, limiter)
+        zapytania += n
+        if _jest_plan(resp):
+            if warianty:
+                warianty.zapisz_wynik(grupa_id, wariant)
+            return {
+                'status': 'success',
+                'ics_content': resp.text,
+                'link_ics_zrodlowy': url,
+                'grupa_id': grupa_id,
+                'zapytania': zapytania
+            }
     # Jeśli żaden nie istnieje:
     return {
         'status': 'not_found',
         'ics_content': None,
-        'link_ics_zrodlowy': urls[-1],
-        'grupa_id': grupa_id
+        'link_ics_zrodlowy': base,
+        'grupa_id': grupa_id,
+        'zapytania': zapytania
+    }
+
+
+def zrodla_ics_nauczyciela(nauczyciel_id: str) -> list[str]:
+    """Wszystkie możliwe link_ics_zrodlowy z fetch_ics_nauczyciela (klucze odcisków)."""
+    base = f"{BASE_URL}nauczyciel_ics.php?ID={nauczyciel_id}&KIND=GG"
+    return [f"{base}&S=0 + {base}&S=1", f"{base}&S=0", f"{base}&S=1", base]
+
+
+async def fetch_ics_nauczyciela(client: AsyncHttpClient, nauczyciel_id: str, max_retries: int = 3,
+                                limiter: AdaptiveLimiter | None = None) -> dict:
+    """
+    Asynchroniczny odpowiednik ics_updater.pobierz_plan_ics_nauczyciela (nauczyciel_id: ID z UZ).
+    Oba semestry (S=0, S=1) pobierane są równolegle; gdy żaden nie ma zajęć – plan ogólny.
+    Zwraca dict: {'status', 'pliki': [(link, treść)], 'link_ics_zrodlowy', 'nauczyciel_id', 'zapytania'};
+    łączeniem semestrów (po UID wydarzeń) zajmuje się parsowanie.
+    """
+    base = f"{BASE_URL}nauczyciel_ics.php?ID={nauczyciel_id}&KIND=GG"
+    semestry = [f"{base}&S=0", f"{base}&S=1"]
+    wyniki = await asyncio.gather(*(_get_ics(client, url, max_retries, limiter, "ics_nauczyciela")
+                                    for url in semestry))
+    zapytania = sum(n for _, n in wyniki)
+    pliki = [(url, resp.text) for url, (resp, _) in zip(semestry, wyniki) if _jest_plan(resp)]
+    if not pliki:
+        resp, n = await _get_ics(client, base, max_retries, limiter, "ics_nauczyciela")
+        zapytania += n
+        if _jest_plan(resp):
+            pliki = [(base, resp.text)]
+    return {
+        'status': 'success' if pliki else 'not_found',
+        'pliki': pliki,
+        # Jak w pobierz_plan_ics_nauczyciela: link obu semestrów to "S=0 + S=1"
+        'link_ics_zrodlowy': " + ".join(url for url, _ in pliki) or base,
+        'nauczyciel_id': nauczyciel_id,
+        'zapytania': zapytania
     }
 
 
 async def fetch_all_ics(grupa_ids: list[str], max_concurrent: int = 100) -> list[dict]:
     """
     Asynchronicznie pobiera ICS-y dla wszystkich grup.
+    Współbieżność dobiera adaptacyjny limiter AIMD; max_concurrent to górna granica.
     """
     results = []
-    sema = asyncio.Semaphore(max_concurrent)
-    async with aiohttp.ClientSession() as session:
-        async def limited_fetch(grupa_id):
-            async with sema:
-                return await fetch_ics_with_fallback(session, grupa_id)
-        tasks = [limited_fetch(grupa_id) for grupa_id in grupa_ids]
+    limiter = AdaptiveLimiter(initial=min(16, max_concurrent), max_limit=max_concurrent)
+    warianty = VariantStore()
+    async with AsyncHttpClient(limit=max_concurrent, limit_per_host=max_concurrent) as client:
+        tasks = [
+            fetch_ics_with_fallback(client, grupa_id, warianty=warianty, limiter=limiter)
+            for grupa_id in grupa_ids
+        ]
         for fut in asyncio.as_completed(tasks):
             result = await fut
             results.append(result)
+    warianty.save()
+    zapytania = sum(r['zapytania'] for r in results)
+    tryb = "pełne sondowanie" if warianty.pelne_sondowanie else "wyuczona kolejność"
+    print(f"📊 ICS grup: {zapytania} zapytań dla {len(results)} grup "
+          f"({zapytania / len(results) if results else 0:.2f} na grupę, {tryb})")
+    print(limiter.raport())
     return results
 
 
@@ -0,0 +1,107 @@
+import hashlib
+import json
+import os
+import threading
+from typing import Optional
+
+from scraper.parsers.ics_fast import split_property, unfold
+
+FINGERPRINTS_PATH = os.getenv("SCRAPER_FINGERPRINTS_PATH", os.path.join(".cache", "ics_fingerprints.json"))
+# SCRAPER_FORCE_FULL=1: przetwarzaj wszystkie źródła (np. po wyczyszczeniu tabel w bazie)
+FORCE_FULL = os.getenv("SCRAPER_FORCE_FULL", "0") == "1"
+# Pola zmieniające się przy każdym pobraniu, bez zmiany planu
+POLA_ZMIENNE = {"DTSTAMP"}
+
+
+def odcisk_ics(ics_content: str) -> str:
+    """Skrót treści ICS po rozwinięciu linii, bez pól zmiennych (DTSTAMP)."""
+    h = hashlib.sha256()
+    for line in unfold(ics_content):
+        if not line or split_property(line)[0] in POLA_ZMIENNE:
+            continue
+        h.update(line.encode("utf-8"))
+        h.update(b"\n")
+    return h.hexdigest()
+
+
+class FingerprintStore:
+    """
+    Odciski źródeł ICS (link_ics_zrodlowy → skrót) z ostatniego udanego zapisu.
+    Źródło z tym samym odciskiem nie jest ponownie parsowane ani zapisywane.
+    Odcisk zatwierdzamy dopiero po zapisaniu zajęć, więc błąd zapisu nie gubi zmian.
+
+    Odciski mówią, co jest w konkretnej bazie, więc plik trzyma osobny zestaw
+    na każdy adres magazynu (backend.adres, jak mapy UUID) – przebieg do SQLite
+    nie sprawi, że przebieg do Supabase pominie źródła, których tam nie zapisał.
+    """
+
+    def __init__(self, path: str = FINGERPRINTS_PATH, wymus: bool = FORCE_FULL, adres: str = ""):
+        self.path = path
+        self.wymus = wymus
+        self.adres = adres
+        self._lock = threading.Lock()
+        self._odciski: dict[str, str] = {}
+        self._inne_bazy: dict[str, dict[str, str]] = {}
+        self.stats = {"nowe": 0, "zmienione": 0, "niezmienione": 0, "zatwierdzone": 0}
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                dane = json.load(f)
+            # Plik bez podziału na bazy (sam słownik odcisków) nie wiadomo której dotyczy – pomijany
+            self._inne_bazy = dane.get("bazy", {}) if isinstance(dane.get("bazy"), dict) else {}
+            self._odciski = self._inne_bazy.pop(adres, {})
+        except (OSError, ValueError, AttributeError):
+            pass
+
+    def sprawdz(self, link: str, ics_content: str) -> tuple[bool, str]:
+        """Zwraca (czy_do_przetworzenia, odcisk)."""
+        odcisk = odcisk_ics(ics_content)
+        poprzedni = self._odciski.get(link)
+        with self._lock:
+            if poprzedni is None:
+                self.stats["nowe"] += 1
+            elif poprzedni != odcisk:
+                self.stats["zmienione"] += 1
+            else:
+                self.stats["niezmienione"] += 1
+        return self.wymus or poprzedni != odcisk, odcisk
+
+    def zatwierdz(self, link: str, odcisk: str):
+        with self._lock:
+            self._odciski[link] = odcisk
+            self.stats["zatwierdzone"] += 1
+
+    def zapomnij(self, linki):
+        """Usuwa odciski – np. gdy w bazie są już wiersze z innego źródła niż ten ICS."""
+        with self._lock:
+            for link in linki:
+                self._odciski.pop(link, None)
+
+    def save(self):
+        with self._lock:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            tmp = self.path + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump({"bazy": {**self._inne_bazy, self.adres: self._odciski}}, f)
+            os.replace(tmp, self.path)
+
+    def raport(self) -> str:
+        s = self.stats
+        wymuszone = " (wymuszone pełne przetwarzanie)" if self.wymus else ""
+        return (
+            f"🧬 Źródła ICS: {s['zmienione']} zmienionych, {s['nowe']} nowych, "
+            f"{s['niezmienione']} bez zmian{wymuszone}; zatwierdzono {s['zatwierdzone']}"
+        )
+
+
+_store: Optional[FingerprintStore] = None
+_store_lock = threading.Lock()
+
+
+def get_fingerprint_store() -> FingerprintStore:
+    global _store
+    with _store_lock:
+        if _store is None:
+            from scraper.db import get_storage
+
+            _store = FingerprintStore(adres=get_storage().adres)
+        return _store
@@ -0,0 +1,246 @@
+import atexit
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+
+# Katalog i limity cache można nadpisać zmiennymi środowiskowymi:
+# SCRAPER_HTTP_CACHE=0 wyłącza cache, SCRAPER_CACHE_TTL="wzorzec=sekundy,..." ustawia TTL.
+CACHE_DIR = os.getenv("SCRAPER_CACHE_DIR", os.path.join(".cache", "http"))
+CACHE_MAX_BYTES = int(os.getenv("SCRAPER_CACHE_MAX_BYTES", str(512 * 1024 * 1024)))
+
+# Domyślnie każdy wpis jest rewalidowany (TTL = 0). Reguły: (regex na URL, TTL w sekundach),
+# np. (r"grupy_lista_kierunkow\.php", 3600). Reguły ze zmiennej środowiskowej mają pierwszeństwo.
+DEFAULT_TTL_RULES: list[tuple[str, float]] = []
+
+
+def parse_ttl_rules(spec: str | None) -> list[tuple[str, float]]:
+    """
+    Zamienia napis "wzorzec=sekundy,wzorzec=sekundy" na listę reguł TTL.
+    """
+    rules = []
+    for part in (spec or "").split(","):
+        if "=" not in part:
+            continue
+        pattern, seconds = part.rsplit("=", 1)
+        try:
+            rules.append((pattern.strip(), float(seconds)))
+        except ValueError:
+            print(f"⚠️ Niepoprawna reguła TTL cache: {part}")
+    return rules
+
+
+def body_hash(body: str) -> str:
+    return hashlib.sha256(body.encode("utf-8", errors="surrogatepass")).hexdigest()
+
+
+class HttpCache:
+    """
+    Dyskowy cache odpowiedzi HTTP z kluczem URL.
+
+    - zapamiętuje ETag/Last-Modified i wysyła If-None-Match/If-Modified-Since,
+    - gdy serwer nie podaje walidatorów, porównuje hash treści (wykrywa brak zmian),
+    - usuwa najdawniej używane wpisy po przekroczeniu max_bytes (LRU),
+    - reguły TTL pozwalają dla wybranych URL-i pominąć zapytanie w ogóle.
+    """
+
+    def __init__(self, katalog: str = CACHE_DIR, max_bytes: int = CACHE_MAX_BYTES,
+                 ttl_rules: list[tuple[str, float]] | None = None, enabled: bool = True):
+        self.katalog = katalog
+        self.max_bytes = max_bytes
+        self.enabled = enabled
+        self.ttl_rules = [(re.compile(p), ttl) for p, ttl in (ttl_rules or [])]
+        self._lock = threading.Lock()
+        self._index: OrderedDict[str, dict] = OrderedDict()
+        self._size = 0
+        self._dirty = False
+        self.stats = {
+            "trafienia": 0,
+            "chybienia": 0,
+            "rewalidacje": 0,
+            "niezmienione": 0,
+            "bajty_pobrane": 0,
+            "bajty_zaoszczedzone": 0,
+            "sekundy_zaoszczedzone": 0.0,
+        }
+        if self.enabled:
+            self._load()
+
+    # --- Sekcja: Indeks na dysku ---
+
+    def _index_path(self) -> str:
+        return os.path.join(self.katalog, "index.json")
+
+    def _body_path(self, url: str) -> str:
+        return os.path.join(self.katalog, hashlib.sha1(url.encode()).hexdigest() + ".body")
+
+    def _load(self):
+        try:
+            with open(self._index_path(), encoding="utf-8") as f:
+                entries = json.load(f)
+        except (OSError, ValueError):
+            return
+        # Indeks zapisywany jest w kolejności LRU (od najdawniej używanego)
+        for url, entry in sorted(entries.items(), key=lambda kv: kv[1].get("last_used", 0)):
+            self._index[url] = entry
+            self._size += entry.get("size", 0)
+
+    def save(self):
+        if not self.enabled or not self._dirty:
+            return
+        with self._lock:
+            os.makedirs(self.katalog, exist_ok=True)
+            tmp = self._index_path() + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(self._index, f)
+            os.replace(tmp, self._index_path())
+            self._dirty = False
+
+    def _read_body(self, url: str) -> str | None:
+        try:
+            with open(self._body_path(url), encoding="utf-8", errors="surrogatepass", newline="") as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def _evict(self):
+        while self._size > self.max_bytes and self._index:
+            url, entry = self._index.popitem(last=False)
+            self._size -= entry.get("size", 0)
+            try:
+                os.remove(self._body_path(url))
+            except OSError:
+                pass
+
+    def _touch(self, url: str, entry: dict):
+        entry["last_used"] = time.time()
+        self._index.move_to_end(url)
+        self._dirty = True
+
+    # --- Sekcja: API dla funkcji pobierających ---
+
+    def ttl_for(self, url: str) -> float:
+        for pattern, ttl in self.ttl_rules:
+            if pattern.search(url):
+                return ttl
+        return 0
+
+    def fresh(self, url: str) -> str | None:
+        """Zwraca treść z cache, jeśli wpis mieści się w TTL (bez zapytania do serwera)."""
+        if not self.enabled:
+            return None
+        ttl = self.ttl_for(url)
+        if ttl <= 0:
+            return None
+        with self._lock:
+            entry = self._index.get(url)
+            if not entry or time.time() - entry["stored_at"] > ttl:
+                return None
+            body = self._read_body(url)
+            if body is None:
+                return None
+            self._touch(url, entry)
+            self.stats["trafienia"] += 1
+            self.stats["bajty_zaoszczedzone"] += entry["size"]
+            self.stats["sekundy_zaoszczedzone"] += entry.get("fetch_s", 0.0)
+            return body
+
+    def conditional_headers(self, url: str) -> dict:
+        """Nagłówki zapytania warunkowego dla URL-a (puste, gdy brak walidatorów)."""
+        if not self.enabled:
+            return {}
+        with self._lock:
+            entry = self._index.get(url)
+        if not entry:
+            return {}
+        headers = {}
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def not_modified(self, url: str, elapsed: float = 0.0) -> str | None:
+        """Obsługuje odpowiedź 304 – zwraca treść z cache."""
+        if not self.enabled:
+            return None
+        with self._lock:
+            entry = self._index.get(url)
+            body = self._read_body(url) if entry else None
+            if body is None:
+                # Brak pliku z treścią – usuń wpis, żeby kolejne zapytanie było pełne
+                if entry:
+                    self._index.pop(url, None)
+                    self._size -= entry.get("size", 0)
+                    self._dirty = True
+                return None
+            entry["stored_at"] = time.time()
+            self._touch(url, entry)
+            self.stats["rewalidacje"] += 1
+            self.stats["bajty_zaoszczedzone"] += entry["size"]
+            self.stats["sekundy_zaoszczedzone"] += max(entry.get("fetch_s", 0.0) - elapsed, 0.0)
+            return body
+
+    def store(self, url: str, headers, body: str, elapsed: float = 0.0) -> bool:
+        """
+        Zapisuje pełną odpowiedź 200. Zwraca True, jeśli treść zmieniła się
+        względem poprzedniego wpisu (porównanie hashem treści).
+        """
+        if not self.enabled:
+            return True
+        digest = body_hash(body)
+        size = len(body.encode("utf-8", errors="surrogatepass"))
+        with self._lock:
+            self.stats["chybienia"] += 1
+            self.stats["bajty_pobrane"] += size
+            previous = self._index.pop(url, None)
+            if previous:
+                self._size -= previous.get("size", 0)
+            changed = not previous or previous.get("hash") != digest
+            if not changed:
+                self.stats["niezmienione"] += 1
+            entry = {
+                "etag": headers.get("ETag"),
+                "last_modified": headers.get("Last-Modified"),
+                "hash": digest,
+                "size": size,
+                "stored_at": time.time(),
+                "fetch_s": elapsed,
+            }
+            if changed or not os.path.exists(self._body_path(url)):
+                os.makedirs(self.katalog, exist_ok=True)
+                with open(self._body_path(url), "w", encoding="utf-8", errors="surrogatepass", newline="") as f:
+                    f.write(body)
+            self._index[url] = entry
+            self._size += size
+            self._touch(url, entry)
+            self._evict()
+            return changed
+
+    def raport(self) -> str:
+        s = self.stats
+        return (
+            f"📦 Cache HTTP: trafienia {s['trafienia']}, chybienia {s['chybienia']}, "
+            f"rewalidacje 304 {s['rewalidacje']}, niezmienione (hash) {s['niezmienione']}, "
+            f"zaoszczędzono {s['bajty_zaoszczedzone'] / 1024:.1f} KiB i {s['sekundy_zaoszczedzone']:.1f} s"
+        )
+
+
+_cache: HttpCache | None = None
+_cache_lock = threading.Lock()
+
+
+def get_cache() -> HttpCache:
+    """Zwraca współdzielony cache procesu (tworzony przy pierwszym użyciu)."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = HttpCache(
+                ttl_rules=parse_ttl_rules(os.getenv("SCRAPER_CACHE_TTL")) + DEFAULT_TTL_RULES,
+                enabled=os.getenv("SCRAPER_HTTP_CACHE", "1") != "0",
+            )
+            atexit.register(_cache.save)
+        return _cache
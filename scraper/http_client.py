@@ -0,0 +1,352 @@
+import asyncio
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import TYPE_CHECKING, Mapping, Optional
+from urllib.parse import urlsplit
+
+from scraper.http_cache import get_cache
+from scraper.metrics import get_metryki
+
+# requests/urllib3 i aiohttp importowane są dopiero przy tworzeniu klienta –
+# etapy i procesy potomne, które nie pobierają stron, nie płacą za ich import
+if TYPE_CHECKING:
+    import aiohttp
+
+# Konfiguracja wspólna dla wszystkich ścieżek pobierania (nadpisywana zmiennymi środowiskowymi)
+DEFAULT_USER_AGENT = (
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+    "(KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
+)
+ORIGIN = "https://plan.uz.zgora.pl/"
+
+
+@dataclass
+class HttpConfig:
+    # Pula połączeń: łącznie (aiohttp) / liczba pul hostów (requests) i połączeń do jednego hosta (oba klienty)
+    pool_size: int = int(os.getenv("SCRAPER_HTTP_POOL_SIZE", "32"))
+    pool_per_host: int = int(os.getenv("SCRAPER_HTTP_POOL_PER_HOST", "32"))
+    timeout: float = float(os.getenv("SCRAPER_HTTP_TIMEOUT", "15"))
+    connect_timeout: float = float(os.getenv("SCRAPER_HTTP_CONNECT_TIMEOUT", "5"))
+    keepalive_s: float = float(os.getenv("SCRAPER_HTTP_KEEPALIVE", "30"))
+    user_agent: str = os.getenv("SCRAPER_USER_AGENT", DEFAULT_USER_AGENT)
+    compression: bool = os.getenv("SCRAPER_HTTP_COMPRESSION", "1") != "0"
+    # Zapytania do ORIGIN wysyłane pod ten adres (np. serwer replay benchmarków);
+    # linki w danych, cache i odciski zostają oryginalne
+    upstream: str = os.getenv("SCRAPER_UPSTREAM_URL", "")
+
+    def adres(self, url: str) -> str:
+        if self.upstream and url.startswith(ORIGIN):
+            return self.upstream.rstrip("/") + "/" + url[len(ORIGIN):]
+        return url
+
+    def default_headers(self) -> dict:
+        return {
+            "User-Agent": self.user_agent,
+            "Accept-Encoding": "gzip, deflate" if self.compression else "identity",
+            "Connection": "keep-alive",
+        }
+
+
+config = HttpConfig()
+
+
+class HttpError(Exception):
+    """Odpowiedź HTTP ze statusem błędu (odpowiednik requests.HTTPError)."""
+
+    def __init__(self, status: int, url: str):
+        super().__init__(f"{status} dla {url}")
+        self.status = status
+        self.url = url
+
+
+@dataclass
+class HttpResult:
+    status: int
+    url: str
+    text: Optional[str] = None
+    headers: Mapping[str, str] = field(default_factory=dict)
+    z_cache: bool = False
+
+    def raise_for_status(self):
+        if self.status >= 400:
+            raise HttpError(self.status, self.url)
+
+
+# --- Sekcja: Liczniki połączeń ---
+
+_liczniki_lock = threading.Lock()
+liczniki = {
+    "zapytania": 0,
+    "polaczenia_otwarte": 0,
+    "bajty": 0,  # treść odpowiedzi po dekompresji
+}
+# Obserwator odpowiedzi z sieci: fn(metoda, url, status, headers, body) – np. nagrywanie fixture'ów
+_nagrywarka = None
+
+
+def ustaw_nagrywarke(fn):
+    global _nagrywarka
+    _nagrywarka = fn
+
+
+def _nagraj(metoda: str, url: str, status: int, headers, body: bytes | None):
+    if _nagrywarka is not None:
+        _nagrywarka(metoda, url, status, headers, body)
+
+
+def _dolicz(klucz: str, ile: int = 1):
+    with _liczniki_lock:
+        liczniki[klucz] += ile
+
+
+def _zmierz(metoda: str, url: str, status, czas_s: float, bajty: int = 0):
+    """Metryki zapytania z sieci; endpoint to nazwa skryptu (grupy_ics.php…), żeby etykiet było niewiele."""
+    endpoint = urlsplit(url).path.rsplit("/", 1)[-1] or "/"
+    m = get_metryki()
+    m.licz("http_zapytania", metoda=metoda, endpoint=endpoint, status=status)
+    m.obserwuj("http_czas_s", czas_s, metoda=metoda, endpoint=endpoint)
+    if bajty:
+        m.licz("http_bajty", bajty, endpoint=endpoint)
+
+
+def raport() -> str:
+    otwarte = liczniki["polaczenia_otwarte"]
+    zapytania = liczniki["zapytania"]
+    ponowione = max(zapytania - otwarte, 0)
+    return (
+        f"🔌 HTTP: {zapytania} zapytań, {otwarte} nowych połączeń TCP/TLS, "
+        f"{ponowione} zapytań na ponownie użytych połączeniach, {liczniki['bajty'] / 1024:.1f} KiB treści"
+    )
+
+
+@lru_cache(maxsize=None)
+def _pooled_adapter_cls():
+    """Adapter requests z pulami urllib3 liczącymi nowe połączenia (klasy tworzone przy pierwszym użyciu)."""
+    from requests.adapters import HTTPAdapter
+    from urllib3.connection import HTTPConnection, HTTPSConnection
+    from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+    class _CountingHTTPConnection(HTTPConnection):
+        def connect(self):
+            _dolicz("polaczenia_otwarte")
+            super().connect()
+
+    class _CountingHTTPSConnection(HTTPSConnection):
+        def connect(self):
+            _dolicz("polaczenia_otwarte")
+            super().connect()
+
+    class _CountingHTTPConnectionPool(HTTPConnectionPool):
+        ConnectionCls = _CountingHTTPConnection
+
+    class _CountingHTTPSConnectionPool(HTTPSConnectionPool):
+        ConnectionCls = _CountingHTTPSConnection
+
+    class _PooledAdapter(HTTPAdapter):
+        def init_poolmanager(self, *args, **kwargs):
+            super().init_poolmanager(*args, **kwargs)
+            self.poolmanager.pool_classes_by_scheme = {
+                "http": _CountingHTTPConnectionPool,
+                "https": _CountingHTTPSConnectionPool,
+            }
+
+    return _PooledAdapter
+
+
+# --- Sekcja: Klient synchroniczny ---
+
+class SyncHttpClient:
+    """
+    Synchroniczna fasada nad requests.Session z pulą połączeń keep-alive.
+    Bezpieczna do użycia z wielu wątków (ThreadPoolExecutor w scraperach).
+    """
+
+    def __init__(self, cfg: HttpConfig = config):
+        import requests
+
+        self.cfg = cfg
+        self.session = requests.Session()
+        adapter = _pooled_adapter_cls()(pool_connections=cfg.pool_size, pool_maxsize=cfg.pool_per_host)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.session.headers.update(cfg.default_headers())
+
+    def _timeout(self, timeout):
+        return (self.cfg.connect_timeout, timeout or self.cfg.timeout)
+
+    def head(self, url: str, timeout: float | None = None) -> HttpResult:
+        _dolicz("zapytania")
+        start = time.perf_counter()
+        try:
+            resp = self.session.head(self.cfg.adres(url), timeout=self._timeout(timeout))
+        except Exception:
+            _zmierz("HEAD", url, "blad", time.perf_counter() - start)
+            raise
+        _zmierz("HEAD", url, resp.status_code, time.perf_counter() - start)
+        _nagraj("HEAD", url, resp.status_code, resp.headers, None)
+        return HttpResult(status=resp.status_code, url=url, headers=resp.headers)
+
+    def get(self, url: str, timeout: float | None = None, headers: dict | None = None,
+            use_cache: bool = False) -> HttpResult:
+        """
+        GET z opcjonalnym cache dyskowym (TTL, zapytania warunkowe, 304 → treść z cache).
+        Wyjątki sieciowe są propagowane – retry zostaje po stronie wywołującego.
+        """
+        cache = get_cache() if use_cache else None
+        request_headers = headers
+        if cache:
+            cached = cache.fresh(url)
+            if cached is not None:
+                get_metryki().licz("http_cache", wynik="swieze")
+                return HttpResult(status=200, url=url, text=cached, z_cache=True)
+            request_headers = {**(headers or {}), **cache.conditional_headers(url)}
+        _dolicz("zapytania")
+        start = time.perf_counter()
+        try:
+            resp = self.session.get(self.cfg.adres(url), timeout=self._timeout(timeout), headers=request_headers)
+        except Exception:
+            _zmierz("GET", url, "blad", time.perf_counter() - start)
+            raise
+        elapsed = time.perf_counter() - start
+        _dolicz("bajty", len(resp.content))
+        _zmierz("GET", url, resp.status_code, elapsed, len(resp.content))
+        _nagraj("GET", url, resp.status_code, resp.headers, resp.content)
+        if cache and resp.status_code == 304:
+            get_metryki().licz("http_cache", wynik="niezmienione")
+            body = cache.not_modified(url, elapsed)
+            if body is not None:
+                return HttpResult(status=200, url=url, text=body, headers=resp.headers, z_cache=True)
+            return self.get(url, timeout=timeout, headers=headers, use_cache=False)
+        text = resp.text
+        if cache and resp.status_code == 200:
+            cache.store(url, resp.headers, text, elapsed)
+        return HttpResult(status=resp.status_code, url=url, text=text, headers=resp.headers)
+
+
+_sync_client: SyncHttpClient | None = None
+_sync_lock = threading.Lock()
+
+
+def get_client() -> SyncHttpClient:
+    """Współdzielony klient synchroniczny procesu."""
+    global _sync_client
+    with _sync_lock:
+        if _sync_client is None:
+            _sync_client = SyncHttpClient()
+        return _sync_client
+
+
+# --- Sekcja: Klient asynchroniczny ---
+
+class AsyncHttpClient:
+    """
+    Asynchroniczna fasada nad aiohttp.ClientSession z pulą połączeń keep-alive.
+    Użycie: `async with AsyncHttpClient() as client: await client.get(url)`.
+    """
+
+    def __init__(self, cfg: HttpConfig = config, limit: int | None = None,
+                 limit_per_host: int | None = None):
+        self.cfg = cfg
+        self.limit = limit or cfg.pool_size
+        self.limit_per_host = limit_per_host or cfg.pool_per_host
+        self.session: "aiohttp.ClientSession | None" = None
+
+    async def __aenter__(self):
+        import aiohttp
+
+        trace = aiohttp.TraceConfig()
+
+        async def on_create(session, ctx, params):
+            _dolicz("polaczenia_otwarte")
+
+        trace.on_connection_create_end.append(on_create)
+        connector = aiohttp.TCPConnector(
+            limit=self.limit,
+            limit_per_host=self.limit_per_host,
+            keepalive_timeout=self.cfg.keepalive_s,
+            ttl_dns_cache=300,
+        )
+        self.session = aiohttp.ClientSession(
+            connector=connector,
+            headers=self.cfg.default_headers(),
+            auto_decompress=True,
+            trace_configs=[trace],
+        )
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.session.close()
+
+    def _timeout(self, timeout):
+        import aiohttp
+
+        return aiohttp.ClientTimeout(total=timeout or self.cfg.timeout, connect=self.cfg.connect_timeout)
+
+    async def head(self, url: str, timeout: float | None = None) -> HttpResult:
+        _dolicz("zapytania")
+        start = time.perf_counter()
+        try:
+            async with self.session.head(self.cfg.adres(url), timeout=self._timeout(timeout)) as resp:
+                _zmierz("HEAD", url, resp.status, time.perf_counter() - start)
+                _nagraj("HEAD", url, resp.status, resp.headers, None)
+                return HttpResult(status=resp.status, url=url, headers=resp.headers)
+        except Exception:
+            _zmierz("HEAD", url, "blad", time.perf_counter() - start)
+            raise
+
+    async def get(self, url: str, timeout: float | None = None, headers: dict | None = None,
+                  use_cache: bool = False) -> HttpResult:
+        """
+        Asynchroniczny odpowiednik SyncHttpClient.get (ta sama obsługa cache).
+        Odczyt i zapis plików cache (treści, usuwanie LRU) idą do puli wątków,
+        żeby nie zatrzymywać pętli, na której limiter mierzy opóźnienia.
+        """
+        cache = get_cache() if use_cache else None
+        loop = asyncio.get_running_loop()
+        request_headers = headers
+        if cache:
+            # Bez reguły TTL fresh() nie czyta dysku – nie ma po co przechodzić do wątku
+            cached = await loop.run_in_executor(None, cache.fresh, url) if cache.ttl_for(url) > 0 else None
+            if cached is not None:
+                get_metryki().licz("http_cache", wynik="swieze")
+                return HttpResult(status=200, url=url, text=cached, z_cache=True)
+            request_headers = {**(headers or {}), **cache.conditional_headers(url)}
+        _dolicz("zapytania")
+        start = time.perf_counter()
+        odpowiedz = False
+        try:
+            async with self.session.get(self.cfg.adres(url), timeout=self._timeout(timeout),
+                                        headers=request_headers) as resp:
+                body = await resp.read()
+                odpowiedz = True
+                _dolicz("bajty", len(body))
+                _zmierz("GET", url, resp.status, time.perf_counter() - start, len(body))
+                _nagraj("GET", url, resp.status, resp.headers, body)
+                if cache and resp.status == 304:
+                    get_metryki().licz("http_cache", wynik="niezmienione")
+                    body = await loop.run_in_executor(None, cache.not_modified, url, time.perf_counter() - start)
+                    if body is not None:
+                        return HttpResult(status=200, url=url, text=body, headers=resp.headers, z_cache=True)
+                else:
+                    text = await resp.text()
+                    if cache and resp.status == 200:
+                        await loop.run_in_executor(None, cache.store, url, resp.headers, text,
+                                                   time.perf_counter() - start)
+                    return HttpResult(status=resp.status, url=url, text=text, headers=resp.headers)
+        except Exception:
+            if not odpowiedz:
+                _zmierz("GET", url, "blad", time.perf_counter() - start)
+            raise
+        return await self.get(url, timeout=timeout, headers=headers, use_cache=False)
+
+
+def retry_after_s(headers: Mapping[str, str]) -> float | None:
+    """Czas z nagłówka Retry-After w sekundach (obsługiwany wariant liczbowy)."""
+    value = headers.get("Retry-After") if headers else None
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
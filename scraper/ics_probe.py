@@ -0,0 +1,160 @@
+import asyncio
+import atexit
+import json
+import os
+import threading
+import time
+
+from scraper.http_client import AsyncHttpClient, HttpResult, get_client
+
+BASE_URL = "https://plan.uz.zgora.pl/"
+
+PROBE_PATH = os.getenv("SCRAPER_ICS_PROBE_PATH", os.path.join(".cache", "ics_probe.json"))
+# Jak długo wynik sondowania uznajemy za aktualny (domyślnie 24 h)
+PROBE_TTL_S = float(os.getenv("SCRAPER_ICS_PROBE_TTL", str(24 * 3600)))
+
+
+def kandydaci_ics(nauczyciel_id: str, rodzaj: str = "GG") -> list[str]:
+    """
+    Adresy ICS nauczyciela do sprawdzenia, w kolejności preferencji.
+    GG: letni, zimowy, ogólny; NT: jeden adres.
+    """
+    base = f"{BASE_URL}nauczyciel_ics.php?ID={nauczyciel_id}&KIND={rodzaj}"
+    if rodzaj == "GG":
+        return [f"{base}&S=0", f"{base}&S=1", base]
+    return [base]
+
+
+def _link_domyslny(nauczyciel_id: str, rodzaj: str) -> str | None:
+    # Dla GG zachowujemy dotychczasowe zachowanie: gdy nic nie działa, ustaw ogólny link
+    return kandydaci_ics(nauczyciel_id, rodzaj)[-1] if rodzaj == "GG" else None
+
+
+def _jest_ics(resp: HttpResult) -> bool:
+    return resp.status == 200 and "text/calendar" in resp.headers.get("content-type", "")
+
+
+class ProbeCache:
+    """Trwały cache wyników sondowania: klucz "RODZAJ:ID" → (link, znacznik czasu)."""
+
+    def __init__(self, path: str = PROBE_PATH, ttl_s: float = PROBE_TTL_S):
+        self.path = path
+        self.ttl_s = ttl_s
+        self._lock = threading.Lock()
+        self._wpisy: dict[str, dict] = {}
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                self._wpisy = json.load(f)
+        except (OSError, ValueError):
+            pass
+
+    def get(self, nauczyciel_id: str, rodzaj: str) -> tuple[bool, str | None]:
+        """Zwraca (czy_aktualny, link)."""
+        wpis = self._wpisy.get(f"{rodzaj}:{nauczyciel_id}")
+        if not wpis or time.time() - wpis["ts"] > self.ttl_s:
+            return False, None
+        return True, wpis["url"]
+
+    def set(self, nauczyciel_id: str, rodzaj: str, url: str | None):
+        with self._lock:
+            self._wpisy[f"{rodzaj}:{nauczyciel_id}"] = {"url": url, "ts": time.time()}
+
+    def save(self):
+        with self._lock:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            tmp = self.path + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(self._wpisy, f)
+            os.replace(tmp, self.path)
+
+
+_cache: ProbeCache | None = None
+_cache_lock = threading.Lock()
+
+
+def get_probe_cache() -> ProbeCache:
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = ProbeCache()
+            atexit.register(_cache.save)
+        return _cache
+
+
+def wybierz_link_ics(nauczyciel_id: str, rodzaj: str = "GG") -> str | None:
+    """
+    Synchroniczne sondowanie jednego nauczyciela (HEAD), z użyciem cache wyników.
+    """
+    cache = get_probe_cache()
+    aktualny, url = cache.get(nauczyciel_id, rodzaj)
+    if aktualny:
+        return url
+    blad_sieci = False
+    for kandydat in kandydaci_ics(nauczyciel_id, rodzaj):
+        try:
+            if _jest_ics(get_client().head(kandydat, timeout=5)):
+                cache.set(nauczyciel_id, rodzaj, kandydat)
+                return kandydat
+        except Exception:
+            blad_sieci = True
+            continue
+    url = _link_domyslny(nauczyciel_id, rodzaj)
+    # Wynik po błędzie sieci nie trafia do cache – następny przebieg sprawdzi ponownie
+    if not blad_sieci:
+        cache.set(nauczyciel_id, rodzaj, url)
+    return url
+
+
+async def probe_nauczyciele_ics_async(nauczyciel_ids: list[str], rodzaj: str = "GG",
+                                      max_concurrent: int = 32,
+                                      client: AsyncHttpClient | None = None) -> dict[str, str | None]:
+    """
+    Równolegle wybiera najlepszy link ICS dla całej listy nauczycieli.
+    Pomija sondowanie, gdy w cache jest świeży wynik. Zwraca {nauczyciel_id: link}.
+    """
+    cache = get_probe_cache()
+    wyniki: dict[str, str | None] = {}
+    do_sondowania = []
+    for nid in dict.fromkeys(i for i in nauczyciel_ids if i):
+        aktualny, url = cache.get(nid, rodzaj)
+        if aktualny:
+            wyniki[nid] = url
+        else:
+            do_sondowania.append(nid)
+
+    sema = asyncio.Semaphore(max_concurrent)
+
+    async def sonduj(c: AsyncHttpClient, nid: str):
+        async with sema:
+            blad_sieci = False
+            for kandydat in kandydaci_ics(nid, rodzaj):
+                try:
+                    if _jest_ics(await c.head(kandydat, timeout=5)):
+                        return nid, kandydat, False
+                except Exception:
+                    blad_sieci = True
+                    continue
+            return nid, _link_domyslny(nid, rodzaj), blad_sieci
+
+    async def sonduj_wszystkie(c: AsyncHttpClient):
+        for nid, url, blad_sieci in await asyncio.gather(*(sonduj(c, nid) for nid in do_sondowania)):
+            if not blad_sieci:
+                cache.set(nid, rodzaj, url)
+            wyniki[nid] = url
+
+    if do_sondowania:
+        if client is not None:
+            await sonduj_wszystkie(client)
+        else:
+            async with AsyncHttpClient(limit=max_concurrent) as c:
+                await sonduj_wszystkie(c)
+        cache.save()
+    print(f"🔎 Sondowanie ICS ({rodzaj}): {len(do_sondowania)} nauczycieli sprawdzonych, "
+          f"{len(wyniki) - len(do_sondowania)} z cache")
+    return wyniki
+
+
+def probe_nauczyciele_ics(nauczyciel_ids: list[str], rodzaj: str = "GG",
+                          max_concurrent: int = 32) -> dict[str, str | None]:
+    """Synchroniczne wejście do probe_nauczyciele_ics_async."""
+    return asyncio.run(probe_nauczyciele_ics_async(nauczyciel_ids, rodzaj, max_concurrent))
@@ -1,104 +1,73 @@
 import datetime
-from icalendar import Calendar
-import requests
 import time
 
+from scraper.http_client import get_client
+from scraper.metrics import get_metryki, mierzony
+from scraper.parsers.ics_fast import iter_vevents
+from scraper.summary import rozloz_summary
+
 BASE_URL = "https://plan.uz.zgora.pl/"
 
 
 def fetch_ics_content(url: str, max_retries: int = 3, retry_delay: int = 5) -> str | None:
-    headers = {
-        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
-    }
     for attempt in range(max_retries):
         try:
-            response = requests.get(url, timeout=30, headers=headers)
-            if response.status_code == 200:
+            response = get_client().get(url, timeout=30, use_cache=True)
+            if response.status == 200:
                 return response.text
-            elif response.status_code == 404:
+            elif response.status == 404:
                 return None
         except Exception as e:
             if attempt < max_retries - 1:
+                get_metryki().licz("ponowienia", zrodlo="ics", przyczyna="wyjatek")
                 time.sleep(retry_delay)
                 retry_delay *= 2
+    get_metryki().licz("nieudane", zrodlo="ics")
     return None
 
 
-def parse_ics_file(ics_content: str, link_ics_zrodlowy: str = None) -> list[dict]:
-    """Parsuje plik ICS i zwraca listę wydarzeń (zajęć)."""
-    import re  # Import na początku funkcji
-
+@mierzony("parsowanie_s", format="ics")
+def parse_ics_file(ics_content: str, link_ics_zrodlowy: str = None, parser: str = None) -> list[dict]:
+    """
+    Parsuje plik ICS i zwraca listę wydarzeń (zajęć).
+    parser: "fast" albo "icalendar" (domyślnie SCRAPER_ICS_PARSER).
+    """
     if not ics_content:
         return []
     events = []
     try:
-        cal = Calendar.from_ical(ics_content)
-        for component in cal.walk('VEVENT'):
-            start_time = component.get('dtstart').dt
-            end_time = component.get('dtend').dt
-            summary = str(component.get('summary', ''))
-            location = str(component.get('location', ''))
-            uid = str(component.get('uid', ''))
-
-            # Rodzaj zajęć (rz)
+        for component in iter_vevents(ics_content, parser):
+            start_time = component['dtstart']
+            end_time = component['dtend']
+            summary = component['summary'] if component['summary'] is not None else ''
+            location = component['location'] if component['location'] is not None else ''
+            uid = component['uid'] if component['uid'] is not None else ''
+
+            czesci = rozloz_summary(summary, "plan")
+
+            # Rodzaj zajęć (rz): z kategorii, a gdy ich brak – z nawiasów w SUMMARY
             rz = None
-            categories = component.get('categories')
-            if categories:
-                if hasattr(categories, 'to_ical'):
-                    rz = categories.to_ical().decode(errors="ignore").strip()
-                else:
-                    rz = str(categories).strip()
+            categories = component['categories']
+            if categories is not None:
+                rz = categories
                 if rz and len(rz) > 10:
                     rz = rz[:10]
                 if rz.lower().startswith("<icalendar"):
                     rz = None
             else:
-                # Wyciągnij z nawiasów w SUMMARY
-                rz_match = re.search(r'\((W|C|Ć|L|P|S|E|I|T|K|X|Z|Zp)\)', summary)
-                rz = rz_match.group(1) if rz_match else None
-
-            # Przedmiot
-            przedmiot = summary
-            match_przedmiot = re.match(r'^([^(]+)', summary)
-            if match_przedmiot:
-                przedmiot = match_przedmiot.group(1).strip()
-
-            # Wyciągnięcie nauczyciela z SUMMARY (po dwukropku)
-            nauczyciel = None
-            if ': ' in summary:
-                parts = summary.split(': ', 1)
-                nauczyciel = parts[1].strip() if len(parts) > 1 else None
-            # Usuń fragment z podgrupą
-            if nauczyciel and '(PG:' in nauczyciel:
-                nauczyciel = nauczyciel.split('(PG:')[0].strip()
-
-            # Wyciągnięcie podgrupy
-            podgrupa = None
-            podgrupa_match = re.search(r'\(PG:\s*([^)]+)\)', summary)
-            if podgrupa_match:
-                podgrupa = podgrupa_match.group(1).strip()
-
-            # Wyciągnięcie grup (po dwukropku, po znaku ')')
-            grupy = None
-            grupy_match = re.search(r'\)\s*:\s*([^\n]+)', summary)
-            if grupy_match:
-                grupy = grupy_match.group(1).strip()
-            elif ': ' in summary:
-                parts = summary.split(': ', 1)
-                if len(parts) > 1:
-                    grupy = parts[1].strip()
+                rz = czesci.rz
 
             event = {
-                'przedmiot': przedmiot,
+                'przedmiot': czesci.przedmiot,
                 'od': start_time.isoformat() if hasattr(start_time, "isoformat") else start_time,
                 'do_': end_time.isoformat() if hasattr(end_time, "isoformat") else end_time,
                 'miejsce': location,
                 'rz': rz,
                 'link_ics_zrodlowy': link_ics_zrodlowy,
-                'podgrupa': podgrupa,
+                'podgrupa': czesci.podgrupa,
                 'uid': uid,
-                'nauczyciel': nauczyciel,
-                'grupy': grupy  # KLUCZOWE POLE dla zajęć nauczycieli
+                'nauczyciel': czesci.nauczyciel,
+                'grupy': czesci.grupy  # KLUCZOWE POLE dla zajęć nauczycieli
             }
             events.append(event)
     except Exception as e:
@@ -106,6 +75,27 @@ def parse_ics_file(ics_content: str, link_ics_zrodlowy: str = None) -> list[dict
     return events
 
 
+def plan_kompletny(ics_content: str, zajecia: list[dict]) -> bool:
+    """Czy parsowanie objęło wszystkie VEVENT-y (parse_ics_file przy błędzie zwraca część)."""
+    return len(zajecia) >= ics_content.count("BEGIN:VEVENT")
+
+
+def polacz_po_uid(*listy_zajec: list[dict]) -> list[dict]:
+    """Łączy sparsowane plany (np. semestry) bez duplikatów UID; wygrywa pierwsze wystąpienie."""
+    if len(listy_zajec) == 1:
+        return listy_zajec[0]
+    widziane, wynik = set(), []
+    for zajecia in listy_zajec:
+        for z in zajecia:
+            uid = z.get("uid")
+            if uid:
+                if uid in widziane:
+                    continue
+                widziane.add(uid)
+            wynik.append(z)
+    return wynik
+
+
 def pobierz_plan_ics_grupy(grupa_id: str) -> dict:
     """Pobiera plan grupy w formacie ICS."""
     ics_link = f"{BASE_URL}grupy_ics.php?ID={grupa_id}&KIND=GG"
@@ -127,10 +117,6 @@ def pobierz_plan_ics_nauczyciela(nauczyciel_id: str) -> dict:
     - jeśli oba są dostępne, łączy wydarzenia
     - jeśli żaden nie działa, pobiera GG ogólny
     """
-    headers = {
-        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
-    }
-
     ics_links = [
         f"{BASE_URL}nauczyciel_ics.php?ID={nauczyciel_id}&KIND=GG&S=0",
         f"{BASE_URL}nauczyciel_ics.php?ID={nauczyciel_id}&KIND=GG&S=1"
@@ -140,8 +126,8 @@ def pobierz_plan_ics_nauczyciela(nauczyciel_id: str) -> dict:
     ics_contents = []
     for url in ics_links:
         try:
-            response = requests.get(url, timeout=30, headers=headers)
-            if response.status_code == 200 and "VEVENT" in response.text:
+            response = get_client().get(url, timeout=30, use_cache=True)
+            if response.status == 200 and "VEVENT" in response.text:
                 ics_contents.append((url, response.text))
         except Exception:
             continue
@@ -180,8 +166,8 @@ def pobierz_plan_ics_nauczyciela(nauczyciel_id: str) -> dict:
 
     # Jeśli żaden nie działa, spróbuj ogólnego
     try:
-        response = requests.get(ogolny_link, timeout=30, headers=headers)
-        if response.status_code == 200 and "VEVENT" in response.text:
+        response = get_client().get(ogolny_link, timeout=30, use_cache=True)
+        if response.status == 200 and "VEVENT" in response.text:
             return {
                 'nauczyciel_id': nauczyciel_id,
                 'ics_content': response.text,
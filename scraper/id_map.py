@@ -0,0 +1,206 @@
+import json
+import os
+import threading
+import time
+from typing import Any, Dict, Iterable, Optional, Set, Tuple
+
+from scraper.storage import StorageBackend, wszystkie_wiersze
+
+ID_MAPS_PATH = os.getenv("SCRAPER_ID_MAPS_PATH", os.path.join(".cache", "id_maps.json"))
+# Po tylu godzinach od pełnego wczytania mapa z dysku nie jest już zaufana (wczytanie od nowa z bazy)
+ID_MAPS_TTL_H = float(os.getenv("SCRAPER_ID_MAPS_TTL_H", "24"))
+# Tyle id z mapy na dysku sprawdzanych w bazie (razem z liczbą wierszy) przed jej użyciem
+ID_MAPS_PROBKA = int(os.getenv("SCRAPER_ID_MAPS_PROBKA", "20"))
+
+# tabela → kolumny klucza, po których scraper szuka UUID (jak dotąd w get_uuid_map)
+KLUCZE_MAP = {
+    "kierunki": ("nazwa", "wydzial"),
+    "grupy": ("grupa_id",),
+    "nauczyciele": ("link_strony_nauczyciela",),
+}
+
+
+def normalizuj_klucz(klucz: Any) -> Any:
+    if isinstance(klucz, tuple):
+        return tuple(normalizuj_klucz(k) for k in klucz)
+    return str(klucz).strip().casefold()
+
+
+class MapaId(dict):
+    """
+    klucz → UUID z kluczami znormalizowanymi (strip + casefold, jak dotąd);
+    wyszukiwanie normalizuje klucz, więc działa też dla surowych wartości.
+    """
+
+    def get(self, klucz, domyslna=None):
+        return domyslna if klucz is None else dict.get(self, normalizuj_klucz(klucz), domyslna)
+
+    def __contains__(self, klucz):
+        return klucz is not None and dict.__contains__(self, normalizuj_klucz(klucz))
+
+    def __getitem__(self, klucz):
+        return dict.__getitem__(self, normalizuj_klucz(klucz))
+
+    def ustaw(self, klucz, id_):
+        dict.__setitem__(self, normalizuj_klucz(klucz), id_)
+
+
+def _klucz_wiersza(row: Dict[str, Any], kolumny: Tuple[str, ...]) -> Optional[Any]:
+    wartosci = tuple(row.get(k) for k in kolumny)
+    if any(w is None or w == "" for w in wartosci):
+        return None
+    return wartosci if len(kolumny) > 1 else wartosci[0]
+
+
+class IdMapService:
+    """
+    Mapy klucz → UUID dla tabel z KLUCZE_MAP, wspólne dla całego przebiegu.
+
+    - pełne wczytanie to strumień całej tabeli stronicowany po id (bez limitu wierszy serwera),
+    - id z odpowiedzi upsertów dopisywane są na bieżąco, więc po zapisie nie trzeba ponownie czytać tabeli,
+    - mapy zapisywane są na dysku; mapa wczytana w całości w ciągu ID_MAPS_TTL_H godzin
+      jest używana bez wczytywania tabeli (np. test.py, kolejne etapy w osobnych procesach),
+      o ile baza nadal do niej pasuje: ta sama liczba wierszy co przy zapisie i próbka id
+      z tymi samymi kluczami (plik SQLite utworzony od nowa, tabela wyczyszczona → wczytanie).
+    """
+
+    def __init__(self, backend: StorageBackend, path: str = ID_MAPS_PATH, ttl_h: float = ID_MAPS_TTL_H):
+        self.backend = backend
+        self.path = path
+        self.ttl_s = ttl_h * 3600
+        self._lock = threading.Lock()
+        self._mapy: Dict[str, MapaId] = {}
+        self._pelne_od: Dict[str, float] = {}  # tabela → czas ostatniego pełnego wczytania
+        self._dysk: Dict[str, Dict[str, Any]] = {}
+        self._sprawdzone: Set[str] = set()
+        self.stats = {"pelne_wczytania": 0, "wiersze_wczytane": 0, "z_dysku": 0, "odrzucone_z_dysku": 0,
+                      "z_upsertow": 0}
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                dane = json.load(f)
+            if dane.get("adres") == backend.adres:
+                self._dysk = dane.get("mapy", {})
+        except (OSError, ValueError):
+            pass
+
+    def _zgodna_z_baza(self, table: str, zapis: Dict[str, Any]) -> bool:
+        """Czy mapa z dysku pasuje do bazy: liczba wierszy z chwili zapisu i próbka id z kluczami."""
+        kolumny = KLUCZE_MAP[table]
+        pozycje = zapis.get("pozycje", [])
+        probka = pozycje[::max(len(pozycje) // max(ID_MAPS_PROBKA, 1), 1)][:ID_MAPS_PROBKA]
+        try:
+            if zapis.get("wiersze") is None or self.backend.policz(table) != zapis["wiersze"]:
+                return False
+            if not probka:
+                return True
+            w_bazie = {r["id"]: _klucz_wiersza(r, kolumny) for r in self.backend.select(
+                table, ", ".join(("id",) + kolumny), in_=("id", [p[-1] for p in probka]))}
+        except Exception as e:
+            print(f"⚠️ Nie udało się sprawdzić mapy {table} z dysku: {e}")
+            return False
+        for *klucz, id_ in probka:
+            aktualny = w_bazie.get(id_)
+            if aktualny is None or normalizuj_klucz(aktualny) != (tuple(klucz) if len(klucz) > 1 else klucz[0]):
+                return False
+        return True
+
+    def _z_dysku(self, table: str) -> Optional[MapaId]:
+        """Mapa z dysku, sprawdzona z bazą przy pierwszym użyciu; niezgodna jest porzucana."""
+        with self._lock:
+            zapis = self._dysk.get(table)
+        if not zapis or list(zapis.get("kolumny", ())) != list(KLUCZE_MAP[table]):
+            return None
+        if table not in self._sprawdzone:
+            zgodna = self._zgodna_z_baza(table, zapis)
+            with self._lock:
+                self._sprawdzone.add(table)
+                if not zgodna:
+                    self._dysk.pop(table, None)
+                    self.stats["odrzucone_z_dysku"] += 1
+                    print(f"♻️ Mapa {table} z dysku nie pasuje do bazy – wczytanie od nowa")
+                    return None
+        mapa = MapaId()
+        for *klucz, id_ in zapis["pozycje"]:
+            mapa.ustaw(tuple(klucz) if len(klucz) > 1 else klucz[0], id_)
+        with self._lock:
+            self._pelne_od[table] = zapis.get("pelne_od", 0.0)
+            self.stats["z_dysku"] += 1
+        return mapa
+
+    def wczytaj(self, table: str) -> MapaId:
+        """Pełne wczytanie mapy z bazy (strumień stronicowany po id)."""
+        kolumny = KLUCZE_MAP[table]
+        mapa = MapaId()
+        for row in wszystkie_wiersze(self.backend, table, ", ".join(kolumny)):
+            klucz = _klucz_wiersza(row, kolumny)
+            if klucz is not None:
+                mapa.ustaw(klucz, row["id"])
+            self.stats["wiersze_wczytane"] += 1
+        with self._lock:
+            # Id z upsertów zakończonych w trakcie wczytywania nie mogą zginąć
+            for klucz, id_ in self._mapy.get(table, {}).items():
+                dict.setdefault(mapa, klucz, id_)
+            self._mapy[table] = mapa
+            self._pelne_od[table] = time.time()
+            self.stats["pelne_wczytania"] += 1
+        return mapa
+
+    def mapa(self, table: str) -> MapaId:
+        """
+        Mapa tabeli: z pamięci, jeśli wczytana albo uzupełniana upsertami w tym przebiegu;
+        z dysku, jeśli pełne wczytanie jest świeże; w przeciwnym razie pełne wczytanie z bazy.
+        """
+        with self._lock:
+            mapa = self._mapy.get(table)
+        if mapa is not None:
+            return mapa
+        mapa = self._z_dysku(table)
+        if mapa is not None and time.time() - self._pelne_od.get(table, 0.0) < self.ttl_s:
+            with self._lock:
+                return self._mapy.setdefault(table, mapa)
+        return self.wczytaj(table)
+
+    def z_odpowiedzi(self, table: str, rows: Iterable[Dict[str, Any]]):
+        """Dopisuje id z wierszy zwróconych przez upsert."""
+        kolumny = KLUCZE_MAP.get(table)
+        if not kolumny:
+            return
+        z_dysku = self._z_dysku(table) if table not in self._mapy else None
+        with self._lock:
+            mapa = self._mapy.get(table)
+            if mapa is None:
+                mapa = self._mapy[table] = z_dysku or MapaId()
+            for row in rows:
+                klucz = _klucz_wiersza(row, kolumny)
+                if klucz is not None and row.get("id"):
+                    mapa.ustaw(klucz, row["id"])
+                    self.stats["z_upsertow"] += 1
+
+    def save(self):
+        # Liczba wierszy przed migawką map: wiersz dopisany w międzyczasie daje niezgodność (wczytanie), nie lukę
+        wiersze: Dict[str, Optional[int]] = {}
+        for table in list(self._mapy):
+            try:
+                wiersze[table] = self.backend.policz(table)
+            except Exception:
+                wiersze[table] = None
+        with self._lock:
+            mapy = dict(self._dysk)
+            for table, mapa in self._mapy.items():
+                mapy[table] = {
+                    "kolumny": list(KLUCZE_MAP[table]),
+                    # Mapa tylko z upsertów nie jest pełna – nie ustawiamy jej czasu pełnego wczytania
+                    "pelne_od": self._pelne_od.get(table, 0.0),
+                    "wiersze": wiersze.get(table),
+                    "pozycje": [[*(k if isinstance(k, tuple) else (k,)), id_] for k, id_ in mapa.items()],
+                }
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            tmp = self.path + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump({"adres": self.backend.adres, "mapy": mapy}, f)
+            os.replace(tmp, self.path)
+
+    def raport(self) -> str:
+        s = self.stats
+        return (f"🗺️ Mapy UUID: {s['pelne_wczytania']} pełnych wczytań ({s['wiersze_wczytane']} wierszy), "
+                f"{s['z_dysku']} z dysku ({s['odrzucone_z_dysku']} odrzuconych), {s['z_upsertow']} id z odpowiedzi upsertów")
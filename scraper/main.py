@@ -1,29 +1,185 @@
-from scraper.scrapers.kierunki_scraper import scrape_kierunki
-from scraper.scrapers.grupy_scraper import scrape_grupy_for_kierunki
-from scraper.parsers.nauczyciel_parser import (
-    parse_nauczyciele_from_group_page,
-    parse_nauczyciel_details,
-    fetch_page,
-)
-from scraper.db import (
-    save_kierunki,
-    save_grupy,
-    save_nauczyciele,
-    save_zajecia_grupy,
-    save_zajecia_nauczyciela,
-    get_uuid_map,
-)
-from scraper.downloader import download_ics_for_groups_async
-from scraper.ics_updater import pobierz_plan_ics_nauczyciela, parse_ics_file
-
-
-def main():
-    print("ETAP 1: Pobieranie kierunków studiów...")
-    kierunki = scrape_kierunki()
-    save_kierunki(kierunki)
-    print(f"Przetworzono {len(kierunki)} kierunków\n")
-
-    print("ETAP 2: Pobieranie grup dla kierunków...")
+import argparse
+
+ETAPY = ("kierunki", "grupy", "nauczyciele", "zajecia_grup", "zajecia_nauczycieli")
+
+
+def parse_args(argv=None):
+    from scraper.metrics import PROFILE, parse_profil
+    from scraper.shards import parse_shard
+    from scraper.teacher_index import ETAP5_TRYB
+
+    parser = argparse.ArgumentParser(
+        description="Pełny przebieg scrapera planu UZ: kierunki → grupy → nauczyciele → zajęcia grup → zajęcia nauczycieli"
+    )
+    parser.add_argument("--resume", action="store_true",
+                        help="Wznów przerwany przebieg od ostatniego punktu kontrolnego (SCRAPER_CHECKPOINT_DIR)")
+    parser.add_argument("--shard", type=parse_shard, metavar="i/N",
+                        help="Tylko część pracy: grupy (ETAP 3–4) i nauczyciele (ETAP 5) wg stabilnego hasha "
+                             "grupa_id / id nauczyciela; wyniki shardów scala python -m scraper.storage_sync")
+    parser.add_argument("--etapy", nargs="+", choices=ETAPY,
+                        help="Tylko wybrane etapy; wyniki pominiętych wczytywane są z bazy "
+                             "(domyślnie wszystkie, przy --shard bez zajecia_nauczycieli)")
+    parser.add_argument("--etap5", choices=("pobieranie", "z_grup"), default=ETAP5_TRYB,
+                        help="ETAP 5: ICS każdego nauczyciela (pobieranie) albo plany wyprowadzone z zajęć grup "
+                             "w bazie, z pobieraniem tylko niepokrytych i kontrolą na próbce (z_grup)")
+    parser.add_argument("--profil", metavar="ETAP[:TRYB]", default=PROFILE or None,
+                        help="Profil wybranego etapu: cprofile (domyślnie, wątek główny) albo sampling "
+                             "(stosy wszystkich wątków); wynik w SCRAPER_PROFILE_DIR")
+    args = parser.parse_args(argv)
+    try:
+        profil = parse_profil(args.profil)
+    except ValueError as e:
+        parser.error(f"--profil: {e}")
+    if profil and profil[0] not in ETAPY:
+        parser.error(f"--profil: nieznany etap {profil[0]!r} – jeden z {', '.join(ETAPY)}")
+    sharded = args.shard is not None and args.shard[1] > 1
+    if args.etapy is None:
+        # Shard zna tylko nauczycieli ze swoich grup – ETAP 5 idzie osobno, po scaleniu shardów
+        args.etapy = [e for e in ETAPY if not (sharded and e == "zajecia_nauczycieli")]
+    elif sharded and {"nauczyciele", "zajecia_nauczycieli"} <= set(args.etapy):
+        parser.error("--shard: zajecia_nauczycieli wymagają pełnej listy nauczycieli – "
+                     "uruchom je osobno po scaleniu shardów (--etapy zajecia_nauczycieli)")
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    # Importy etapów dopiero tutaj: --help nie ładuje bs4/aiohttp/requests/supabase
+    from scraper.scrapers.kierunki_scraper import scrape_kierunki
+    from scraper.crawler import crawl_nauczyciele
+    from scraper.db import (
+        save_kierunki,
+        save_nauczyciele,
+        get_uuid_map,
+        get_id_maps,
+        get_storage,
+    )
+    from scraper.pipeline import (run_zajecia_grup_pipeline, run_zajecia_nauczycieli_pipeline,
+                                  zajecia_nauczycieli_z_grup)
+    from scraper.checkpoints import Checkpoint
+    from scraper.shards import klucz_grupy, klucz_nauczyciela, opis_sharda, podziel
+    from scraper.storage import wszystkie_wiersze
+    from scraper.http_cache import get_cache
+    from scraper.metrics import get_metryki
+    from scraper.page_store import get_page_store
+    from scraper import http_client, summary
+
+    etapy = [e for e in ETAPY if e in args.etapy]
+    if args.shard or etapy != list(ETAPY):
+        print(f"ℹ️ Shard: {opis_sharda(args.shard) or 'całość'}, etapy: {', '.join(etapy)}")
+    # Punkty kontrolne: ukończone etapy wczytywane z dysku, w ETAPACH 4–5 pomijane zapisane grupy/nauczyciele
+    ck = Checkpoint(wznow=args.resume, parametry={"shard": opis_sharda(args.shard), "etapy": etapy})
+    id_maps = get_id_maps()
+    # Pomiary z gorących ścieżek dostają etykietę etapu; raport JSON/Prometheus na końcu przebiegu
+    metryki = get_metryki()
+
+    def z_bazy(table):
+        print(f"ℹ️ Etap pominięty – {table} z bazy ({get_storage().nazwa})")
+        return list(wszystkie_wiersze(get_storage(), table))
+
+    kierunki = wszystkie_grupy = nauczyciele_final = None
+
+    if "kierunki" in etapy:
+        with metryki.etap("kierunki", args.profil):
+            print("ETAP 1: Pobieranie kierunków studiów...")
+            if ck.ukonczony("kierunki"):
+                kierunki = ck.wczytaj("kierunki")
+            else:
+                kierunki = scrape_kierunki()
+                save_kierunki(kierunki)
+                id_maps.save()
+                ck.zapisz("kierunki", kierunki)
+            print(f"Przetworzono {len(kierunki)} kierunków\n")
+
+    if "grupy" in etapy:
+        with metryki.etap("grupy", args.profil):
+            print("ETAP 2: Pobieranie grup dla kierunków...")
+            if ck.ukonczony("grupy"):
+                wszystkie_grupy = ck.wczytaj("grupy")
+            else:
+                # Wiersze kierunków w bazie nie mają linków stron – sama lista kierunków to jedno zapytanie
+                wszystkie_grupy = _etap_grupy(kierunki if kierunki is not None else scrape_kierunki())
+                id_maps.save()
+                ck.zapisz("grupy", wszystkie_grupy)
+            print(f"Przetworzono {len(wszystkie_grupy)} grup\n")
+
+    if "nauczyciele" in etapy or "zajecia_grup" in etapy:
+        if wszystkie_grupy is None:
+            wszystkie_grupy = z_bazy("grupy")
+        grupy_sharda = podziel(wszystkie_grupy, args.shard, klucz_grupy)
+        if args.shard:
+            print(f"ℹ️ Shard {opis_sharda(args.shard)}: {len(grupy_sharda)} z {len(wszystkie_grupy)} grup\n")
+
+    if "nauczyciele" in etapy:
+        with metryki.etap("nauczyciele", args.profil):
+            print("ETAP 3: Pobieranie nauczycieli z planów grup...")
+            if ck.ukonczony("nauczyciele"):
+                nauczyciele_final = ck.wczytaj("nauczyciele")
+            else:
+                nauczyciele_final = crawl_nauczyciele(grupy_sharda)
+                save_nauczyciele(nauczyciele_final)
+                id_maps.save()
+                ck.zapisz("nauczyciele", nauczyciele_final)
+            print(f"Przetworzono {len(nauczyciele_final)} nauczycieli\n")
+
+    if "zajecia_grup" in etapy:
+        with metryki.etap("zajecia_grup", args.profil):
+            print("ETAP 4: Pobieranie i zapisywanie zajęć grup...")
+            if ck.ukonczony("zajecia_grup"):
+                wynik = ck.wczytaj("zajecia_grup")
+            else:
+                grupa_uuid_map = get_uuid_map("grupy", "grupa_id", "id")
+                postep = ck.postep("zajecia_grup")
+                wszystkie_id_grup = [g["grupa_id"] for g in grupy_sharda
+                                     if g.get("grupa_id") and g["grupa_id"] not in postep.zrobione]
+                if postep.zrobione:
+                    print(f"⏯️ Pomijam {len(postep.zrobione)} grup zapisanych przed przerwaniem")
+                wynik = run_zajecia_grup_pipeline(wszystkie_id_grup, grupa_uuid_map, postep=postep)
+                ck.zapisz("zajecia_grup", wynik)
+            print(f"Zapisano {wynik['zapisane']} zajęć grup\n")
+
+    if "zajecia_nauczycieli" in etapy:
+        with metryki.etap("zajecia_nauczycieli", args.profil):
+            print("ETAP 5: Pobieranie i zapisywanie zajęć nauczycieli...")
+            if ck.ukonczony("zajecia_nauczycieli"):
+                wynik = ck.wczytaj("zajecia_nauczycieli")
+            else:
+                if nauczyciele_final is None:
+                    nauczyciele_final = z_bazy("nauczyciele")
+                nauczyciele_sharda = podziel(nauczyciele_final, args.shard, klucz_nauczyciela)
+                if args.shard:
+                    print(f"ℹ️ Shard {opis_sharda(args.shard)}: {len(nauczyciele_sharda)} z "
+                          f"{len(nauczyciele_final)} nauczycieli")
+                nauczyciel_uuid_map = get_uuid_map("nauczyciele", "link_strony_nauczyciela", "id")
+                postep = ck.postep("zajecia_nauczycieli")
+                if args.etap5 == "z_grup":
+                    wynik = zajecia_nauczycieli_z_grup(nauczyciele_sharda, nauczyciel_uuid_map, postep=postep)
+                else:
+                    wynik = run_zajecia_nauczycieli_pipeline(nauczyciele_sharda, nauczyciel_uuid_map, postep=postep)
+                if wynik["pominieci"]:
+                    print(f"⏯️ Pominięto {wynik['pominieci']} nauczycieli zapisanych przed przerwaniem")
+                ck.zapisz("zajecia_nauczycieli", wynik)
+            print(f"Zapisano {wynik['zajecia']} zajęć nauczycieli\n")
+
+    id_maps.save()
+    print(id_maps.raport())
+    cache = get_cache()
+    cache.save()
+    print(cache.raport())
+    print(http_client.raport())
+    print(summary.raport())
+    print(get_page_store().raport())
+    print(metryki.raport())
+    metryki.zapisz()
+    ck.zakoncz()
+    print("Zakończono proces MVP.")
+
+
+def _etap_grupy(kierunki):
+    """ETAP 2: scraping grup, mapowanie UUID kierunków i zapis."""
+    from scraper.scrapers.grupy_scraper import scrape_grupy_for_kierunki
+    from scraper.db import get_uuid_map, save_grupy
+
     wszystkie_grupy = scrape_grupy_for_kierunki(kierunki)
 
     # Sekcja: Mapowanie UUID kierunków do grup (Figma: Kierunek, Wydział)
@@ -49,74 +205,7 @@ def main():
         g.pop("wydzial", None)
 
     save_grupy(wszystkie_grupy)
-    print(f"Przetworzono {len(wszystkie_grupy)} grup\n")
-
-    grupa_uuid_map = get_uuid_map("grupy", "grupa_id", "id")
-
-    print("ETAP 3: Pobieranie nauczycieli z planów grup...")
-    nauczyciele_dict = {}
-    for grupa in wszystkie_grupy:
-        html = fetch_page(grupa.get("link_strony_grupy"))
-        nauczyciele = parse_nauczyciele_from_group_page(html, grupa_id=grupa.get("grupa_id"))
-        for n in nauczyciele:
-            link = n.get("link")
-            if link and link not in nauczyciele_dict:
-                html_n = fetch_page(link)
-                details = parse_nauczyciel_details(html_n, n.get("nauczyciel_id")) if html_n else {}
-                nauczyciele_dict[link] = {
-                    "nazwa": n.get("nazwa"),
-                    "instytut": details.get("instytut"),
-                    "email": details.get("email"),
-                    "link_strony_nauczyciela": link,
-                    "link_ics_nauczyciela": details.get("link_ics_nauczyciela"),
-                    "nauczyciel_id": n.get("nauczyciel_id"),
-                }
-    nauczyciele_final = list(nauczyciele_dict.values())
-    save_nauczyciele(nauczyciele_final)
-    print(f"Przetworzono {len(nauczyciele_final)} nauczycieli\n")
-
-    nauczyciel_uuid_map = get_uuid_map("nauczyciele", "link_strony_nauczyciela", "id")
-
-    print("ETAP 4: Pobieranie i zapisywanie zajęć grup...")
-    wszystkie_id_grup = [g["grupa_id"] for g in wszystkie_grupy if g.get("grupa_id")]
-    grupa_map = {g["grupa_id"]: g for g in wszystkie_grupy if g.get("grupa_id")}
-    wyniki = download_ics_for_groups_async(wszystkie_id_grup)
-    wszystkie_zajecia_grupy = []
-    for w in wyniki:
-        if w["status"] == "success":
-            grupa_id = w["grupa_id"]
-            grupa = grupa_map.get(grupa_id, {})
-            zajecia = parse_ics_file(
-                w["ics_content"],
-                link_ics_zrodlowy=w["link_ics_zrodlowy"],
-            )
-            for z in zajecia:
-                z["grupa_id"] = grupa_id
-            wszystkie_zajecia_grupy.extend(zajecia)
-            print(f"Pobrano {len(zajecia)} zajęć dla grupy {grupa_id}")
-        else:
-            print(f"❌ Błąd pobierania ICS: {w['link_ics_zrodlowy']}")
-    save_zajecia_grupy(wszystkie_zajecia_grupy, grupa_uuid_map)
-    print(f"Zapisano {len(wszystkie_zajecia_grupy)} zajęć grup\n")
-
-    print("ETAP 5: Pobieranie i zapisywanie zajęć nauczycieli...")
-    wszystkie_zajecia_nauczyciela = []
-    for n in nauczyciele_final:
-        link = n.get("link_ics_nauczyciela")
-        nauczyciel_id = nauczyciel_uuid_map.get(n.get("link_strony_nauczyciela"))
-        if not link or not nauczyciel_id:
-            continue
-        plan = pobierz_plan_ics_nauczyciela(nauczyciel_id)
-        if plan["status"] == "success" and plan["ics_content"]:
-            zajecia = parse_ics_file(plan["ics_content"], link_ics_zrodlowy=plan["link_ics_zrodlowy"])
-            for z in zajecia:
-                z["nauczyciel_id"] = nauczyciel_id
-            wszystkie_zajecia_nauczyciela.extend(zajecia)
-            print(f"Pobrano {len(zajecia)} zajęć dla nauczyciela {nauczyciel_id}")
-    save_zajecia_nauczyciela(wszystkie_zajecia_nauczyciela, nauczyciel_uuid_map)
-    print(f"Zapisano {len(wszystkie_zajecia_nauczyciela)} zajęć nauczycieli\n")
-
-    print("Zakończono proces MVP.")
+    return wszystkie_grupy
 
 
 if __name__ == "__main__":
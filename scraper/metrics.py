@@ -0,0 +1,337 @@
+"""
+Metryki przebiegu: liczniki i histogramy z etykietami, mierzone per etap.
+
+Gorące ścieżki (http_client, downloader, fetch_page, parsery, upsert_wsadowo)
+dopisują pomiary do rejestru procesu; każdy pomiar dostaje etykietę bieżącego
+etapu (metryki.etap(...) w scraper.main). Na końcu przebiegu rejestr trafia do
+raportu JSON (SCRAPER_METRICS_PATH) i opcjonalnie do pliku tekstowego
+Prometheusa (SCRAPER_METRICS_PROM, np. katalog textfile node_exportera).
+
+Profilowanie wybranego etapu: SCRAPER_PROFILE=etap[:cprofile|sampling]
+(albo scraper.main --profil). cprofile – deterministyczny, tylko wątek główny
+(pętla asyncio ETAPÓW 4–5); sampling – próbkowanie stosów wszystkich wątków
+(pule wątków ETAPÓW 2–3), wynik w formacie collapsed stacks (flamegraph.pl,
+speedscope).
+"""
+import bisect
+import functools
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+METRICS_PATH = os.getenv("SCRAPER_METRICS_PATH", os.path.join(".cache", "metrics", "przebieg.json"))
+METRICS_PROM = os.getenv("SCRAPER_METRICS_PROM", "")
+PROFILE = os.getenv("SCRAPER_PROFILE", "")
+PROFILE_DIR = os.getenv("SCRAPER_PROFILE_DIR", os.path.join(".cache", "metrics"))
+PROFILE_INTERVAL_MS = float(os.getenv("SCRAPER_PROFILE_INTERVAL_MS", "5"))
+
+# Górne granice kubełków histogramów czasu [s]
+KUBELKI = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+PREFIKS = "myuz_"
+
+Klucz = Tuple[str, Tuple[Tuple[str, str], ...]]
+
+
+class Histogram:
+    def __init__(self, kubelki: Tuple[float, ...] = KUBELKI):
+        self.kubelki = kubelki
+        self.liczby = [0] * (len(kubelki) + 1)  # ostatni: +Inf
+        self.suma = 0.0
+        self.liczba = 0
+
+    def dodaj(self, wartosc: float):
+        self.liczby[bisect.bisect_left(self.kubelki, wartosc)] += 1
+        self.suma += wartosc
+        self.liczba += 1
+
+    def kwantyl(self, q: float) -> Optional[float]:
+        """Przybliżenie z kubełków (górna granica kubełka z q-tym pomiarem)."""
+        if not self.liczba:
+            return None
+        cel, narastajaco = q * self.liczba, 0
+        for granica, n in zip(self.kubelki, self.liczby):
+            narastajaco += n
+            if narastajaco >= cel:
+                return granica
+        return float("inf")
+
+
+def _klucz(nazwa: str, etykiety: Dict[str, Any]) -> Klucz:
+    return nazwa, tuple(sorted((k, str(v)) for k, v in etykiety.items()))
+
+
+def _zasoby() -> Dict[str, float]:
+    try:
+        import resource
+    except ImportError:  # Windows
+        return {"cpu_s": time.process_time(), "rss_mb": 0.0}
+    ru = resource.getrusage(resource.RUSAGE_SELF)
+    return {"cpu_s": ru.ru_utime + ru.ru_stime,
+            "rss_mb": ru.ru_maxrss / (1024 * 1024 if sys.platform == "darwin" else 1024)}
+
+
+class Metryki:
+    """Rejestr metryk procesu; bezpieczny dla wątków."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.liczniki: Dict[Klucz, float] = {}
+        self.histogramy: Dict[Klucz, Histogram] = {}
+        self.etapy: Dict[str, Dict[str, float]] = {}
+        self.biezacy_etap = "-"
+        self.start = time.time()
+
+    def licz(self, nazwa: str, ile: float = 1, **etykiety):
+        klucz = _klucz(nazwa, {"etap": self.biezacy_etap, **etykiety})
+        with self._lock:
+            self.liczniki[klucz] = self.liczniki.get(klucz, 0) + ile
+
+    def obserwuj(self, nazwa: str, wartosc: float, **etykiety):
+        klucz = _klucz(nazwa, {"etap": self.biezacy_etap, **etykiety})
+        with self._lock:
+            h = self.histogramy.get(klucz)
+            if h is None:
+                h = self.histogramy[klucz] = Histogram()
+            h.dodaj(wartosc)
+
+    @contextmanager
+    def czas(self, nazwa: str, **etykiety) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.obserwuj(nazwa, time.perf_counter() - start, **etykiety)
+
+    @contextmanager
+    def etap(self, nazwa: str, profil: Optional[str] = PROFILE) -> Iterator[None]:
+        """Etap przebiegu: etykieta pomiarów, czas, CPU i szczytowe RSS; opcjonalnie profil."""
+        poprzedni, self.biezacy_etap = self.biezacy_etap, nazwa
+        przed, start = _zasoby(), time.perf_counter()
+        profiler = _profiler(nazwa, profil)
+        try:
+            yield
+        finally:
+            if profiler is not None:
+                profiler.zakoncz()
+            po = _zasoby()
+            self.etapy[nazwa] = {
+                "czas_s": round(time.perf_counter() - start, 3),
+                "cpu_s": round(po["cpu_s"] - przed["cpu_s"], 3),
+                "rss_mb": round(po["rss_mb"], 1),
+            }
+            self.biezacy_etap = poprzedni
+
+    # --- Sekcja: Raporty ---
+
+    def _suma(self, nazwa: str, po: str) -> Dict[str, float]:
+        wynik: Dict[str, float] = {}
+        for (n, etykiety), v in self.liczniki.items():
+            if n == nazwa:
+                k = dict(etykiety).get(po, "-")
+                wynik[k] = wynik.get(k, 0) + v
+        return wynik
+
+    def tabele(self) -> Dict[str, Dict[str, float]]:
+        """Zapis per tabela: wiersze, czas wysyłania i tempo (wiersze/s)."""
+        wiersze, czasy = self._suma("db_wiersze", "tabela"), self._suma("db_czas_s", "tabela")
+        return {t: {"wiersze": int(n), "czas_s": round(czasy.get(t, 0), 3),
+                    "wiersze_s": round(n / czasy[t], 1) if czasy.get(t) else None}
+                for t, n in sorted(wiersze.items())}
+
+    def do_json(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "start": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(self.start)),
+                "czas_s": round(time.time() - self.start, 3),
+                "etapy": self.etapy,
+                "tabele": self.tabele(),
+                "liczniki": [{"nazwa": n, "etykiety": dict(e), "wartosc": v}
+                             for (n, e), v in sorted(self.liczniki.items())],
+                "histogramy": [{
+                    "nazwa": n,
+                    "etykiety": dict(e),
+                    "liczba": h.liczba,
+                    "suma": round(h.suma, 6),
+                    "p50": h.kwantyl(0.5),
+                    "p90": h.kwantyl(0.9),
+                    "p99": h.kwantyl(0.99),
+                    "kubelki": {str(g): n for g, n in zip(h.kubelki + ("+Inf",), h.liczby)},
+                } for (n, e), h in sorted(self.histogramy.items())],
+            }
+
+    def do_prometheus(self) -> str:
+        linie: List[str] = []
+
+        def etykiety(pary, **dodatkowe) -> str:
+            pary = list(pary) + list(dodatkowe.items())
+            if not pary:
+                return ""
+            return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pary) + "}"
+
+        with self._lock:
+            typy = set()
+            for (n, e), v in sorted(self.liczniki.items()):
+                nazwa = f"{PREFIKS}{n}_total"
+                if nazwa not in typy:
+                    typy.add(nazwa)
+                    linie.append(f"# TYPE {nazwa} counter")
+                linie.append(f"{nazwa}{etykiety(e)} {v:g}")
+            for (n, e), h in sorted(self.histogramy.items()):
+                nazwa = f"{PREFIKS}{n}"
+                if nazwa not in typy:
+                    typy.add(nazwa)
+                    linie.append(f"# TYPE {nazwa} histogram")
+                narastajaco = 0
+                for granica, liczba in zip(h.kubelki + ("+Inf",), h.liczby):
+                    narastajaco += liczba
+                    linie.append(f"{nazwa}_bucket{etykiety(e, le=granica)} {narastajaco}")
+                linie.append(f"{nazwa}_sum{etykiety(e)} {h.suma:g}")
+                linie.append(f"{nazwa}_count{etykiety(e)} {h.liczba}")
+            for pole in ("czas_s", "cpu_s", "rss_mb"):
+                nazwa = f"{PREFIKS}etap_{pole}"
+                linie.append(f"# TYPE {nazwa} gauge")
+                linie.extend(f"{nazwa}{etykiety([('etap', etap)])} {w[pole]:g}" for etap, w in self.etapy.items())
+            linie.append(f"# TYPE {PREFIKS}przebieg_koniec_timestamp gauge")
+            linie.append(f"{PREFIKS}przebieg_koniec_timestamp {time.time():.0f}")
+        return "\n".join(linie) + "\n"
+
+    def zapisz(self, path: str = METRICS_PATH, prom_path: str = METRICS_PROM):
+        """Raport JSON i (jeśli podano ścieżkę) plik Prometheusa – oba atomowo."""
+        _zapisz_atomowo(path, json.dumps(self.do_json(), ensure_ascii=False, indent=1))
+        print(f"📈 Metryki przebiegu: {path}")
+        if prom_path:
+            _zapisz_atomowo(prom_path, self.do_prometheus())
+            print(f"📈 Metryki Prometheus: {prom_path}")
+
+    def raport(self) -> str:
+        tekst = "⏱️ Etapy: " + (", ".join(f"{e} {w['czas_s']:.1f} s (CPU {w['cpu_s']:.1f} s, {w['rss_mb']:.0f} MB)"
+                                          for e, w in self.etapy.items()) or "brak")
+        for tabela, w in self.tabele().items():
+            tempo = f"{w['wiersze_s']:.0f} wierszy/s" if w["wiersze_s"] else "-"
+            tekst += f"\n   🗄️ {tabela}: {w['wiersze']} wierszy, {tempo}"
+        return tekst
+
+
+def _escape(v: Any) -> str:
+    return str(v).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _zapisz_atomowo(path: str, tresc: str):
+    # Plik tymczasowy + rename: node_exporter nie przeczyta pliku w połowie zapisu
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(tresc)
+    os.replace(tmp, path)
+
+
+# --- Sekcja: Profilowanie ---
+
+class _CProfile:
+    def __init__(self, etap: str):
+        import cProfile
+
+        self.etap = etap
+        self.profil = cProfile.Profile()
+        self.profil.enable()
+
+    def zakoncz(self):
+        import pstats
+
+        self.profil.disable()
+        path = os.path.join(PROFILE_DIR, f"profil-{self.etap}.prof")
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        self.profil.dump_stats(path)
+        print(f"🔬 Profil cProfile etapu {self.etap}: {path} (python -m pstats {path})")
+        pstats.Stats(self.profil, stream=sys.stdout).sort_stats("cumulative").print_stats(15)
+
+
+class _Probkowanie:
+    """Próbkowanie stosów wszystkich wątków co PROFILE_INTERVAL_MS (czas ścienny, także oczekiwanie)."""
+
+    def __init__(self, etap: str, interwal_s: float = PROFILE_INTERVAL_MS / 1000):
+        self.etap = etap
+        self.interwal_s = interwal_s
+        self.stosy: Dict[str, int] = {}
+        self.probki = 0
+        self._stop = threading.Event()
+        self._watek = threading.Thread(target=self._probkuj, name="profiler", daemon=True)
+        self._watek.start()
+
+    def _probkuj(self):
+        wlasny = threading.get_ident()
+        while not self._stop.wait(self.interwal_s):
+            for ident, ramka in sys._current_frames().items():
+                if ident == wlasny:
+                    continue
+                stos = []
+                while ramka is not None:
+                    kod = ramka.f_code
+                    stos.append(f"{os.path.basename(kod.co_filename)}:{kod.co_name}")
+                    ramka = ramka.f_back
+                klucz = ";".join(reversed(stos))
+                self.stosy[klucz] = self.stosy.get(klucz, 0) + 1
+            self.probki += 1
+
+    def zakoncz(self):
+        self._stop.set()
+        self._watek.join()
+        path = os.path.join(PROFILE_DIR, f"profil-{self.etap}.folded")
+        _zapisz_atomowo(path, "".join(f"{s} {n}\n" for s, n in sorted(self.stosy.items(), key=lambda x: -x[1])))
+        print(f"🔬 Profil próbkujący etapu {self.etap}: {self.probki} próbek, {path} (flamegraph.pl / speedscope)")
+        liscie: Dict[str, int] = {}
+        for stos, n in self.stosy.items():
+            lisc = stos.rsplit(";", 1)[-1]
+            liscie[lisc] = liscie.get(lisc, 0) + n
+        razem = sum(liscie.values()) or 1
+        for lisc, n in sorted(liscie.items(), key=lambda x: -x[1])[:15]:
+            print(f"   {n / razem:6.1%}  {lisc}")
+
+
+def parse_profil(tekst: Optional[str]) -> Optional[Tuple[str, str]]:
+    """"etap[:cprofile|sampling]" → (etap, tryb); puste → None."""
+    if not tekst:
+        return None
+    etap, _, tryb = tekst.partition(":")
+    tryb = tryb or "cprofile"
+    if tryb not in ("cprofile", "sampling"):
+        raise ValueError(f"nieznany tryb profilowania {tryb!r} – cprofile albo sampling")
+    return etap, tryb
+
+
+def _profiler(etap: str, profil: Optional[str]):
+    wybrany = parse_profil(profil)
+    if wybrany is None or wybrany[0] != etap:
+        return None
+    return _CProfile(etap) if wybrany[1] == "cprofile" else _Probkowanie(etap)
+
+
+_metryki: Optional[Metryki] = None
+_metryki_lock = threading.Lock()
+
+
+def mierzony(nazwa: str, **etykiety) -> Callable[[Callable], Callable]:
+    """Dekorator: czas każdego wywołania funkcji trafia do histogramu nazwa{etykiety}."""
+    def dekorator(fn):
+        @functools.wraps(fn)
+        def opakowanie(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                get_metryki().obserwuj(nazwa, time.perf_counter() - start, **etykiety)
+        return opakowanie
+    return dekorator
+
+
+def get_metryki() -> Metryki:
+    """Współdzielony rejestr metryk procesu."""
+    global _metryki
+    with _metryki_lock:
+        if _metryki is None:
+            _metryki = Metryki()
+        return _metryki
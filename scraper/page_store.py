@@ -0,0 +1,86 @@
+import threading
+from typing import Any, Callable, Dict, Optional
+
+from scraper.parsers.grupy_parser import find_ics_links, parse_grupa_details
+from scraper.metrics import mierzony
+from scraper.parsers.nauczyciel_parser import linki_nauczycieli, sprawdz_nieregularne_zajecia, zupa_planu
+from scraper.utils import fetch_page
+
+
+@mierzony("parsowanie_s", format="html_grupy")
+def parse_grupa_page(html: str, grupa_id: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Jednorazowe parsowanie strony planu grupy: wszystko, czego potrzebują ETAP 2 i 3,
+    z jednego drzewa HTML (kod, tryb, semestr, linki ICS, nauczyciele, nieregularne).
+    """
+    soup = zupa_planu(html)
+    return {
+        **parse_grupa_details(html, soup=soup),
+        "ics_links": find_ics_links(html, soup=soup),
+        "nieregularne": sprawdz_nieregularne_zajecia(html, f"grupy {grupa_id}" if grupa_id else "", soup=soup),
+        "nauczyciele": linki_nauczycieli(soup, grupa_id),
+    }
+
+
+class PageStore:
+    """
+    Artefakty stron grup z bieżącego przebiegu: URL → dane z parse_grupa_page.
+    Każda strona jest pobierana i parsowana raz; HTML nie jest przechowywany.
+    """
+
+    def __init__(self):
+        self._artefakty: Dict[str, Dict[str, Any]] = {}
+        self._blokady: Dict[str, threading.Lock] = {}
+        self._lock = threading.Lock()
+        self.stats = {"pobrane": 0, "z_magazynu": 0, "bledy": 0}
+
+    def get(self, url: str) -> Optional[Dict[str, Any]]:
+        artefakt = self._artefakty.get(url)
+        if artefakt is not None:
+            with self._lock:
+                self.stats["z_magazynu"] += 1
+        return artefakt
+
+    def put(self, url: str, artefakt: Dict[str, Any]):
+        with self._lock:
+            self._artefakty[url] = artefakt
+
+    def parsuj(self, url: str, html: str, grupa_id: Optional[str] = None) -> Dict[str, Any]:
+        """Parsuje pobraną stronę i zapisuje artefakt (dla pobierających asynchronicznie)."""
+        artefakt = parse_grupa_page(html, grupa_id)
+        self.put(url, artefakt)
+        with self._lock:
+            self.stats["pobrane"] += 1
+        return artefakt
+
+    def pobierz(self, url: str, grupa_id: Optional[str] = None,
+                fetch: Callable[[str], Optional[str]] = fetch_page) -> Optional[Dict[str, Any]]:
+        """Artefakt strony grupy; przy pierwszym użyciu pobiera i parsuje ją (raz, także przy wielu wątkach)."""
+        with self._lock:
+            blokada = self._blokady.setdefault(url, threading.Lock())
+        with blokada:
+            artefakt = self.get(url)
+            if artefakt is not None:
+                return artefakt
+            html = fetch(url)
+            if not html:
+                with self._lock:
+                    self.stats["bledy"] += 1
+                return None
+            return self.parsuj(url, html, grupa_id)
+
+    def raport(self) -> str:
+        s = self.stats
+        return f"📄 Strony grup: {s['pobrane']} pobranych i sparsowanych, {s['z_magazynu']} użyć z magazynu, błędy: {s['bledy']}"
+
+
+_store: Optional[PageStore] = None
+_store_lock = threading.Lock()
+
+
+def get_page_store() -> PageStore:
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = PageStore()
+        return _store
@@ -0,0 +1,57 @@
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+from scraper.ics_updater import parse_ics_file
+from scraper.metrics import get_metryki
+
+# Liczba procesów parsujących ICS (0 = liczba rdzeni, 1 = parsowanie w bieżącym procesie)
+PARSE_WORKERS = int(os.getenv("SCRAPER_PARSE_WORKERS", "0"))
+# Docelowy rozmiar paczki plików ICS wysyłanej do jednego procesu (mniej przesyłania)
+CHUNK_BYTES = int(os.getenv("SCRAPER_PARSE_CHUNK_BYTES", str(1024 * 1024)))
+
+# Kolejność pól w zwartych wierszach zwracanych przez procesy (jak w parse_ics_file)
+KOLUMNY = ("przedmiot", "od", "do_", "miejsce", "rz", "link_ics_zrodlowy",
+           "podgrupa", "uid", "nauczyciel", "grupy")
+
+# (klucz, treść ICS, link_ics_zrodlowy) – klucz to np. grupa_id albo nauczyciel_id
+Plik = Tuple[Any, str, Optional[str]]
+
+
+def parse_workers(workers: Optional[int] = None) -> int:
+    workers = PARSE_WORKERS if workers is None else workers
+    return workers if workers > 0 else (os.cpu_count() or 1)
+
+
+def nowy_executor(workers: int) -> ProcessPoolExecutor:
+    # "spawn": proces główny ma wątki (pula HTTP, pętla asyncio), fork mógłby skopiować zajęte blokady
+    return ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+
+
+def parsuj_paczke(paczka: List[Plik]) -> List[Tuple[Any, List[tuple], float]]:
+    """
+    Parsuje paczkę plików w procesie roboczym; zwraca krotki zamiast słowników
+    oraz czas parsowania każdego pliku (metryki procesu roboczego przepadają).
+    """
+    wyniki = []
+    for klucz, ics, link in paczka:
+        start = time.perf_counter()
+        zajecia = parse_ics_file(ics, link_ics_zrodlowy=link)
+        wyniki.append((klucz, [tuple(z[k] for k in KOLUMNY) for z in zajecia], time.perf_counter() - start))
+    return wyniki
+
+
+def rozpakuj_paczke(wyniki: List[Tuple[Any, List[tuple], float]]) -> List[Tuple[Any, List[Dict[str, Any]]]]:
+    """Wynik parsuj_paczke → (klucz, zajęcia); czasy parsowania trafiają do metryk procesu głównego."""
+    metryki = get_metryki()
+    for _, _, czas_s in wyniki:
+        metryki.obserwuj("parsowanie_s", czas_s, format="ics")
+    return [(klucz, rozpakuj(wiersze)) for klucz, wiersze, _ in wyniki]
+
+
+def rozpakuj(wiersze: List[tuple]) -> List[Dict[str, Any]]:
+    """Zwarte wiersze z procesu roboczego → słowniki identyczne z parse_ics_file."""
+    return [dict(zip(KOLUMNY, w)) for w in wiersze]
+
@@ -1,7 +1,11 @@
-from bs4 import BeautifulSoup
-from icalendar import Calendar
+from bs4 import BeautifulSoup, SoupStrainer
 import re
 from typing import Tuple, List, Dict, Optional, Any
+from scraper.parsers.ics_fast import iter_vevents
+from scraper.summary import rozloz_summary
+from scraper.parsers.html_backend import odnosniki, zupa
+
+BASE_URL = "https://plan.uz.zgora.pl/"
 
 
 # --- Sekcja: Parsowanie ICS grupy ---
@@ -10,21 +14,8 @@ def wyodrebnij_dane_z_summary_grupa(summary: str) -> Tuple[str, Optional[str], O
     """
     Ekstrahuje przedmiot, nauczyciela i podgrupę (PG) z opisu ICS GRUPY.
     """
-    przedmiot = summary
-    nauczyciel = None
-    pg = None
-    match = re.search(r"^(.*?)\s*\([^\)]+\):\s*(.+?)(?:\s*\(PG:.*\))?$", summary)
-    if match:
-        przedmiot = match.group(1).strip()
-        nauczyciel = match.group(2).strip()
-    else:
-        przedmiot = summary.strip()
-    pg_match = re.search(r"\(PG:\s*([^)]+)\)", summary)
-    if pg_match:
-        pg = pg_match.group(1).strip()
-    if nauczyciel:
-        nauczyciel = re.sub(r"\(PG:.*?\)", "", nauczyciel).strip()
-    return przedmiot, nauczyciel, pg
+    czesci = rozloz_summary(summary, "grupa")
+    return czesci.przedmiot, czesci.nauczyciel, czesci.podgrupa
 
 
 def parse_ics(
@@ -34,35 +25,30 @@ def parse_ics(
         kod_grupy: Optional[str] = None,
         kierunek_nazwa: Optional[str] = None,
         grupa_map: Optional[Dict[str, Any]] = None,
+        parser: Optional[str] = None,
 ) -> List[Dict[str, Any]]:
     """
     Parsuje plik ICS grupy i zwraca listę wydarzeń (zajęć).
+    parser: "fast" albo "icalendar" (domyślnie SCRAPER_ICS_PARSER).
     """
     if not ics_content:
         return []
     events = []
     try:
-        cal = Calendar.from_ical(ics_content)
-        for component in cal.walk('VEVENT'):
-            summary = str(component.get('summary', ''))
-            categories = component.get('categories')
-            start_time = component.get('dtstart').dt
-            end_time = component.get('dtend').dt
-            location = str(component.get('location', ''))
-            uid = str(component.get('uid', ''))
+        for component in iter_vevents(ics_content, parser):
+            summary = component['summary'] if component['summary'] is not None else ''
+            categories = component['categories']
+            start_time = component['dtstart']
+            end_time = component['dtend']
+            location = component['location'] if component['location'] is not None else ''
+            uid = component['uid'] if component['uid'] is not None else ''
 
             # RZ z kategorii
             rz = None
-            if categories:
-                try:
-                    if hasattr(categories, 'to_ical'):
-                        rz = categories.to_ical().decode(errors="ignore").strip()
-                    else:
-                        rz = str(categories).strip()
-                    if rz and len(rz) > 10:
-                        rz = rz[:10]
-                except Exception:
-                    rz = None
+            if categories is not None:
+                rz = categories
+                if rz and len(rz) > 10:
+                    rz = rz[:10]
 
             przedmiot, nauczyciel, podgrupa = wyodrebnij_dane_z_summary_grupa(summary)
 
@@ -88,11 +74,22 @@ def parse_ics(
 
 # --- Sekcja: Parsowanie szczegółów grupy z HTML ---
 
-def parse_grupa_details(html_content: str) -> Dict[str, Any]:
+def find_ics_links(html_grupy: str, soup: Optional[BeautifulSoup] = None) -> List[str]:
+    """Linki grupy_ics.php ze strony planu grupy."""
+    if soup is None:
+        hrefs = [href for href, _ in odnosniki(html_grupy, 'grupy_ics.php')]
+    else:
+        hrefs = [a['href'] for a in soup.find_all('a', href=True) if 'grupy_ics.php' in a['href']]
+    return [href if href.startswith('http') else BASE_URL + href.lstrip('/') for href in hrefs]
+
+
+def parse_grupa_details(html_content: str, soup: Optional[BeautifulSoup] = None) -> Dict[str, Any]:
     """
     Parsuje HTML planu zajęć grupy, wyciągając kod grupy, tryb studiów i semestr.
+    soup: już sparsowana strona (bez ponownego parsowania).
     """
-    soup = BeautifulSoup(html_content, 'html.parser')
+    if soup is None:
+        soup = zupa(html_content, SoupStrainer(["h2", "h3"]))
 
     # Sekcja: Kod grupy z drugiego H2 (Figma: Nagłówek grupy - np. 21F-ANG-SD23)
     h2_elements = soup.find_all('h2')
@@ -111,7 +108,6 @@ def parse_grupa_details(html_content: str) -> Dict[str, Any]:
         h3_html = str(h3)
 
         # Podziel zawartość po <br> i <br />
-        import re
         parts = re.split(r'<br\s*/?>', h3_html, flags=re.IGNORECASE)
 
         # Pierwsza część: nazwa kierunku (przed pierwszym <br>)
@@ -0,0 +1,68 @@
+import os
+from typing import Callable, List, Optional, Tuple
+
+from bs4 import BeautifulSoup, SoupStrainer
+
+# Backend HTML: "html.parser" (wbudowany), "lxml" albo "selectolax" (oba opcjonalne)
+HTML_BACKEND = os.getenv("SCRAPER_HTML_BACKEND", "html.parser")
+# Parsowanie częściowe (SoupStrainer); SCRAPER_HTML_PARTIAL=0 buduje zawsze pełne drzewo
+HTML_PARTIAL = os.getenv("SCRAPER_HTML_PARTIAL", "1") != "0"
+BACKENDY = ("html.parser", "lxml", "selectolax")
+
+try:
+    import lxml  # noqa: F401
+    _LXML = True
+except ImportError:
+    _LXML = False
+
+try:
+    from selectolax.parser import HTMLParser as _SelectolaxParser
+except ImportError:
+    _SelectolaxParser = None
+
+
+def dostepne_backendy() -> List[str]:
+    return [b for b in BACKENDY
+            if b == "html.parser" or (b == "lxml" and _LXML) or (b == "selectolax" and _SelectolaxParser)]
+
+
+def _wybierz(backend: Optional[str]) -> str:
+    backend = backend or HTML_BACKEND
+    if backend not in dostepne_backendy():
+        # Brak biblioteki → cicho wracamy do wbudowanego parsera
+        return "html.parser"
+    return backend
+
+
+def ma_klase(nazwa: str) -> Callable:
+    """Filtr atrybutu class dla SoupStrainer (przy parsowaniu class nie jest jeszcze listą)."""
+    return lambda c: c is not None and nazwa in (c if isinstance(c, list) else c.split())
+
+
+def zupa(html: str, tylko: Optional[SoupStrainer] = None, backend: Optional[str] = None) -> BeautifulSoup:
+    """
+    Drzewo BeautifulSoup z wybranego backendu. tylko: SoupStrainer – budowane są
+    wyłącznie pasujące poddrzewa (reszta dokumentu jest tylko tokenizowana).
+    selectolax nie buduje drzew bs4, więc tu korzysta z lxml albo html.parser.
+    """
+    backend = _wybierz(backend)
+    if backend == "selectolax":
+        backend = "lxml" if _LXML else "html.parser"
+    return BeautifulSoup(html, backend, parse_only=tylko if HTML_PARTIAL else None)
+
+
+def odnosniki(html: str, zawiera: str, backend: Optional[str] = None) -> List[Tuple[str, str]]:
+    """
+    (href, tekst) linków, których href zawiera dany fragment – w kolejności z dokumentu.
+    Najszybsza ścieżka dla stron, z których potrzebne są tylko linki.
+    """
+    backend = _wybierz(backend)
+    if backend == "selectolax":
+        return [
+            (a.attributes["href"], a.text(strip=True))
+            for a in _SelectolaxParser(html).css("a[href]")
+            if a.attributes.get("href") and zawiera in a.attributes["href"]
+        ]
+    pasuje = lambda h: h is not None and zawiera in h  # noqa: E731
+    soup = zupa(html, SoupStrainer("a", href=pasuje), backend)
+    return [(a["href"], a.get_text(strip=True)) for a in soup.find_all("a", href=pasuje)]
@@ -0,0 +1,163 @@
+import datetime
+import os
+import re
+from typing import Any, Dict, Iterator, Optional
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+# Wybór parsera ICS: "fast" (liniowy, bez drzewa) albo "icalendar" (pełne drzewo Calendar)
+ICS_PARSER = os.getenv("SCRAPER_ICS_PARSER", "fast")
+
+# Właściwości VEVENT potrzebne scraperowi
+_POLA = {"DTSTART", "DTEND", "SUMMARY", "LOCATION", "UID", "CATEGORIES"}
+_ESCAPE_RE = re.compile(r"\\([\\;,nN])")
+_ESCAPE_MAP = {"\\": "\\", ";": ";", ",": ",", "n": "\n", "N": "\n"}
+_UTC = datetime.timezone.utc
+_strefy: Dict[str, Optional[datetime.tzinfo]] = {}
+
+
+# --- Sekcja: Parser liniowy ---
+
+def _unescape(value: str) -> str:
+    if "\\" not in value:
+        return value
+    return _ESCAPE_RE.sub(lambda m: _ESCAPE_MAP[m.group(1)], value)
+
+
+def _strefa(tzid: str) -> Optional[datetime.tzinfo]:
+    if tzid not in _strefy:
+        try:
+            _strefy[tzid] = ZoneInfo(tzid)
+        except (ZoneInfoNotFoundError, ValueError):
+            # Tak jak icalendar bez VTIMEZONE: nieznana strefa → czas „pływający”
+            _strefy[tzid] = None
+    return _strefy[tzid]
+
+
+def _parse_dt(value: str, params: str) -> datetime.date:
+    """DATE lub DATE-TIME z ICS (z TZID, sufiksem Z albo „pływający”)."""
+    value = value.strip()
+    if len(value) == 8 or "VALUE=DATE;" in params + ";" and "T" not in value:
+        return datetime.date(int(value[:4]), int(value[4:6]), int(value[6:8]))
+    tz = None
+    if value.endswith("Z"):
+        tz = _UTC
+    elif "TZID=" in params:
+        tzid = params.split("TZID=", 1)[1].split(";", 1)[0].strip('"')
+        tz = _strefa(tzid)
+    return datetime.datetime(
+        int(value[:4]), int(value[4:6]), int(value[6:8]),
+        int(value[9:11]), int(value[11:13]), int(value[13:15]), tzinfo=tz,
+    )
+
+
+def split_property(line: str) -> tuple[str, str, str]:
+    """Dzieli linię na (NAZWA, parametry, wartość); dwukropek w cudzysłowie nie kończy parametrów."""
+    colon = line.find(":")
+    quote = line.find('"')
+    if quote != -1 and quote < colon:
+        in_quote = False
+        for i, ch in enumerate(line):
+            if ch == '"':
+                in_quote = not in_quote
+            elif ch == ":" and not in_quote:
+                colon = i
+                break
+    head, value = line[:colon], line[colon + 1:]
+    semi = head.find(";")
+    if semi == -1:
+        return head.upper(), "", value
+    return head[:semi].upper(), head[semi + 1:], value
+
+
+def unfold(ics_content: str) -> Iterator[str]:
+    """Łączy linie zawinięte (RFC 5545: kontynuacja zaczyna się spacją lub tabulatorem)."""
+    current = None
+    for line in ics_content.splitlines():
+        if line[:1] in (" ", "\t"):
+            if current is not None:
+                current += line[1:]
+            continue
+        if current is not None:
+            yield current
+        current = line
+    if current is not None:
+        yield current
+
+
+def iter_vevents_fast(ics_content: str) -> Iterator[Dict[str, Any]]:
+    """
+    Strumieniowo zwraca wydarzenia VEVENT jako słowniki:
+    uid, summary, location, categories (surowa wartość), dtstart, dtend.
+    Nie buduje drzewa kalendarza; zagnieżdżone komponenty (np. VALARM) są pomijane.
+    """
+    event = None
+    depth = 0
+    for line in unfold(ics_content):
+        if event is None:
+            if line == "BEGIN:VEVENT":
+                event = {}
+                depth = 0
+            continue
+        if line.startswith("BEGIN:"):
+            depth += 1
+            continue
+        if line.startswith("END:"):
+            if depth:
+                depth -= 1
+                continue
+            # END:VEVENT
+            if "DTSTART" not in event or "DTEND" not in event:
+                raise ValueError(f"VEVENT bez DTSTART/DTEND (UID: {event.get('UID')})")
+            yield {
+                "uid": _unescape(event["UID"][1]) if "UID" in event else None,
+                "summary": _unescape(event["SUMMARY"][1]) if "SUMMARY" in event else None,
+                "location": _unescape(event["LOCATION"][1]) if "LOCATION" in event else None,
+                "categories": event["CATEGORIES"][1].strip() if "CATEGORIES" in event else None,
+                "dtstart": _parse_dt(event["DTSTART"][1], event["DTSTART"][0]),
+                "dtend": _parse_dt(event["DTEND"][1], event["DTEND"][0]),
+            }
+            event = None
+            continue
+        if depth:
+            continue
+        name, params, value = split_property(line)
+        if name in _POLA:
+            if name == "CATEGORIES" and name in event:
+                # Kilka linii CATEGORIES łączymy jak jedną listę
+                value = event[name][1] + "," + value
+            event[name] = (params, value)
+
+
+# --- Sekcja: Ścieżka icalendar (referencyjna) ---
+
+def iter_vevents_icalendar(ics_content: str) -> Iterator[Dict[str, Any]]:
+    """Te same słowniki co iter_vevents_fast, ale z pełnego drzewa icalendar.Calendar."""
+    from icalendar import Calendar
+
+    cal = Calendar.from_ical(ics_content)
+    for component in cal.walk("VEVENT"):
+        categories = component.get("categories")
+        if categories is not None:
+            if isinstance(categories, (list, tuple)):
+                categories = ",".join(c.to_ical().decode(errors="ignore") for c in categories)
+            elif hasattr(categories, "to_ical"):
+                categories = categories.to_ical().decode(errors="ignore")
+            categories = str(categories).strip()
+        summary = component.get("summary")
+        location = component.get("location")
+        uid = component.get("uid")
+        yield {
+            "uid": str(uid) if uid is not None else None,
+            "summary": str(summary) if summary is not None else None,
+            "location": str(location) if location is not None else None,
+            "categories": categories,
+            "dtstart": component.get("dtstart").dt,
+            "dtend": component.get("dtend").dt,
+        }
+
+
+def iter_vevents(ics_content: str, parser: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+    """Wydarzenia VEVENT z wybranego parsera (domyślnie SCRAPER_ICS_PARSER)."""
+    if (parser or ICS_PARSER) == "icalendar":
+        return iter_vevents_icalendar(ics_content)
+    return iter_vevents_fast(ics_content)
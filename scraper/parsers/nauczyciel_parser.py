@@ -1,27 +1,42 @@
-from bs4 import BeautifulSoup
+from bs4 import BeautifulSoup, SoupStrainer
 from scraper.utils import sanitize_string, fetch_page
-from icalendar import Calendar
+from scraper.ics_probe import wybierz_link_ics
 import re
 from typing import List, Dict, Optional, Any
+from scraper.parsers.html_backend import zupa
+from scraper.metrics import mierzony
 
 BASE_URL = "https://plan.uz.zgora.pl/"
 
+# Elementy stron planu (grupy i nauczyciela), z których korzystają parsery; reszta nie jest budowana.
+# Wiersze tabeli są potrzebne tylko do sprawdzenia zajęć nieregularnych.
+TYLKO_PLAN = SoupStrainer(["h2", "h3", "h4", "a"])
+TYLKO_PLAN_Z_TABELA = SoupStrainer(["h2", "h3", "h4", "a", "tr", "td"])
+_SLOWA_NIEREGULARNE = ("nieregularne", "brak zaplanowanych zajęć", "brak zajęć")
 
-def sprawdz_nieregularne_zajecia(html: str, identyfikator: str = "") -> bool:
+
+def _moze_miec_nieregularne(html: str) -> bool:
+    html_lower = html.lower()
+    return any(slowo in html_lower for slowo in _SLOWA_NIEREGULARNE)
+
+
+def zupa_planu(html: str) -> BeautifulSoup:
+    """Częściowe drzewo strony planu: nagłówki i linki, a wiersze tabeli tylko w razie potrzeby."""
+    return zupa(html, TYLKO_PLAN_Z_TABELA if _moze_miec_nieregularne(html) else TYLKO_PLAN)
+
+
+def sprawdz_nieregularne_zajecia(html: str, identyfikator: str = "", soup: BeautifulSoup = None) -> bool:
     """
     Sprawdza, czy w planie znajduje się rubryka 'Nieregularne' lub 'brak zaplanowanych zajęć'.
-    Zwraca True jeśli tak.
+    Zwraca True jeśli tak. soup: już sparsowana strona (bez ponownego parsowania).
     """
     if not html:
         return False
 
-    soup = BeautifulSoup(html, "html.parser")
-    html_lower = html.lower()
-
     # Sprawdź różne warianty
-    if ("nieregularne" in html_lower or
-            "brak zaplanowanych zajęć" in html_lower or
-            "brak zajęć" in html_lower):
+    if _moze_miec_nieregularne(html):
+        if soup is None:
+            soup = zupa(html, SoupStrainer(["tr", "td"]))
 
         # Sprawdź czy to jedyne zajęcia (czy są tylko nieregularne)
         td = soup.find("td", class_="gray-day")
@@ -38,13 +53,20 @@ def sprawdz_nieregularne_zajecia(html: str, identyfikator: str = "") -> bool:
     return False
 
 
-def parse_nauczyciele_from_group_page(html: str, grupa_id: str = None) -> List[Dict[str, Any]]:
+def parse_nauczyciele_from_group_page(html: str, grupa_id: str = None,
+                                      soup: BeautifulSoup = None) -> List[Dict[str, Any]]:
     """Parsuje HTML planu zajęć grupy i wyodrębnia linki do stron nauczycieli."""
     if html is None:
         print(f"❌ Strona grupy jest pusta, pomijam parse_nauczyciele_from_group_page")
         return []
-    sprawdz_nieregularne_zajecia(html, f"grupy {grupa_id}" if grupa_id else "")
-    soup = BeautifulSoup(html, "html.parser")
+    if soup is None:
+        soup = zupa_planu(html)
+    sprawdz_nieregularne_zajecia(html, f"grupy {grupa_id}" if grupa_id else "", soup=soup)
+    return linki_nauczycieli(soup, grupa_id)
+
+
+def linki_nauczycieli(soup: BeautifulSoup, grupa_id: str = None) -> List[Dict[str, Any]]:
+    """Unikalne linki nauczycieli z już sparsowanej strony planu grupy."""
     wynik = []
     znalezieni_nauczyciele = set()
     nauczyciel_links = soup.find_all("a", href=lambda href: href and "nauczyciel_plan.php?ID=" in href)
@@ -65,14 +87,18 @@ def parse_nauczyciele_from_group_page(html: str, grupa_id: str = None) -> List[D
     return wynik
 
 
-def parse_nauczyciel_details(html: str, nauczyciel_id: str = None) -> Dict[str, Any]:
+@mierzony("parsowanie_s", format="html_nauczyciela")
+def parse_nauczyciel_details(html: str, nauczyciel_id: str = None, sonduj_ics: bool = True) -> Dict[str, Any]:
+    """
+    Parsuje stronę nauczyciela. Przy sonduj_ics=False link ICS nie jest wybierany
+    (robi to zbiorczo ics_probe.probe_nauczyciele_ics), więc parsowanie nie czeka na sieć.
+    """
     if html is None:
         print(f"❌ Strona nauczyciela jest pusta, pomijam parse_nauczyciel_details")
         return {}
 
-    sprawdz_nieregularne_zajecia(html, f"nauczyciela {nauczyciel_id}" if nauczyciel_id else "")
-
-    soup = BeautifulSoup(html, "html.parser")
+    soup = zupa_planu(html)
+    sprawdz_nieregularne_zajecia(html, f"nauczyciela {nauczyciel_id}" if nauczyciel_id else "", soup=soup)
     dane = {}
 
     # Imię i nazwisko (drugi H2 po "Plan zajęć")
@@ -110,22 +136,7 @@ def parse_nauczyciel_details(html: str, nauczyciel_id: str = None) -> Dict[str,
         dane["link_strony_nauczyciela"] = f"{BASE_URL}nauczyciel_plan.php?ID={nauczyciel_id}"
 
         # Link do ICS nauczyciela: preferuj letni, potem zimowy, na końcu ogólny
-        ics_links = [
-            f"{BASE_URL}nauczyciel_ics.php?ID={nauczyciel_id}&KIND=GG&S=0",
-            f"{BASE_URL}nauczyciel_ics.php?ID={nauczyciel_id}&KIND=GG&S=1",
-            f"{BASE_URL}nauczyciel_ics.php?ID={nauczyciel_id}&KIND=GG"
-        ]
-        import requests
-        for url in ics_links:
-            try:
-                resp = requests.head(url, timeout=5)
-                if resp.status_code == 200 and "text/calendar" in resp.headers.get("content-type", ""):
-                    dane["link_ics_nauczyciela"] = url
-                    break
-            except Exception:
-                continue
-        # Jeśli żaden nie działa, ustaw ogólny
-        if "link_ics_nauczyciela" not in dane:
-            dane["link_ics_nauczyciela"] = ics_links[-1]
+        if sonduj_ics:
+            dane["link_ics_nauczyciela"] = wybierz_link_ics(nauczyciel_id)
 
     return dane
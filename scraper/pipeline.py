@@ -0,0 +1,385 @@
+import asyncio
+import math
+import random
+import time
+
+from scraper.adaptive_limiter import AdaptiveLimiter
+from scraper.db import (DB_SYNC, save_zajecia_grupy, save_zajecia_nauczyciela, sync_zajecia_grupy,
+                        sync_zajecia_nauczyciela)
+from scraper.downloader import fetch_ics_nauczyciela, fetch_ics_with_fallback, zrodla_ics_nauczyciela
+from scraper.fingerprints import get_fingerprint_store
+from scraper.http_client import AsyncHttpClient
+from scraper.ics_updater import parse_ics_file, plan_kompletny, polacz_po_uid
+from scraper.parallel_parse import (CHUNK_BYTES, parsuj_paczke, nowy_executor, parse_workers,
+                                    rozpakuj_paczke)
+from scraper.shards import klucz_nauczyciela
+from scraper.teacher_index import PROBKA, PROBKA_MIN, PROG, porownaj, zachowane_wiersze, zbuduj_indeks
+from scraper.variant_store import VariantStore
+
+_KONIEC = None  # znacznik końca strumienia w kolejkach
+
+
+async def _strumien(zadania: list[tuple], pobierz, synchronizuj, zapisz_wiersze, kolumna: str, etykieta: str,
+                    opis: tuple[str, str], max_concurrent: int, parser_workers: int | None, batch_size: int,
+                    queue_size: int, chunk_bytes: int, postep=None, pomin_niezmienione: bool = True) -> dict:
+    """
+    Wspólny strumień ETAPÓW 4 i 5: pobieranie ICS → parsowanie → zapis w batchach.
+
+    Etapy połączone są ograniczonymi kolejkami, więc pełna kolejka zatrzymuje
+    etap poprzedni (backpressure). W pamięci jest naraz najwyżej queue_size planów
+    ICS i jeden niezapisany batch zajęć – niezależnie od liczby właścicieli.
+    Parsowanie idzie paczkami do puli procesów (parser_workers); przy
+    parser_workers=1 – w wątku. Plan z kilku plików (semestrów) łączony jest po UID
+    sparsowanych wydarzeń. Plany, których odcisk treści nie zmienił się od
+    ostatniego udanego zapisu, są pomijane (fingerprints), chyba że
+    pomin_niezmienione=False.
+    zadania: (właściciel wpisywany w kolumnę wierszy, klucz postępu, argument dla pobierz).
+    pobierz(client, limiter, argument): {'status', 'pliki': [(link, treść)], 'link_ics_zrodlowy', 'zapytania'}.
+    synchronizuj(batch, właściciele z kompletnym planem, bledy) → wynik sync_zajecia (tryb diff);
+    zapisz_wiersze(batch, bledy) → liczba zapisanych (tryb upsert).
+    opis: (dopełniacz l.poj., dopełniacz l.mn.) właściciela do komunikatów, np. ("grupy", "grup").
+    """
+    loop = asyncio.get_running_loop()
+    pobrane: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+    sparsowane: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+    kolejka_pobran = iter(zadania)
+    limiter = AdaptiveLimiter(initial=min(16, max_concurrent), max_limit=max_concurrent)
+    odciski = get_fingerprint_store()
+    stats = {"ok": 0, "bez_zmian": 0, "bledy": 0, "zajecia": 0, "zapisane": 0, "usuniete": 0,
+             "wiersze_bez_zmian": 0, "batche": 0, "zapytania": 0}
+
+    async def pobieranie(client: AsyncHttpClient):
+        for wlasciciel, klucz, argument in kolejka_pobran:
+            wynik = await pobierz(client, limiter, argument)
+            stats["zapytania"] += wynik["zapytania"]
+            await pobrane.put((wynik, wlasciciel, klucz))
+
+    async def parsowanie():
+        koniec = False
+        while not koniec:
+            # Jeden plan czekając, potem dobieramy gotowe plany do paczki (mniej przesyłania do procesów)
+            paczka, zrodla, rozmiar = [], [], 0
+            element = await pobrane.get()
+            while True:
+                if element is _KONIEC:
+                    koniec = True
+                    break
+                w, wlasciciel, klucz = element
+                if w["status"] != "success":
+                    stats["bledy"] += 1
+                    print(f"❌ Błąd pobierania ICS {opis[0]}: {w['link_ics_zrodlowy']}")
+                else:
+                    tresc = "\n".join(ics for _, ics in w["pliki"])
+                    do_przetworzenia, odcisk = odciski.sprawdz(w["link_ics_zrodlowy"], tresc)
+                    if do_przetworzenia or not pomin_niezmienione:
+                        paczka.extend((wlasciciel, ics, w["link_ics_zrodlowy"]) for _, ics in w["pliki"])
+                        zrodla.append((wlasciciel, klucz, w["link_ics_zrodlowy"], odcisk, len(w["pliki"])))
+                        rozmiar += len(tresc)
+                    else:
+                        stats["bez_zmian"] += 1
+                        if postep is not None:
+                            postep.oznacz([klucz])
+                if rozmiar >= chunk_bytes or pobrane.empty():
+                    break
+                element = pobrane.get_nowait()
+            if not paczka:
+                continue
+            if executor is None:
+                wyniki = await loop.run_in_executor(
+                    None, lambda: [(k, parse_ics_file(ics, link_ics_zrodlowy=link)) for k, ics, link in paczka]
+                )
+            else:
+                wyniki = rozpakuj_paczke(await loop.run_in_executor(executor, parsuj_paczke, paczka))
+            pliki = iter(zip(wyniki, paczka))
+            for wlasciciel, klucz, link_zrodla, odcisk, liczba_plikow in zrodla:
+                semestry = [next(pliki) for _ in range(liczba_plikow)]
+                kompletny = all(plan_kompletny(ics, zajecia) for (_, zajecia), (_, ics, _) in semestry)
+                zajecia = polacz_po_uid(*(zajecia for (_, zajecia), _ in semestry))
+                for z in zajecia:
+                    z[kolumna] = wlasciciel
+                stats["zajecia"] += len(zajecia)
+                print(f"Pobrano {len(zajecia)} zajęć dla {opis[0]} {klucz}")
+                await sparsowane.put((zajecia, (wlasciciel, klucz, link_zrodla, odcisk, kompletny)))
+
+    async def zapis():
+        batch, zrodla = [], []
+        while (element := await sparsowane.get()) is not _KONIEC:
+            zajecia, zrodlo = element
+            batch.extend(zajecia)
+            zrodla.append(zrodlo)
+            if len(batch) >= batch_size:
+                await zapisz(batch, zrodla)
+                batch, zrodla = [], []
+        if zrodla:
+            await zapisz(batch, zrodla)
+
+    async def zapisz(batch, zrodla):
+        bledy = []
+        if DB_SYNC == "diff":
+            # Tylko zmiany; wiersze właścicieli z kompletnym planem, których nie ma w batchu, są usuwane
+            kompletni = [wlasciciel for wlasciciel, _, _, _, kompletny in zrodla if kompletny]
+            wynik = await loop.run_in_executor(None, lambda: synchronizuj(batch, kompletni, bledy))
+            stats["zapisane"] += wynik["dodane"] + wynik["zmienione"] - wynik["bledy"]
+            stats["usuniete"] += wynik["usuniete"]
+            stats["wiersze_bez_zmian"] += wynik["bez_zmian"]
+        elif batch:
+            stats["zapisane"] += await loop.run_in_executor(None, lambda: zapisz_wiersze(batch, bledy))
+        stats["batche"] += 1
+        # Odcisk zatwierdzamy tylko dla planów zapisanych w całości
+        nieudane = {r.get("link_ics_zrodlowy") for r in bledy}
+        zapisani = []
+        for _, klucz, link_zrodla, odcisk, kompletny in zrodla:
+            if kompletny and link_zrodla not in nieudane:
+                odciski.zatwierdz(link_zrodla, odcisk)
+                zapisani.append(klucz)
+        stats["ok"] += len(zapisani)
+        if postep is not None:
+            postep.oznacz(zapisani)
+
+    parser_workers = parse_workers(parser_workers)
+    executor = nowy_executor(parser_workers) if parser_workers > 1 and zadania else None
+    start = time.perf_counter()
+    try:
+        async with AsyncHttpClient(limit=max_concurrent, limit_per_host=max_concurrent) as client:
+            zapisujacy = asyncio.create_task(zapis())
+            parsujacy = [asyncio.create_task(parsowanie()) for _ in range(parser_workers)]
+            await asyncio.gather(*(pobieranie(client) for _ in range(max_concurrent)))
+            for _ in parsujacy:
+                await pobrane.put(_KONIEC)
+            await asyncio.gather(*parsujacy)
+            await sparsowane.put(_KONIEC)
+            await zapisujacy
+    finally:
+        if executor is not None:
+            executor.shutdown()
+    odciski.save()
+    stats["czas_s"] = round(time.perf_counter() - start, 2)
+    print(limiter.raport())
+    print(odciski.raport())
+    print(
+        f"📊 {etykieta}: {stats['ok']} {opis[1]} OK, {stats['bez_zmian']} bez zmian (pominięte), "
+        f"{stats['bledy']} błędów, "
+        f"{stats['zajecia']} zajęć, {stats['zapisane']} zapisanych w {stats['batche']} batchach "
+        f"({stats['wiersze_bez_zmian']} wierszy bez zmian, {stats['usuniete']} usuniętych), "
+        f"{stats['zapytania']} zapytań, {stats['czas_s']} s"
+    )
+    return stats
+
+
+async def stream_zajecia_grup(grupa_ids: list[str], grupa_uuid_map: dict, max_concurrent: int = 100,
+                              parser_workers: int | None = None, batch_size: int = 500,
+                              queue_size: int = 32, chunk_bytes: int = CHUNK_BYTES, postep=None) -> dict:
+    """
+    Strumieniowy ETAP 4 (_strumien): ICS grup z kolejnymi wariantami semestru
+    (VariantStore) → parsowanie → zapis w batchach.
+    postep: checkpoints.Postep – oznaczane są grupy zapisane w całości albo bez zmian.
+    """
+    warianty = VariantStore()
+    zadania, bez_wiersza = [], 0
+    for grupa_id in grupa_ids:
+        if str(grupa_id) in grupa_uuid_map:
+            zadania.append((grupa_id, grupa_id, grupa_id))
+        else:
+            bez_wiersza += 1  # zajęcia i tak nie miałyby się do czego odwołać
+    if bez_wiersza:
+        print(f"⚠️ {bez_wiersza} grup bez wiersza w bazie – pomijam ich plany")
+
+    async def pobierz(client: AsyncHttpClient, limiter: AdaptiveLimiter, grupa_id: str) -> dict:
+        w = await fetch_ics_with_fallback(client, grupa_id, warianty=warianty, limiter=limiter)
+        return {**w, "pliki": [(w["link_ics_zrodlowy"], w["ics_content"])] if w["status"] == "success" else []}
+
+    stats = await _strumien(
+        zadania, pobierz,
+        lambda batch, grupy, bledy: sync_zajecia_grupy(batch, grupa_uuid_map, grupy, batch_size=batch_size,
+                                                       bledy=bledy, verbose=False),
+        lambda batch, bledy: save_zajecia_grupy(batch, grupa_uuid_map, batch_size=batch_size, verbose=False,
+                                                bledy=bledy),
+        "grupa_id", "ETAP 4", ("grupy", "grup"), max_concurrent, parser_workers, batch_size, queue_size,
+        chunk_bytes, postep
+    )
+    warianty.save()
+    stats["bez_wiersza"] = bez_wiersza
+    return stats
+
+
+def run_zajecia_grup_pipeline(grupa_ids: list[str], grupa_uuid_map: dict, **kwargs) -> dict:
+    """Synchroniczne wejście do stream_zajecia_grup."""
+    return asyncio.run(stream_zajecia_grup(grupa_ids, grupa_uuid_map, **kwargs))
+
+
+async def stream_zajecia_nauczycieli(nauczyciele: list[dict], nauczyciel_uuid_map: dict, max_concurrent: int = 64,
+                                     parser_workers: int | None = None, batch_size: int = 1000,
+                                     queue_size: int = 32, chunk_bytes: int = CHUNK_BYTES, postep=None,
+                                     pomin_niezmienione: bool = True) -> dict:
+    """
+    Strumieniowy ETAP 5 (_strumien): ICS nauczycieli (oba semestry naraz)
+    → parsowanie → zapis w batchach.
+    nauczyciel_uuid_map: link_strony_nauczyciela → UUID; ICS pobierany jest po ID
+    z UZ (z linków nauczyciela). postep: klucze link_strony_nauczyciela.
+    pomin_niezmienione=False: plany przetwarzane mimo niezmienionego odcisku
+    (w bazie mogą być wiersze z innego źródła, np. wyprowadzone z planów grup).
+    """
+    zrobione = postep.zrobione if postep is not None else set()
+    zadania, pominieci, bez_id = [], 0, 0
+    for n in nauczyciele:
+        link_strony = n.get("link_strony_nauczyciela")
+        if link_strony in zrobione:
+            pominieci += 1
+        elif not n.get("link_ics_nauczyciela") or not nauczyciel_uuid_map.get(link_strony):
+            # Bez planu albo bez wiersza w bazie – nie ma czego pobierać
+            if postep is not None:
+                postep.oznacz([link_strony])
+        elif klucz_nauczyciela(n) is None:
+            bez_id += 1
+            print(f"⚠️ Brak ID nauczyciela z UZ w linkach – pomijam plan {link_strony}")
+        else:
+            zadania.append((nauczyciel_uuid_map[link_strony], link_strony, klucz_nauczyciela(n)))
+
+    async def pobierz(client: AsyncHttpClient, limiter: AdaptiveLimiter, uz_id: str) -> dict:
+        return await fetch_ics_nauczyciela(client, uz_id, limiter=limiter)
+
+    stats = await _strumien(
+        zadania, pobierz,
+        lambda batch, uuids, bledy: sync_zajecia_nauczyciela(batch, uuids, batch_size=batch_size, bledy=bledy,
+                                                             verbose=False),
+        lambda batch, bledy: save_zajecia_nauczyciela(batch, nauczyciel_uuid_map, batch_size=batch_size,
+                                                      bledy=bledy),
+        "nauczyciel_id", "ETAP 5", ("nauczyciela", "nauczycieli"), max_concurrent, parser_workers, batch_size,
+        queue_size, chunk_bytes, postep, pomin_niezmienione
+    )
+    if bez_id:
+        print(f"⚠️ ETAP 5: {bez_id} nauczycieli bez ID z UZ (pominięci)")
+    stats.update(pominieci=pominieci, bez_id=bez_id)
+    return stats
+
+
+def run_zajecia_nauczycieli_pipeline(nauczyciele: list[dict], nauczyciel_uuid_map: dict, **kwargs) -> dict:
+    """Synchroniczne wejście do stream_zajecia_nauczycieli."""
+    return asyncio.run(stream_zajecia_nauczycieli(nauczyciele, nauczyciel_uuid_map, **kwargs))
+
+
+async def pobierz_plany_nauczycieli(nauczyciele: list[dict], max_concurrent: int = 16) -> dict:
+    """Plany z ICS wskazanych nauczycieli (semestry połączone po UID): link strony → zajęcia albo None."""
+    nauczyciele = [n for n in nauczyciele if klucz_nauczyciela(n) is not None]
+    limiter = AdaptiveLimiter(initial=min(8, max_concurrent), max_limit=max_concurrent)
+    async with AsyncHttpClient(limit=max_concurrent, limit_per_host=max_concurrent) as client:
+        wyniki = await asyncio.gather(*(fetch_ics_nauczyciela(client, klucz_nauczyciela(n), limiter=limiter)
+                                        for n in nauczyciele))
+    plany = {}
+    for n, w in zip(nauczyciele, wyniki):
+        plany[n["link_strony_nauczyciela"]] = polacz_po_uid(*(
+            parse_ics_file(ics, link_ics_zrodlowy=w["link_ics_zrodlowy"]) for _, ics in w["pliki"]
+        )) if w["status"] == "success" else None
+    return plany
+
+
+def zajecia_nauczycieli_z_grup(nauczyciele: list[dict], nauczyciel_uuid_map: dict, postep=None,
+                               probka: float = PROBKA, batch_size: int = 1000) -> dict:
+    """
+    ETAP 5 w trybie z_grup: plany nauczycieli pokrytych przez indeks zajęć grup
+    (teacher_index) powstają lokalnie, ICS pobierany jest tylko dla pozostałych.
+    Losowa próbka pokrytych nauczycieli jest porównywana z ich prawdziwym ICS;
+    przy niezgodności nauczyciel przechodzi do pobierania, a gdy niezgodnych jest
+    więcej niż PROG próbki – wszyscy pokryci. Wiersze nauczycieli, których nie da
+    się wyprowadzić z grup (np. konsultacje), zostają w bazie (zachowane_wiersze).
+    """
+    from scraper.db import get_storage
+
+    start = time.perf_counter()
+    backend = get_storage()
+    indeks = zbuduj_indeks(backend, nauczyciele)
+    print(indeks.raport())
+    zrobione = postep.zrobione if postep is not None else set()
+    pokryci, do_pobrania, pominieci = [], [], 0
+    for n in nauczyciele:
+        link = n.get("link_strony_nauczyciela")
+        if not indeks.pokryty(link) or not nauczyciel_uuid_map.get(link):
+            do_pobrania.append(n)  # wznowienie (postep) obsługuje stream_zajecia_nauczycieli
+        elif link in zrobione:
+            pominieci += 1
+        else:
+            pokryci.append(n)
+
+    # Kontrola spójności na próbce: prawdziwy ICS vs wyprowadzony plan
+    kontrola = random.sample(pokryci, min(len(pokryci), max(PROBKA_MIN, math.ceil(len(pokryci) * probka))))
+    niezgodni, sprawdzeni = set(), 0
+    suma = {"zgodne": 0, "brakujace": 0, "nadmiarowe": 0, "inne_grupy": 0}
+    for link, pobrane in asyncio.run(pobierz_plany_nauczycieli(kontrola)).items():
+        if pobrane is None:
+            continue
+        sprawdzeni += 1
+        wynik = porownaj(indeks.wiersze(link, "", None), pobrane)
+        for k, v in wynik.items():
+            suma[k] += v
+        if wynik["brakujace"] or wynik["nadmiarowe"] or wynik["inne_grupy"]:
+            niezgodni.add(link)
+            print(f"⚠️ Plan z grup różni się od ICS nauczyciela {link}: {wynik}")
+    print(f"🔎 Kontrola z_grup: {len(kontrola)} nauczycieli, {len(niezgodni)} niezgodnych; wydarzenia: "
+          f"{suma['zgodne']} zgodnych, {suma['brakujace']} brakujących, {suma['nadmiarowe']} nadmiarowych, "
+          f"{suma['inne_grupy']} z innymi grupami")
+    odrzuceni = niezgodni
+    if sprawdzeni and len(niezgodni) / sprawdzeni > PROG:
+        # Indeks myli się zbyt często, żeby ufać mu u nauczycieli spoza próbki
+        print(f"⚠️ Niezgodnych {len(niezgodni)}/{sprawdzeni} > {PROG:.0%} – pobieram ICS wszystkich "
+              f"{len(pokryci)} pokrytych nauczycieli")
+        odrzuceni = {n["link_strony_nauczyciela"] for n in pokryci}
+    do_pobrania += [n for n in pokryci if n["link_strony_nauczyciela"] in odrzuceni]
+    pokryci = [n for n in pokryci if n["link_strony_nauczyciela"] not in odrzuceni]
+
+    stats = {"wyprowadzeni": 0, "zajecia_z_grup": 0, "zapisane_z_grup": 0, "zachowane": 0,
+             "kontrola": len(kontrola), "niezgodni": len(niezgodni)}
+
+    def zapisz(batch, partia):
+        bledy = []
+        uuids = [nauczyciel_uuid_map[n["link_strony_nauczyciela"]] for n in partia]
+        if DB_SYNC == "diff":
+            try:
+                zachowane = zachowane_wiersze(backend, batch, uuids)
+            except Exception as e:
+                # Bez istniejących wierszy nie wiadomo, czego nie usuwać – zapis bez usuwania
+                print(f"⚠️ Nie udało się wczytać zajęć nauczycieli, zapisuję bez usuwania: {e}")
+                zachowane, uuids = [], []
+            stats["zachowane"] += len(zachowane)
+            wynik = sync_zajecia_nauczyciela(batch + zachowane, uuids, batch_size=batch_size, bledy=bledy,
+                                             verbose=False)
+            stats["zapisane_z_grup"] += wynik["dodane"] + wynik["zmienione"] - wynik["bledy"]
+        else:
+            stats["zapisane_z_grup"] += save_zajecia_nauczyciela(batch, nauczyciel_uuid_map,
+                                                                 batch_size=batch_size, bledy=bledy)
+        nieudane = {r.get("nauczyciel_id") for r in bledy} | {r.get("link_ics_zrodlowy") for r in bledy}
+        zapisani = [n["link_strony_nauczyciela"] for n in partia
+                    if nauczyciel_uuid_map[n["link_strony_nauczyciela"]] not in nieudane
+                    and n.get("link_ics_nauczyciela") not in nieudane]
+        stats["wyprowadzeni"] += len(zapisani)
+        # W bazie są teraz wiersze z planów grup – kolejne pobranie ICS nie może zostać pominięte jako niezmienione
+        odciski.zapomnij(zrodlo for n in partia if n["link_strony_nauczyciela"] in zapisani
+                         and klucz_nauczyciela(n) is not None
+                         for zrodlo in zrodla_ics_nauczyciela(klucz_nauczyciela(n)))
+        if postep is not None:
+            postep.oznacz(zapisani)
+
+    odciski = get_fingerprint_store()
+    batch, partia = [], []
+    for n in pokryci:
+        link = n["link_strony_nauczyciela"]
+        batch.extend(indeks.wiersze(link, nauczyciel_uuid_map[link], n.get("link_ics_nauczyciela")))
+        partia.append(n)
+        if len(batch) >= batch_size:
+            zapisz(batch, partia)
+            batch, partia = [], []
+    if partia:
+        zapisz(batch, partia)
+    odciski.save()
+    stats["zajecia_z_grup"] = sum(len(indeks.zdarzenia[n["link_strony_nauczyciela"]]) for n in pokryci)
+    print(f"📊 ETAP 5 (z grup): {stats['wyprowadzeni']} nauczycieli bez pobierania, {stats['zajecia_z_grup']} zajęć, "
+          f"{stats['zapisane_z_grup']} zapisanych, {stats['zachowane']} zachowanych spoza grup, "
+          f"{round(time.perf_counter() - start, 2)} s; "
+          f"do pobrania {len(do_pobrania)}")
+
+    # Odcisk ICS nie mówi, czy w bazie nie zostały wiersze wyprowadzone z grup – pełna synchronizacja
+    wynik = run_zajecia_nauczycieli_pipeline(do_pobrania, nauczyciel_uuid_map, postep=postep,
+                                             pomin_niezmienione=False)
+    wynik.update(stats)
+    wynik["zajecia"] += stats["zajecia_z_grup"]
+    wynik["pominieci"] += pominieci
+    return wynik
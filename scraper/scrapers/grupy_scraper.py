@@ -1,42 +1,36 @@
-from bs4 import BeautifulSoup
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from bs4 import SoupStrainer
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, as_completed, wait
 from scraper.utils import fetch_page
 from scraper.downloader import BASE_URL
-from scraper.parsers.grupy_parser import parse_grupa_details
-
-try:
-    from tqdm import tqdm
-except ImportError:
-    def tqdm(iterable, **kwargs):
+from scraper.parsers.grupy_parser import find_ics_links  # noqa: F401 (dotychczasowy import z tego modułu)
+from scraper.page_store import get_page_store
+from scraper.parsers.html_backend import ma_klase, zupa
+
+def tqdm(iterable, **kwargs):
+    # tqdm importowany dopiero przy użyciu; bez niego – zwykły iterator
+    try:
+        from tqdm import tqdm as _tqdm
+    except ImportError:
         return iterable
-
-
-def find_ics_links(html_grupy):
-    soup = BeautifulSoup(html_grupy, "html.parser")
-    links = []
-    for a in soup.find_all('a', href=True):
-        href = a['href']
-        if 'grupy_ics.php' in href:
-            full_link = href if href.startswith('http') else BASE_URL + href.lstrip('/')
-            links.append(full_link)
-    return links
+    return _tqdm(iterable, **kwargs)
 
 
 def parse_grupa_with_fetch(link, nazwa_kierunku, wydzial, kierunek_id):
-    html_grupy = fetch_page(link)
-    if not html_grupy:
-        print(f"⚠️ Nie udało się pobrać HTML dla grupy: {link}")
-        return []
-
-    szczegoly = parse_grupa_details(html_grupy)
-    kod_grupy = szczegoly.get('kod_grupy', '')
-    tryb_studiow = szczegoly.get('tryb_studiow')
-    ics_links = find_ics_links(html_grupy)
-
     import re
     m = re.search(r'ID=(\d+)', link)
     grupa_id = m.group(1) if m else None
 
+    # Strona pobierana i parsowana raz; ETAP 3 bierze z magazynu linki nauczycieli
+    artefakt = get_page_store().pobierz(link, grupa_id)
+    if not artefakt:
+        print(f"⚠️ Nie udało się pobrać HTML dla grupy: {link}")
+        return []
+
+    kod_grupy = artefakt.get('kod_grupy', '')
+    tryb_studiow = artefakt.get('tryb_studiow')
+    ics_links = list(artefakt['ics_links'])
+
     # Debug: log informacji o przetwarzanej grupie
     print(f"  Debug grupa: kod={kod_grupy}, id={grupa_id}, ics_count={len(ics_links)}, tryb={tryb_studiow}")
 
@@ -64,12 +58,13 @@ def parse_grupa_with_fetch(link, nazwa_kierunku, wydzial, kierunek_id):
     return grupy
 
 
-def parse_grupy(html, nazwa_kierunku, wydzial, kierunek_id, max_workers=10):
-    soup = BeautifulSoup(html, 'html.parser')
+def linki_grup(html, nazwa_kierunku=None):
+    """Linki stron grup z tabeli na stronie kierunku (None, gdy strona nie ma tabeli grup)."""
+    soup = zupa(html, SoupStrainer("table", class_=ma_klase("table-bordered")))
     table = soup.find("table", class_="table-bordered")
     if not table:
         print(f"⚠️ Brak grup na stronie kierunku: {nazwa_kierunku}")
-        return []
+        return None
 
     all_links = []
     for row in table.find_all("tr"):
@@ -84,6 +79,13 @@ def parse_grupy(html, nazwa_kierunku, wydzial, kierunek_id, max_workers=10):
             continue
         full_link = f"{BASE_URL}{grupa_href}" if not grupa_href.startswith('http') else grupa_href
         all_links.append(full_link)
+    return all_links
+
+
+def parse_grupy(html, nazwa_kierunku, wydzial, kierunek_id, max_workers=10):
+    all_links = linki_grup(html, nazwa_kierunku)
+    if all_links is None:
+        return []
 
     print(f"  Znaleziono {len(all_links)} linków grup dla {nazwa_kierunku}")
 
@@ -114,36 +116,89 @@ def remove_duplicates(grupy):
     return unique
 
 
-def scrape_grupy_for_kierunki(kierunki, verbose=True, max_workers=10):
-    wszystkie_grupy = []
-    for kierunek in tqdm(kierunki, desc="Kierunki"):
-        if verbose:
-            print(f"Pobieram grupy dla kierunku: {getattr(kierunek, 'nazwa', None) or kierunek.get('nazwa')}")
-
-        # Sekcja: Pobranie danych kierunku (Figma: Link, Wydział, Nazwa, ID)
-        link_kierunku = (getattr(kierunek, 'link_strony_grupy', None) or
-                         kierunek.get('link_strony_grupy') or
-                         getattr(kierunek, 'link_strony_kierunku', None) or
-                         kierunek.get('link_strony_kierunku'))
-        wydzial = getattr(kierunek, 'wydzial', None) or kierunek.get('wydzial')
-        nazwa_kierunku = getattr(kierunek, 'nazwa', None) or kierunek.get('nazwa')
-        kierunek_id = getattr(kierunek, 'id', None) or kierunek.get('id')
+def _dane_kierunku(kierunek):
+    # Sekcja: Pobranie danych kierunku (Figma: Link, Wydział, Nazwa, ID)
+    link_kierunku = (getattr(kierunek, 'link_strony_grupy', None) or
+                     kierunek.get('link_strony_grupy') or
+                     getattr(kierunek, 'link_strony_kierunku', None) or
+                     kierunek.get('link_strony_kierunku'))
+    wydzial = getattr(kierunek, 'wydzial', None) or kierunek.get('wydzial')
+    nazwa_kierunku = getattr(kierunek, 'nazwa', None) or kierunek.get('nazwa')
+    kierunek_id = getattr(kierunek, 'id', None) or kierunek.get('id')
+    return link_kierunku, nazwa_kierunku, wydzial, kierunek_id
+
+
+def _linki_kierunku(link_kierunku, nazwa_kierunku):
+    html = fetch_page(link_kierunku)
+    if not html:
+        print(f"⚠️ Nie udało się pobrać HTML dla kierunku: {nazwa_kierunku}")
+        return None
+    return linki_grup(html, nazwa_kierunku)
+
+
+def scrape_grupy_for_kierunki(kierunki, verbose=True, max_workers=10, co_ile_postep=100):
+    """
+    ETAP 2 na jednej, długo żyjącej puli wątków i wspólnej kolejce zadań.
+
+    Strony kierunków i strony grup trafiają do tej samej puli: gdy strona kierunku
+    się pobierze, jej grupy od razu dołączają do kolejki, więc workery nie czekają
+    na koniec kierunku. Kolejność wyniku (po kierunkach) jest jak w pętli szeregowej.
+    """
+    start = time.perf_counter()
+    grupy_kierunkow = [[] for _ in kierunki]
+    stats = {"strony_kierunkow": 0, "strony_grup": 0, "grupy": 0, "bledy": 0, "w_kolejce": 0}
+
+    def postep(koniec=False):
+        czas = time.perf_counter() - start
+        strony = stats["strony_kierunkow"] + stats["strony_grup"]
+        print(f"{'📊 ETAP 2' if koniec else '⏳ ETAP 2'}: {stats['strony_kierunkow']}/{len(kierunki)} kierunków, "
+              f"{stats['strony_grup']}/{stats['w_kolejce']} stron grup, {stats['grupy']} grup, "
+              f"błędy: {stats['bledy']}, {czas:.1f} s ({strony / czas if czas > 0 else 0:.1f} stron/s)")
 
-        if not link_kierunku:
-            print(f"⚠️ Brak linku dla kierunku: {nazwa_kierunku}")
-            continue
-
-        html = fetch_page(link_kierunku)
-        if not html:
-            print(f"⚠️ Nie udało się pobrać HTML dla kierunku: {nazwa_kierunku}")
-            continue
-
-        grupy = parse_grupy(html, nazwa_kierunku, wydzial, kierunek_id, max_workers=max_workers)
-        wszystkie_grupy.extend(grupy)
-        print(f"  Pobrano łącznie {len(grupy)} grup dla kierunku")
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        oczekujace = {}
+        for i, kierunek in enumerate(kierunki):
+            link_kierunku, nazwa_kierunku, wydzial, kierunek_id = _dane_kierunku(kierunek)
+            if verbose:
+                print(f"Pobieram grupy dla kierunku: {nazwa_kierunku}")
+            if not link_kierunku:
+                print(f"⚠️ Brak linku dla kierunku: {nazwa_kierunku}")
+                continue
+            future = executor.submit(_linki_kierunku, link_kierunku, nazwa_kierunku)
+            oczekujace[future] = ("kierunek", i, (nazwa_kierunku, wydzial, kierunek_id))
+
+        while oczekujace:
+            gotowe, _ = wait(oczekujace, return_when=FIRST_COMPLETED)
+            for future in gotowe:
+                rodzaj, i, dane = oczekujace.pop(future)
+                try:
+                    wynik = future.result()
+                except Exception as e:
+                    stats["bledy"] += 1
+                    print(f"❌ Błąd przetwarzania ({rodzaj}): {e}")
+                    continue
+                if rodzaj == "kierunek":
+                    stats["strony_kierunkow"] += 1
+                    if wynik is None:
+                        stats["bledy"] += 1
+                        continue
+                    nazwa_kierunku, wydzial, kierunek_id = dane
+                    print(f"  Znaleziono {len(wynik)} linków grup dla {nazwa_kierunku}")
+                    for link in wynik:
+                        f = executor.submit(parse_grupa_with_fetch, link, nazwa_kierunku, wydzial, kierunek_id)
+                        oczekujace[f] = ("grupa", i, None)
+                    stats["w_kolejce"] += len(wynik)
+                else:
+                    stats["strony_grup"] += 1
+                    grupy_kierunkow[i].extend(wynik)
+                    stats["grupy"] += len(wynik)
+                    if stats["strony_grup"] % co_ile_postep == 0:
+                        postep()
+
+    wszystkie_grupy = [g for grupy in grupy_kierunkow for g in grupy]
+    postep(koniec=True)
 
     # Sekcja: Deduplikacja wszystkich grup (Figma: Usuwanie duplikatów)
     wszystkie_grupy = remove_duplicates(wszystkie_grupy)
     print(f"Po deduplikacji: {len(wszystkie_grupy)} unikalnych grup")
     return wszystkie_grupy
-
@@ -1,4 +1,5 @@
-from bs4 import BeautifulSoup
+from scraper.metrics import mierzony
+from scraper.parsers.html_backend import zupa
 from scraper.utils import fetch_page
 
 BASE_URL = "https://plan.uz.zgora.pl/"
@@ -18,8 +19,10 @@ def scrape_kierunki() -> list[dict]:
     return parse_departments_and_courses(html)
 
 
+@mierzony("parsowanie_s", format="html_kierunki")
 def parse_departments_and_courses(html: str) -> list[dict]:
-    soup = BeautifulSoup(html, "html.parser")
+    # Kontener to prawie cała strona – parsowanie częściowe nic tu nie daje
+    soup = zupa(html)
     container = soup.find("div", class_="container main")
     if not container:
         print("❌ Nie znaleziono głównego kontenera.")
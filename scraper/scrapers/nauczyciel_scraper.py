@@ -1,15 +1,17 @@
-import requests
-from bs4 import BeautifulSoup
-from icalendar import Calendar
 from typing import Dict, Any, List, Optional
-import re
 from scraper.parsers.nauczyciel_parser import sprawdz_nieregularne_zajecia
+from scraper.http_client import get_client
+from scraper.ics_probe import wybierz_link_ics
+from scraper.metrics import mierzony
+from scraper.parsers.ics_fast import iter_vevents
+from scraper.summary import rozloz_summary
+from scraper.parsers.html_backend import zupa
 
 BASE_URL = "https://plan.uz.zgora.pl/"
 
 def fetch_page(url: str) -> Optional[str]:
     try:
-        resp = requests.get(url, timeout=15)
+        resp = get_client().get(url, timeout=15, use_cache=True)
         resp.raise_for_status()
         return resp.text
     except Exception as e:
@@ -17,46 +19,31 @@ def fetch_page(url: str) -> Optional[str]:
         return None
 
 def get_ics_url(nauczyciel_id: str) -> Optional[str]:
-    url = f"{BASE_URL}nauczyciel_ics.php?ID={nauczyciel_id}&KIND=NT"
-    try:
-        resp = requests.head(url, timeout=5)
-        ct = resp.headers.get("content-type", "")
-        return url if resp.status_code == 200 and "text/calendar" in ct else None
-    except Exception:
-        return None
+    return wybierz_link_ics(nauczyciel_id, rodzaj="NT")
 
-def parse_ics_for_nauczyciel(ics_text: str, nauczyciel_id: str) -> List[Dict[str, Any]]:
-    cal = Calendar.from_ical(ics_text)
+@mierzony("parsowanie_s", format="ics_nauczyciela")
+def parse_ics_for_nauczyciel(ics_text: str, nauczyciel_id: str, parser: Optional[str] = None) -> List[Dict[str, Any]]:
     zajecia = []
-    for comp in cal.walk():
-        if comp.name != "VEVENT":
-            continue
-        summary = str(comp.get("SUMMARY"))
-        start = comp.get("DTSTART").dt
-        end = comp.get("DTEND").dt
-        location = comp.get("LOCATION")
-        categories = comp.get("CATEGORIES")
-        uid = comp.get("UID")
+    for comp in iter_vevents(ics_text, parser):
+        summary = str(comp["summary"])
+        start = comp["dtstart"]
+        end = comp["dtend"]
+        location = comp["location"]
+        categories = comp["categories"]
+        uid = comp["uid"]
         rz = None
-        if categories:
-            if isinstance(categories, (list, tuple)):
-                rz = ",".join([cat.to_ical().decode(errors="ignore").strip() if hasattr(cat, "to_ical") else str(cat) for cat in categories])
-            else:
-                rz = categories.to_ical().decode(errors="ignore").strip() if hasattr(categories, "to_ical") else str(categories)
+        if categories is not None:
+            rz = categories
             rz = rz[:10] if rz and len(rz) > 10 else rz
-        przedmiot = summary.split("(")[0].strip() if "(" in summary else summary.strip()
-        grupy = None
-        m = re.search(r":\s*([A-Za-z0-9\-/; ]+)", summary)
-        if m:
-            grupy = m.group(1).strip()
+        czesci = rozloz_summary(summary, "nauczyciel")
         zajecia.append({
-            "przedmiot": przedmiot,
+            "przedmiot": czesci.przedmiot,
             "rz": rz,
             "od": start.isoformat() if hasattr(start, "isoformat") else str(start),
             "do_": end.isoformat() if hasattr(end, "isoformat") else str(end),
             "miejsce": location,
             "uid": str(uid) if uid else None,
-            "grupy": grupy,
+            "grupy": czesci.grupy,
             "nauczyciel_id": nauczyciel_id,
         })
     return zajecia
@@ -66,8 +53,9 @@ def scrape_nauczyciel_and_zajecia(nauczyciel_id: str) -> Optional[dict]:
     if not html:
         print(f"Nie udało się pobrać strony nauczyciela {nauczyciel_id}")
         return None
-    ma_nieregularne = sprawdz_nieregularne_zajecia(html, f"nauczyciela {nauczyciel_id}")
-    soup = BeautifulSoup(html, "html.parser")
+    # Pełne drzewo: komunikat o braku zajęć może być w dowolnym miejscu strony
+    soup = zupa(html)
+    ma_nieregularne = sprawdz_nieregularne_zajecia(html, f"nauczyciela {nauczyciel_id}", soup=soup)
     komunikat = soup.find(string=lambda s: s and "nie ma jeszcze zaplanowanych żadnych zajęć" in s.lower())
     # Dane nauczyciela
     h2_tags = soup.find_all("h2")
@@ -0,0 +1,59 @@
+"""
+Podział pracy etapów na shardy (--shard i/N).
+
+Element (grupa, nauczyciel) trafia do sharda wg stabilnego hasha swojego
+klucza – ten sam element zawsze do tego samego runnera, niezależnie od
+kolejności i liczby pozostałych elementów (dzięki temu cache HTTP i odciski
+ICS shardu pozostają ciepłe między uruchomieniami). Wyniki shardów (osobne
+pliki SQLite) łączy storage_sync, deduplikując po tych samych kluczach co
+save_grupy / save_zajecia_*.
+"""
+import argparse
+import hashlib
+import re
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+Shard = Tuple[int, int]  # (numer sharda od 1, liczba shardów)
+
+
+def parse_shard(tekst: str) -> Shard:
+    m = re.fullmatch(r"\s*(\d+)\s*/\s*(\d+)\s*", tekst or "")
+    if not m or not 1 <= int(m.group(1)) <= int(m.group(2)):
+        raise argparse.ArgumentTypeError(f"niepoprawny shard {tekst!r} – oczekiwano i/N, gdzie 1 ≤ i ≤ N")
+    return int(m.group(1)), int(m.group(2))
+
+
+def opis_sharda(shard: Optional[Shard]) -> Optional[str]:
+    return f"{shard[0]}/{shard[1]}" if shard else None
+
+
+def numer_sharda(klucz: Any, liczba: int) -> int:
+    """Numer sharda 1..liczba dla klucza – stały między procesami i uruchomieniami (bez hash())."""
+    skrot = hashlib.sha1(str(klucz).strip().casefold().encode("utf-8")).digest()
+    return int.from_bytes(skrot[:8], "big") % liczba + 1
+
+
+def klucz_grupy(g: Dict[str, Any]) -> Any:
+    return g.get("grupa_id")
+
+
+def klucz_nauczyciela(n: Dict[str, Any]) -> Optional[str]:
+    """
+    Id nauczyciela z UZ – z linku (wiersze z bazy nie mają nauczyciel_id), awaryjnie z crawlera.
+    None, gdy go nie ma: bez id nie da się zbudować linku ICS (wywołujący pomija takiego nauczyciela).
+    """
+    for pole in ("link_strony_nauczyciela", "link_ics_nauczyciela"):
+        m = re.search(r"ID=(\d+)", n.get(pole) or "")
+        if m:
+            return m.group(1)
+    id_uz = str(n.get("nauczyciel_id") or "")
+    return id_uz if id_uz.isdigit() else None
+
+
+def podziel(elementy: Iterable[Dict[str, Any]], shard: Optional[Shard],
+            klucz: Callable[[Dict[str, Any]], Any]) -> List[Dict[str, Any]]:
+    """Elementy należące do sharda; bez sharda (albo przy N=1) – wszystkie."""
+    if not shard or shard[1] == 1:
+        return list(elementy)
+    numer, liczba = shard
+    return [e for e in elementy if numer_sharda(klucz(e), liczba) == numer]
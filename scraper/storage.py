@@ -0,0 +1,321 @@
+import os
+import re
+import sqlite3
+import threading
+import uuid
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+# Magazyn danych: "supabase" (zdalnie, domyślnie) albo "sqlite" (lokalny plik, bez sieci)
+STORAGE = os.getenv("SCRAPER_STORAGE", "supabase")
+SQLITE_PATH = os.getenv("SCRAPER_SQLITE_PATH", os.path.join(".cache", "myuz.sqlite3"))
+SCHEMA_PATH = os.getenv(
+    "SCRAPER_SCHEMA_PATH", os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "database_schema.sql")
+)
+
+
+class StorageBackend:
+    """
+    Interfejs magazynu używany przez scraper.db – tylko operacje, których
+    potrzebuje scraper: select (z filtrem IN, warunkiem kolumna > wartość do
+    stronicowania po kluczu i limitem), upsert po kluczu unikalnym (opcjonalnie
+    zwracający zapisane wiersze z id), delete po kolumnie i liczenie wierszy.
+    Błędy zgłaszane są wyjątkami (całe wywołanie się nie udaje, jak w Postgres).
+    """
+
+    nazwa = ""
+    adres = ""  # identyfikuje konkretną bazę (np. dla pamięci podręcznej na dysku)
+
+    def select(self, table: str, kolumny: str = "*", in_: Optional[Tuple[str, Sequence]] = None,
+               order: Optional[str] = None, offset: int = 0, limit: Optional[int] = None,
+               po: Optional[Tuple[str, Any]] = None) -> List[Dict[str, Any]]:
+        raise NotImplementedError
+
+    def upsert(self, table: str, rows: List[Dict[str, Any]], on_conflict: str,
+               zwroc: bool = False) -> List[Dict[str, Any]]:
+        """zwroc=True: zwraca zapisane wiersze (z id), inaczej pustą listę."""
+        raise NotImplementedError
+
+    def delete(self, table: str, kolumna: str, wartosci: Sequence):
+        raise NotImplementedError
+
+    def policz(self, table: str) -> int:
+        raise NotImplementedError
+
+
+class SupabaseBackend(StorageBackend):
+    nazwa = "supabase"
+
+    def __init__(self, client):
+        self.client = client
+        self.adres = getattr(client, "supabase_url", "")
+
+    @classmethod
+    def z_env(cls) -> "SupabaseBackend":
+        from dotenv import load_dotenv
+        from supabase import create_client
+
+        load_dotenv()
+        return cls(create_client(os.getenv("SUPABASE_URL"), os.getenv("SUPABASE_SERVICE_ROLE_KEY")))
+
+    def select(self, table, kolumny="*", in_=None, order=None, offset=0, limit=None, po=None):
+        q = self.client.table(table).select(kolumny)
+        if in_:
+            q = q.in_(in_[0], list(in_[1]))
+        if po:
+            q = q.gt(po[0], po[1])
+        if order:
+            q = q.order(order)
+        if limit is not None:
+            q = q.range(offset, offset + limit - 1)
+        return q.execute().data
+
+    def upsert(self, table, rows, on_conflict, zwroc=False):
+        # returning=minimal: bez odsyłania całego batcha, gdy id nie są potrzebne
+        wynik = self.client.table(table).upsert(
+            rows, on_conflict=on_conflict, returning="representation" if zwroc else "minimal"
+        ).execute()
+        return (wynik.data or []) if zwroc else []
+
+    def delete(self, table, kolumna, wartosci):
+        self.client.table(table).delete().in_(kolumna, list(wartosci)).execute()
+
+    def policz(self, table):
+        wynik = self.client.table(table).select("count").execute()
+        return wynik.data[0]["count"] if wynik.data else 0
+
+
+# --- Sekcja: Schemat z database_schema.sql (dla SQLite) ---
+
+_TABELA_RE = re.compile(r"CREATE TABLE public\.(\w+) \((.*?)\n\);", re.S)
+_INDEKS_RE = re.compile(r"CREATE UNIQUE INDEX IF NOT EXISTS (\w+) ON public\.(\w+) USING btree \(([^)]+)\);")
+_KOLUMNA_RE = re.compile(r"^(\w+) ([\w ]+?(?:\((\d+)\))?)( NOT NULL| NULL)?( DEFAULT .+)?$")
+_FK_RE = re.compile(r"FOREIGN KEY \((\w+)\) REFERENCES (\w+)\((\w+)\)( ON DELETE CASCADE)?")
+_UNIQUE_RE = re.compile(r"UNIQUE \(([^)]+)\)")
+
+
+def _lista(tekst: str) -> Tuple[str, ...]:
+    return tuple(k.strip() for k in tekst.split(","))
+
+
+def wczytaj_schemat(path: str = SCHEMA_PATH) -> Dict[str, Dict[str, Any]]:
+    """
+    tabela → {"kolumny": {nazwa: (typ, max_dlugosc, not_null)}, "uuid_domyslne": [...],
+    "klucze_unikalne": [(kolumny,)], "klucze_obce": {kolumna: tabela}} – z pliku schematu Supabase.
+    """
+    with open(path, encoding="utf-8") as f:
+        sql = f.read()
+    schemat = {}
+    for nazwa, cialo in _TABELA_RE.findall(sql):
+        t = {"kolumny": {}, "uuid_domyslne": [], "klucze_unikalne": [], "klucze_obce": {}, "klucz_glowny": "id"}
+        for linia in cialo.split("\n"):
+            linia = linia.strip().rstrip(",")
+            if not linia:
+                continue
+            if linia.startswith("CONSTRAINT"):
+                if "PRIMARY KEY" in linia:
+                    t["klucz_glowny"] = re.search(r"PRIMARY KEY \((\w+)\)", linia).group(1)
+                elif (fk := _FK_RE.search(linia)):
+                    t["klucze_obce"][fk.group(1)] = fk.group(2)
+                elif (uq := _UNIQUE_RE.search(linia)):
+                    t["klucze_unikalne"].append(_lista(uq.group(1)))
+                continue
+            m = _KOLUMNA_RE.match(linia)
+            if not m:
+                continue
+            kol, typ, dlugosc, null, domyslne = m.groups()
+            t["kolumny"][kol] = (typ.split("(")[0].strip(), int(dlugosc) if dlugosc else None, null == " NOT NULL")
+            if domyslne and "uuid_generate" in domyslne:
+                t["uuid_domyslne"].append(kol)
+        schemat[nazwa] = t
+    for _, tabela, kolumny in _INDEKS_RE.findall(sql):
+        schemat[tabela]["klucze_unikalne"].append(_lista(kolumny))
+    return schemat
+
+
+def kolejnosc_tabel(schemat: Dict[str, Dict[str, Any]]) -> List[str]:
+    """Tabele w kolejności kluczy obcych (najpierw tabele, do których inne się odwołują)."""
+    wynik: List[str] = []
+    while len(wynik) < len(schemat):
+        for nazwa, t in schemat.items():
+            if nazwa not in wynik and all(cel in wynik or cel == nazwa for cel in t["klucze_obce"].values()):
+                wynik.append(nazwa)
+    return wynik
+
+
+def ddl_sqlite(schemat: Dict[str, Dict[str, Any]]) -> List[str]:
+    polecenia = []
+    for nazwa, t in schemat.items():
+        linie = []
+        for kol, (typ, dlugosc, not_null) in t["kolumny"].items():
+            linia = f"{kol} TEXT"
+            if not_null:
+                linia += " NOT NULL"
+            if kol == t["klucz_glowny"]:
+                linia += " PRIMARY KEY"
+            if dlugosc:
+                # character varying(n) – Postgres odrzuca dłuższe wartości
+                linia += f" CHECK (length({kol}) <= {dlugosc})"
+            linie.append(linia)
+        for kol, cel in t["klucze_obce"].items():
+            linie.append(f"FOREIGN KEY ({kol}) REFERENCES {cel}(id) ON DELETE CASCADE")
+        polecenia.append(f"CREATE TABLE IF NOT EXISTS {nazwa} (\n  " + ",\n  ".join(linie) + "\n)")
+        for i, klucz in enumerate(t["klucze_unikalne"]):
+            polecenia.append(f"CREATE UNIQUE INDEX IF NOT EXISTS uniq_{nazwa}_{i} ON {nazwa} ({', '.join(klucz)})")
+        for kol in t["klucze_obce"]:
+            polecenia.append(f"CREATE INDEX IF NOT EXISTS idx_{nazwa}_{kol} ON {nazwa} ({kol})")
+    return polecenia
+
+
+def timestamp_bez_strefy(wartosc: Any) -> Any:
+    """Jak Postgres dla timestamp without time zone: strefa jest pomijana, zapis "YYYY-MM-DDTHH:MM:SS"."""
+    if wartosc is None:
+        return None
+    tekst = str(wartosc).replace(" ", "T", 1)
+    if tekst.endswith("Z"):
+        tekst = tekst[:-1]
+    return datetime.fromisoformat(tekst).replace(tzinfo=None).isoformat(timespec="seconds")
+
+
+class SQLiteBackend(StorageBackend):
+    """
+    Lokalny magazyn w jednym pliku SQLite ze schematem z database_schema.sql:
+    te same klucze unikalne, NOT NULL, długości varchar, klucze obce z ON DELETE
+    CASCADE i semantyka upsertu PostgREST (on_conflict, cały batch albo nic,
+    błąd przy powtórzonym kluczu w jednym batchu).
+    """
+
+    nazwa = "sqlite"
+
+    def __init__(self, path: str = SQLITE_PATH, schema_path: str = SCHEMA_PATH):
+        self.path = path
+        self.adres = os.path.abspath(path)
+        self.schemat = wczytaj_schemat(schema_path)
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA foreign_keys = ON")
+        self._conn.execute("PRAGMA journal_mode = WAL")
+        self._conn.execute("PRAGMA synchronous = NORMAL")
+        for polecenie in ddl_sqlite(self.schemat):
+            self._conn.execute(polecenie)
+
+    def _kolumny(self, table: str, kolumny: str) -> List[str]:
+        wszystkie = list(self.schemat[table]["kolumny"])
+        if kolumny.strip() == "*":
+            return wszystkie
+        wybrane = list(_lista(kolumny))
+        nieznane = [k for k in wybrane if k not in wszystkie]
+        if nieznane:
+            raise ValueError(f"Nieznane kolumny {nieznane} w tabeli {table}")
+        return wybrane
+
+    def select(self, table, kolumny="*", in_=None, order=None, offset=0, limit=None, po=None):
+        kolumny = self._kolumny(table, kolumny)
+        sql = f"SELECT {', '.join(kolumny)} FROM {table}"
+        warunki, parametry = [], []
+        if in_:
+            wartosci = list(in_[1])
+            if not wartosci:
+                return []
+            warunki.append(f"{self._kolumny(table, in_[0])[0]} IN ({', '.join('?' * len(wartosci))})")
+            parametry += wartosci
+        if po:
+            warunki.append(f"{self._kolumny(table, po[0])[0]} > ?")
+            parametry.append(po[1])
+        if warunki:
+            sql += " WHERE " + " AND ".join(warunki)
+        if order:
+            sql += f" ORDER BY {self._kolumny(table, order)[0]}"
+        if limit is not None:
+            sql += " LIMIT ? OFFSET ?"
+            parametry += [limit, offset]
+        with self._lock:
+            return [dict(r) for r in self._conn.execute(sql, parametry)]
+
+    def upsert(self, table, rows, on_conflict, zwroc=False):
+        if not rows:
+            return []
+        t = self.schemat[table]
+        klucz = _lista(on_conflict)
+        if klucz not in t["klucze_unikalne"] and klucz != (t["klucz_glowny"],):
+            raise ValueError(f"Brak ograniczenia unikalności ({on_conflict}) w tabeli {table}")
+        kolumny = [k for k in t["kolumny"] if any(k in r for r in rows)]
+        nieznane = {k for r in rows for k in r} - set(t["kolumny"])
+        if nieznane:
+            raise ValueError(f"Nieznane kolumny {sorted(nieznane)} w tabeli {table}")
+        wiersze, klucze = [], set()
+        for r in rows:
+            wartosci = {k: r.get(k) for k in kolumny}
+            for kol, (typ, _, _) in t["kolumny"].items():
+                if typ.startswith("timestamp") and kol in wartosci:
+                    wartosci[kol] = timestamp_bez_strefy(wartosci[kol])
+            k = tuple(wartosci.get(c) for c in klucz)
+            if k in klucze:
+                raise ValueError("ON CONFLICT DO UPDATE command cannot affect row a second time")
+            klucze.add(k)
+            wiersze.append(wartosci)
+        wstawiane = kolumny + [k for k in t["uuid_domyslne"] if k not in kolumny]
+        aktualizowane = [k for k in kolumny if k not in klucz and k not in t["uuid_domyslne"]]
+        sql = (f"INSERT INTO {table} ({', '.join(wstawiane)}) VALUES ({', '.join('?' * len(wstawiane))}) "
+               f"ON CONFLICT ({', '.join(klucz)}) DO "
+               + (f"UPDATE SET {', '.join(f'{k} = excluded.{k}' for k in aktualizowane)}" if aktualizowane else "NOTHING"))
+        parametry = [
+            [w[k] if k in w else str(uuid.uuid4()) for k in wstawiane] for w in wiersze
+        ]
+        zwrocone = []
+        with self._lock:
+            try:
+                self._conn.execute("BEGIN")
+                if zwroc:
+                    for p in parametry:
+                        zwrocone.extend(dict(r) for r in self._conn.execute(sql + " RETURNING *", p))
+                else:
+                    self._conn.executemany(sql, parametry)
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return zwrocone
+
+    def delete(self, table, kolumna, wartosci):
+        wartosci = list(wartosci)
+        if not wartosci:
+            return
+        kolumna = self._kolumny(table, kolumna)[0]
+        with self._lock:
+            self._conn.execute(f"DELETE FROM {table} WHERE {kolumna} IN ({', '.join('?' * len(wartosci))})", wartosci)
+
+    def policz(self, table):
+        with self._lock:
+            return self._conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+
+
+def wszystkie_wiersze(backend: StorageBackend, table: str, kolumny: str = "*",
+                     in_: Optional[Tuple[str, Sequence]] = None, page: int = 1000) -> Iterator[Dict[str, Any]]:
+    """
+    Wszystkie wiersze tabeli stronami po page, stronicowanie po kluczu (id > ostatnie id),
+    bez przesunięć przy równoległych zmianach. Serwer może zwrócić mniej niż page
+    wierszy (max-rows w PostgREST), więc koniec to dopiero pusta strona.
+    """
+    if kolumny.strip() != "*" and "id" not in _lista(kolumny):
+        kolumny = "id, " + kolumny
+    ostatnie = None
+    while True:
+        strona = backend.select(table, kolumny, in_=in_, order="id", limit=page,
+                                po=("id", ostatnie) if ostatnie is not None else None)
+        if not strona:
+            return
+        yield from strona
+        ostatnie = strona[-1]["id"]
+
+
+def get_backend(nazwa: Optional[str] = None) -> StorageBackend:
+    nazwa = nazwa or STORAGE
+    if nazwa == "sqlite":
+        return SQLiteBackend()
+    if nazwa == "supabase":
+        return SupabaseBackend.z_env()
+    raise ValueError(f"Nieznany magazyn: {nazwa} (dostępne: supabase, sqlite)")
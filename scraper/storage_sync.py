@@ -0,0 +1,108 @@
+"""
+Przeniesienie danych z lokalnego magazynu (SQLite) do Supabase jednym krokiem.
+
+UUID-y w obu bazach są różne, więc wiersze dopasowywane są po kluczach
+unikalnych ze schematu (np. kierunki: nazwa+wydzial), a klucze obce
+tłumaczone z lokalnych id na zdalne. Zajęcia idą przez sync_zajecia
+(tylko zmiany + usuwanie nieaktualnych wierszy właścicieli obecnych lokalnie).
+
+Kilka źródeł (np. wyniki shardów --shard i/N) jest scalanych przed zapisem:
+wiersze o tym samym kluczu unikalnym łączone są w jeden, a puste pola
+uzupełniane z kolejnych źródeł (jak w save_nauczyciele).
+
+Użycie: SCRAPER_STORAGE=sqlite python -m scraper.main
+        python -m scraper.storage_sync [--sqlite PLIK ...] [--do-sqlite PLIK] [--bez-usuwania]
+"""
+import argparse
+import time
+from typing import Any, Dict, List, Optional, Sequence, Union
+
+from scraper.db import KOLUMNY_ZAJEC, sync_zajecia, upsert_wsadowo
+from scraper.storage import (SQLITE_PATH, SQLiteBackend, StorageBackend, SupabaseBackend,
+                             kolejnosc_tabel, wszystkie_wiersze)
+
+
+def synchronizuj(zrodlo: Union[StorageBackend, Sequence[StorageBackend]], cel: StorageBackend,
+                 usuwaj: bool = True, tabele: Optional[List[str]] = None) -> Dict[str, Dict[str, int]]:
+    """
+    Kopiuje tabele ze źródła (albo scalone z kilku źródeł) do celu w kolejności
+    kluczy obcych; zwraca statystyki per tabela.
+    """
+    zrodla = list(zrodlo) if isinstance(zrodlo, (list, tuple)) else [zrodlo]
+    schemat = zrodla[0].schemat
+    potrzebne_mapy = {cel_fk for t in schemat.values() for cel_fk in t["klucze_obce"].values()}
+    mapy_id: List[Dict[str, Dict[str, str]]] = [{} for _ in zrodla]  # per źródło: tabela → lokalne id → zdalne id
+    wyniki = {}
+    for table in kolejnosc_tabel(schemat):
+        t = schemat[table]
+        if tabele and table not in tabele and table not in potrzebne_mapy:
+            continue
+        start = time.perf_counter()
+        klucz = t["klucze_unikalne"][0]
+        scalone: Dict[tuple, Dict[str, Any]] = {}
+        lokalne_id: List[Dict[tuple, str]] = [{} for _ in zrodla]
+        pominiete = 0
+        for nr, z in enumerate(zrodla):
+            for row in wszystkie_wiersze(z, table):
+                row = dict(row)
+                for kol, tabela_fk in t["klucze_obce"].items():
+                    row[kol] = mapy_id[nr].get(tabela_fk, {}).get(row[kol])
+                if any(row[kol] is None for kol in t["klucze_obce"]):
+                    pominiete += 1
+                    continue
+                k = tuple(row[kol] for kol in klucz)
+                lokalne_id[nr][k] = row.pop("id")
+                for kol in t["uuid_domyslne"]:
+                    row.pop(kol, None)
+                istniejacy = scalone.setdefault(k, row)
+                if istniejacy is not row:
+                    for kol, wartosc in row.items():
+                        if istniejacy.get(kol) in (None, "") and wartosc not in (None, ""):
+                            istniejacy[kol] = wartosc
+        wiersze = list(scalone.values())
+
+        bledy: List[Dict[str, Any]] = []
+        if not tabele or table in tabele:
+            if table in KOLUMNY_ZAJEC and usuwaj:
+                kol_wlasciciela = KOLUMNY_ZAJEC[table][0]
+                stats = sync_zajecia(table, wiersze, {r[kol_wlasciciela] for r in wiersze},
+                                     bledy=bledy, verbose=False, backend=cel)
+            else:
+                zapisane = upsert_wsadowo(table, wiersze, ",".join(klucz), bledy=bledy, verbose=False, backend=cel)
+                stats = {"zapisane": zapisane, "bledy": len(bledy)}
+            stats["pominiete_bez_klucza_obcego"] = pominiete
+            wyniki[table] = stats
+            print(f"🔄 {table}: {len(wiersze)} wierszy lokalnie, {stats} ({time.perf_counter() - start:.1f} s)")
+
+        if table in potrzebne_mapy:
+            zdalne = wszystkie_wiersze(cel, table, ", ".join(("id",) + klucz))
+            zdalne_id = {tuple(r[k] for k in klucz): r["id"] for r in zdalne}
+            for nr in range(len(zrodla)):
+                mapy_id[nr][table] = {
+                    lokalne: zdalne_id[k] for k, lokalne in lokalne_id[nr].items() if k in zdalne_id
+                }
+    return wyniki
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Synchronizacja lokalnego SQLite → Supabase")
+    ap.add_argument("--sqlite", nargs="+", default=[SQLITE_PATH],
+                    help="Plik(i) lokalnego magazynu; kilka plików (np. shardów) jest scalanych")
+    ap.add_argument("--do-sqlite", help="Zapis do tego pliku SQLite zamiast do Supabase")
+    ap.add_argument("--bez-usuwania", action="store_true",
+                    help="Tylko upsert, bez usuwania nieaktualnych zajęć w Supabase")
+    ap.add_argument("--tabele", nargs="*", help="Tylko wybrane tabele (domyślnie wszystkie)")
+    args = ap.parse_args()
+
+    start = time.perf_counter()
+    cel = SQLiteBackend(args.do_sqlite) if args.do_sqlite else SupabaseBackend.z_env()
+    wyniki = synchronizuj([SQLiteBackend(p) for p in args.sqlite], cel,
+                          usuwaj=not args.bez_usuwania, tabele=args.tabele)
+    bledy = sum(s.get("bledy", 0) for s in wyniki.values())
+    print(f"✅ Synchronizacja zakończona w {time.perf_counter() - start:.1f} s, błędy: {bledy}")
+    if bledy:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+import os
+import re
+from functools import lru_cache
+from typing import NamedTuple, Optional
+
+# Rozmiar pamięci podręcznej rozkładu SUMMARY (te same opisy powtarzają się co tydzień)
+SUMMARY_CACHE_SIZE = int(os.getenv("SCRAPER_SUMMARY_CACHE", "8192"))
+
+_RZ_RE = re.compile(r"\((W|C|Ć|L|P|S|E|I|T|K|X|Z|Zp)\)")
+_PRZEDMIOT_RE = re.compile(r"^([^(]+)")
+_PG_RE = re.compile(r"\(PG:\s*([^)]+)\)")
+_GRUPY_RE = re.compile(r"\)\s*:\s*([^\n]+)")
+_GRUPA_RE = re.compile(r"^(.*?)\s*\([^\)]+\):\s*(.+?)(?:\s*\(PG:.*\))?$")
+_PG_USUN_RE = re.compile(r"\(PG:.*?\)")
+_GRUPY_NAUCZYCIELA_RE = re.compile(r":\s*([A-Za-z0-9\-/; ]+)")
+
+
+class Summary(NamedTuple):
+    """Składowe SUMMARY wydarzenia; pola, których dany format nie wyznacza, są None."""
+    przedmiot: str
+    rz: Optional[str]
+    nauczyciel: Optional[str]
+    podgrupa: Optional[str]
+    grupy: Optional[str]
+
+
+# --- Sekcja: Formaty SUMMARY ---
+
+def _plan(summary: str) -> Summary:
+    """Format ics_updater.parse_ics_file: "Przedmiot (RZ): Nauczyciel (PG: x)" lub "...: grupy"."""
+    rz_match = _RZ_RE.search(summary)
+    przedmiot = summary
+    match_przedmiot = _PRZEDMIOT_RE.match(summary)
+    if match_przedmiot:
+        przedmiot = match_przedmiot.group(1).strip()
+
+    nauczyciel = None
+    if ": " in summary:
+        nauczyciel = summary.split(": ", 1)[1].strip()
+    if nauczyciel and "(PG:" in nauczyciel:
+        nauczyciel = nauczyciel.split("(PG:")[0].strip()
+
+    podgrupa_match = _PG_RE.search(summary)
+    podgrupa = podgrupa_match.group(1).strip() if podgrupa_match else None
+
+    grupy = None
+    grupy_match = _GRUPY_RE.search(summary)
+    if grupy_match:
+        grupy = grupy_match.group(1).strip()
+    elif ": " in summary:
+        grupy = summary.split(": ", 1)[1].strip()
+
+    return Summary(przedmiot, rz_match.group(1) if rz_match else None, nauczyciel, podgrupa, grupy)
+
+
+def _grupa(summary: str) -> Summary:
+    """Format grupy_parser.parse_ics: przedmiot, nauczyciel i podgrupa."""
+    nauczyciel = None
+    match = _GRUPA_RE.search(summary)
+    if match:
+        przedmiot = match.group(1).strip()
+        nauczyciel = match.group(2).strip()
+    else:
+        przedmiot = summary.strip()
+    pg_match = _PG_RE.search(summary)
+    pg = pg_match.group(1).strip() if pg_match else None
+    if nauczyciel:
+        nauczyciel = _PG_USUN_RE.sub("", nauczyciel).strip()
+    return Summary(przedmiot, None, nauczyciel, pg, None)
+
+
+def _nauczyciel(summary: str) -> Summary:
+    """Format nauczyciel_scraper.parse_ics_for_nauczyciel: przedmiot i grupy."""
+    przedmiot = summary.split("(")[0].strip() if "(" in summary else summary.strip()
+    m = _GRUPY_NAUCZYCIELA_RE.search(summary)
+    return Summary(przedmiot, None, None, None, m.group(1).strip() if m else None)
+
+
+_FORMATY = {"plan": _plan, "grupa": _grupa, "nauczyciel": _nauczyciel}
+
+
+# --- Sekcja: Rozkład z pamięcią podręczną ---
+
+@lru_cache(maxsize=SUMMARY_CACHE_SIZE)
+def rozloz_summary(summary: str, format: str = "plan") -> Summary:
+    """
+    Rozkłada SUMMARY na przedmiot, rz, nauczyciela, podgrupę i grupy.
+    Wynik jest zapamiętywany (LRU) – ten sam opis wraca co tydzień semestru.
+    """
+    return _FORMATY[format](summary)
+
+
+def raport() -> str:
+    info = rozloz_summary.cache_info()
+    wywolania = info.hits + info.misses
+    trafienia = info.hits / wywolania * 100 if wywolania else 0.0
+    return (
+        f"🧩 SUMMARY: {wywolania} rozkładów, {info.misses} unikalnych, "
+        f"trafienia {trafienia:.1f}% (cache {info.currsize}/{info.maxsize})"
+    )
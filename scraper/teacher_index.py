@@ -0,0 +1,175 @@
+"""
+Plany nauczycieli wyprowadzane z planów grup (ETAP 5, tryb "z_grup").
+
+Każde zajęcia są w ICS jakiejś grupy, a wiersze zajecia_grupy mają nazwę
+prowadzącego. Indeks odwrotny: nauczyciel (link strony) → jego zajęcia, jedno
+wydarzenie na termin/przedmiot/salę, z polem grupy zebranym ze wszystkich grup,
+które je mają. UID-y ICS grup i nauczyciela są różne (każdy plik ma własne),
+więc wiersze wyprowadzone dostają stabilny UID z treści wydarzenia.
+
+Nazwa z SUMMARY musi wskazywać dokładnie jednego nauczyciela (nazwa linku ze
+strony grupy, kolumna nauczyciele.nazwa). Nauczyciele z niejednoznaczną nazwą
+albo występujący w nierozpoznanym opisie (np. kilku prowadzących) nie są
+pokryci – ich ICS jest pobierany jak dotąd. Zajęć bez grup (np. konsultacji)
+nie da się wyprowadzić; pokazuje je kontrola na próbce z prawdziwymi ICS,
+a ich wiersze już zapisane w bazie są zachowywane (zachowane_wiersze).
+"""
+import hashlib
+import os
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+# Tryb ETAPU 5: "pobieranie" (ICS każdego nauczyciela) albo "z_grup" (indeks z zajęć grup)
+ETAP5_TRYB = os.getenv("SCRAPER_ETAP5_TRYB", "pobieranie")
+# Odsetek pokrytych nauczycieli sprawdzanych z prawdziwym ICS (i najmniej tylu)
+PROBKA = float(os.getenv("SCRAPER_ETAP5_PROBKA", "0.02"))
+PROBKA_MIN = int(os.getenv("SCRAPER_ETAP5_PROBKA_MIN", "5"))
+# Odsetek niezgodnych w próbce, powyżej którego indeksowi się nie ufa – pokryci też idą do pobrania
+PROG = float(os.getenv("SCRAPER_ETAP5_PROG", "0.1"))
+
+KOLUMNY_GRUP = "grupa_id, od, do_, przedmiot, rz, miejsce, podgrupa, nauczyciel"
+KOLUMNY_NAUCZYCIELA = "uid, od, do_, przedmiot, rz, grupy, miejsce, nauczyciel_id, link_ics_zrodlowy"
+
+
+def normalizuj_nazwe(nazwa: Optional[str]) -> str:
+    return " ".join((nazwa or "").replace(",", " ").split()).casefold()
+
+
+def _czas(wartosc: Any) -> str:
+    # Jak kolumny timestamp without time zone: bez strefy, do sekund (ICS grup mają TZID, nauczyciela nie)
+    try:
+        return datetime.fromisoformat(str(wartosc)).replace(tzinfo=None).isoformat(timespec="seconds")
+    except ValueError:
+        return str(wartosc)
+
+
+def sygnatura(z: Dict[str, Any]) -> Tuple[str, ...]:
+    """Tożsamość wydarzenia niezależna od pliku źródłowego (UID-y ICS grup i nauczyciela się różnią)."""
+    return (_czas(z.get("od")), _czas(z.get("do_")), z.get("przedmiot") or "", z.get("rz") or "",
+            (z.get("miejsce") or "").strip())
+
+
+class IndeksNauczycieli:
+    """Indeks odwrotny zajęć grup: link strony nauczyciela → {sygnatura wydarzenia: wydarzenie}."""
+
+    def __init__(self, nauczyciele: Iterable[Dict[str, Any]]):
+        self._po_nazwie: Dict[str, Optional[str]] = {}
+        for n in nauczyciele:
+            nazwa, link = normalizuj_nazwe(n.get("nazwa")), n.get("link_strony_nauczyciela")
+            if not nazwa or not link:
+                continue
+            # Ta sama nazwa u dwóch nauczycieli – nie wiadomo, czyje to zajęcia
+            self._po_nazwie[nazwa] = link if self._po_nazwie.get(nazwa, link) == link else None
+        self.zdarzenia: Dict[str, Dict[Tuple[str, ...], Dict[str, Any]]] = {}
+        self.niepewni: Set[str] = set()
+        self._nierozpoznane: Set[str] = set()
+        self.stats = {"zajecia_grup": 0, "przypisane": 0, "bez_nauczyciela": 0, "nierozpoznane": 0}
+
+    def dodaj(self, z: Dict[str, Any], kod_grupy: Optional[str]):
+        """Jedno zajęcie grupy (wiersz zajecia_grupy albo wynik parse_ics_file)."""
+        self.stats["zajecia_grup"] += 1
+        nazwa = normalizuj_nazwe(z.get("nauczyciel"))
+        if not nazwa:
+            self.stats["bez_nauczyciela"] += 1
+            return
+        link = self._po_nazwie.get(nazwa)
+        if link is None:
+            self.stats["nierozpoznane"] += 1
+            self._nierozpoznane.add(nazwa)
+            return
+        self.stats["przypisane"] += 1
+        wydarzenia = self.zdarzenia.setdefault(link, {})
+        klucz = sygnatura(z) + (z.get("podgrupa") or "",)
+        w = wydarzenia.get(klucz)
+        if w is None:
+            w = wydarzenia[klucz] = {**z, "grupy": set()}
+        if kod_grupy:
+            w["grupy"].add(kod_grupy)
+
+    def zamknij(self):
+        """Po wszystkich zajęciach: nazwy nierozpoznane (kilku prowadzących, literówki) → nauczyciele niepewni."""
+        for opis in self._nierozpoznane:
+            for nazwa, link in self._po_nazwie.items():
+                if link and nazwa in opis:
+                    self.niepewni.add(link)
+
+    def pokryty(self, link: str) -> bool:
+        return link in self.zdarzenia and link not in self.niepewni
+
+    def wiersze(self, link: str, nauczyciel_uuid: str, link_ics: Optional[str]) -> List[Dict[str, Any]]:
+        """Zajęcia nauczyciela w formacie parse_ics_file (jak z jego ICS) z nauczyciel_id = UUID."""
+        wynik = []
+        for klucz, w in self.zdarzenia.get(link, {}).items():
+            grupy = ", ".join(sorted(w["grupy"])) or None
+            if grupy and w.get("podgrupa"):
+                grupy += f" (PG: {w['podgrupa']})"
+            uid = hashlib.sha1("|".join((link,) + klucz).encode("utf-8")).hexdigest()[:20]
+            wynik.append({
+                "przedmiot": w.get("przedmiot"),
+                "od": _czas(w.get("od")),
+                "do_": _czas(w.get("do_")),
+                "miejsce": w.get("miejsce"),
+                "rz": w.get("rz"),
+                "link_ics_zrodlowy": link_ics,
+                "podgrupa": w.get("podgrupa"),
+                "uid": f"{uid}@z-grup",
+                "nauczyciel": None,
+                "grupy": grupy,
+                "nauczyciel_id": nauczyciel_uuid,
+            })
+        return wynik
+
+    def raport(self) -> str:
+        s = self.stats
+        return (f"🧭 Indeks nauczycieli: {s['zajecia_grup']} zajęć grup, {s['przypisane']} przypisanych, "
+                f"{s['nierozpoznane']} z nierozpoznanym prowadzącym, {s['bez_nauczyciela']} bez prowadzącego; "
+                f"pokrytych nauczycieli {len(set(self.zdarzenia) - self.niepewni)}, niepewnych {len(self.niepewni)}")
+
+
+def zbuduj_indeks(backend, nauczyciele: List[Dict[str, Any]]) -> IndeksNauczycieli:
+    """Indeks z zajęć grup w bazie – pełny także wtedy, gdy ETAP 4 pominął niezmienione plany."""
+    from scraper.storage import wszystkie_wiersze
+
+    kody = {g["id"]: g.get("kod_grupy") for g in wszystkie_wiersze(backend, "grupy", "id, kod_grupy")}
+    indeks = IndeksNauczycieli(nauczyciele)
+    for z in wszystkie_wiersze(backend, "zajecia_grupy", KOLUMNY_GRUP):
+        indeks.dodaj(z, kody.get(z.get("grupa_id")))
+    indeks.zamknij()
+    return indeks
+
+
+def zachowane_wiersze(backend, wyprowadzone: List[Dict[str, Any]],
+                      nauczyciel_uuids: List[str]) -> List[Dict[str, Any]]:
+    """
+    Istniejące wiersze nauczycieli spoza wyprowadzonych wydarzeń (np. konsultacje z ICS) –
+    dołączone do planu z grup nie zostaną usunięte przez synchronizację. Wiersze "@z-grup",
+    których już nie ma w indeksie, są nieaktualne i nie są zachowywane.
+    """
+    from scraper.db import chunks
+    from scraper.storage import wszystkie_wiersze
+
+    znane = {(z["nauczyciel_id"], sygnatura(z)) for z in wyprowadzone}
+    wynik = []
+    for uuids in chunks(sorted(set(nauczyciel_uuids)), 100):
+        for row in wszystkie_wiersze(backend, "zajecia_nauczyciela", KOLUMNY_NAUCZYCIELA,
+                                     in_=("nauczyciel_id", uuids)):
+            if not str(row["uid"]).endswith("@z-grup") and (row["nauczyciel_id"], sygnatura(row)) not in znane:
+                wynik.append(row)
+    return wynik
+
+
+def porownaj(wyprowadzone: List[Dict[str, Any]], pobrane: List[Dict[str, Any]]) -> Dict[str, int]:
+    """Kontrola spójności: wydarzenia wyprowadzone vs z prawdziwego ICS nauczyciela (po sygnaturze)."""
+    a = {sygnatura(z): z.get("grupy") for z in wyprowadzone}
+    b = {sygnatura(z): z.get("grupy") for z in pobrane}
+    wspolne = a.keys() & b.keys()
+    return {
+        "zgodne": len(wspolne),
+        "brakujace": len(b.keys() - a.keys()),
+        "nadmiarowe": len(a.keys() - b.keys()),
+        "inne_grupy": sum(1 for k in wspolne if _zbior_grup(a[k]) != _zbior_grup(b[k])),
+    }
+
+
+def _zbior_grup(grupy: Optional[str]) -> Set[str]:
+    return {g.strip() for g in (grupy or "").split("(PG:")[0].split(",") if g.strip()}
@@ -1,29 +1,11 @@
 import argparse
 import re
-from concurrent.futures import ThreadPoolExecutor, as_completed
-
-from scraper.scrapers.kierunki_scraper import scrape_kierunki
-from scraper.scrapers.grupy_scraper import scrape_grupy_for_kierunki
-from scraper.parsers.nauczyciel_parser import (
-    parse_nauczyciele_from_group_page,
-    parse_nauczyciel_details,
-    fetch_page,
-)
-from scraper.db import (
-    save_kierunki,
-    save_grupy,
-    save_nauczyciele,
-    save_zajecia_grupy,
-    save_zajecia_nauczyciela,
-    get_uuid_map,
-    supabase,
-)
-from scraper.downloader import download_ics_for_groups_async
-from scraper.ics_updater import pobierz_plan_ics_nauczyciela, parse_ics_file
 
 
 def test_kierunki(args):
     print("Test ETAP 1: Pobieranie kierunków studiów...")
+    from scraper.scrapers.kierunki_scraper import scrape_kierunki
+    from scraper.db import save_kierunki, get_storage
     kierunki = scrape_kierunki()
     print(f"Pobrano {len(kierunki)} kierunków")
     if args.verbose:
@@ -32,17 +14,18 @@ def test_kierunki(args):
     if args.save:
         saved = save_kierunki(kierunki)
         print(f"Zapisano {saved} kierunków do bazy")
-        result = supabase.table('kierunki').select('count').execute()
-        count = result.data[0]['count'] if result.data else 0
+        count = get_storage().policz('kierunki')
         print(f"W bazie znajduje się {count} kierunków")
 
 
 def test_grupy(args):
     print("Test ETAP 2: Pobieranie grup dla kierunków...")
+    from scraper.scrapers.kierunki_scraper import scrape_kierunki
+    from scraper.scrapers.grupy_scraper import scrape_grupy_for_kierunki
+    from scraper.db import save_grupy, get_uuid_map, get_storage
     if args.from_db:
         print("Pobieranie kierunków z bazy danych...")
-        result = supabase.table('kierunki').select('*').execute()
-        kierunki = result.data
+        kierunki = get_storage().select('kierunki')
         print(f"Pobrano {len(kierunki)} kierunków z bazy")
     else:
         print("Pobieranie kierunków z UZ...")
@@ -106,55 +89,33 @@ def test_grupy(args):
         print(f"Zapisano {saved} grup do bazy")
 
         # Sprawdź stan bazy
-        result = supabase.table('grupy').select('count').execute()
-        count = result.data[0]['count'] if result.data else 0
+        count = get_storage().policz('grupy')
         print(f"W bazie znajduje się {count} grup")
 
 
 def test_nauczyciele(args):
     print("Test ETAP 3: Pobieranie nauczycieli z planów grup...")
+    from scraper.crawler import crawl_nauczyciele, crawl_nauczyciele_serial
+    from scraper.db import save_nauczyciele, get_storage
+    from scraper.shards import podziel, klucz_grupy
 
     if args.from_db:
         print("Pobieranie grup z bazy danych...")
-        if args.limit:
-            result = supabase.table('grupy').select('*').limit(args.limit).execute()
-        else:
-            result = supabase.table('grupy').select('*').execute()
-        grupy = result.data
+        grupy = get_storage().select('grupy', limit=args.limit)
         print(f"Pobrano {len(grupy)} grup z bazy")
     else:
+        from scraper.scrapers.kierunki_scraper import scrape_kierunki
+        from scraper.scrapers.grupy_scraper import scrape_grupy_for_kierunki
         print("Pobieranie grup z UZ...")
         kierunki = scrape_kierunki()
         grupy = scrape_grupy_for_kierunki(kierunki)[:args.limit or 10]
         print(f"Pobrano {len(grupy)} grup z UZ (z limitem {args.limit or 10})")
 
-    nauczyciele_dict = {}
-
-    def process_grupa(grupa):
-        print(f"Przetwarzanie grupy: {grupa.get('kod_grupy') or grupa.get('grupa_id')}")
-        html = fetch_page(grupa.get("link_strony_grupy"))
-        nauczyciele = parse_nauczyciele_from_group_page(html, grupa_id=grupa.get("grupa_id"))
-        print(f" Znaleziono {len(nauczyciele)} nauczycieli")
-        for n in nauczyciele:
-            link = n.get("link")
-            if link and link not in nauczyciele_dict:
-                print(f" Pobieranie szczegółów nauczyciela: {n.get('nazwa')}")
-                html_n = fetch_page(link)
-                details = parse_nauczyciel_details(html_n, n.get("nauczyciel_id")) if html_n else {}
-                nauczyciele_dict[link] = {
-                    "nazwa": n.get("nazwa"),
-                    "instytut": details.get("instytut"),
-                    "email": details.get("email"),
-                    "link_strony_nauczyciela": link,
-                    "link_ics_nauczyciela": details.get("link_ics_nauczyciela"),
-                    "nauczyciel_id": n.get("nauczyciel_id"),
-                }
-
-    # Ustaw liczbę workerów na 32 dla szybszego przetwarzania
-    with ThreadPoolExecutor(max_workers=32) as executor:
-        list(executor.map(process_grupa, grupy))
-
-    nauczyciele_final = list(nauczyciele_dict.values())
+    grupy = podziel(grupy, args.shard, klucz_grupy)
+    if args.serial:
+        nauczyciele_final = crawl_nauczyciele_serial(grupy)
+    else:
+        nauczyciele_final = crawl_nauczyciele(grupy)
     print(f"Znaleziono {len(nauczyciele_final)} unikalnych nauczycieli")
     if args.verbose:
         for i, n in enumerate(nauczyciele_final[:5]):
@@ -162,28 +123,31 @@ def test_nauczyciele(args):
     if args.save:
         saved = save_nauczyciele(nauczyciele_final)
         print(f"Zapisano {saved} nauczycieli do bazy")
-        result = supabase.table('nauczyciele').select('count').execute()
-        count = result.data[0]['count'] if result.data else 0
+        count = get_storage().policz('nauczyciele')
         print(f"W bazie znajduje się {count} nauczycieli")
 
 
 def test_zajecia_grupy(args):
     print("Test ETAP 4: Pobieranie i zapisywanie zajęć grup...")
+    from scraper.db import save_zajecia_grupy, get_uuid_map, get_storage
+    from scraper.downloader import download_ics_for_groups_async
+    from scraper.ics_updater import parse_ics_file
+    from scraper.shards import podziel, klucz_grupy
     if args.from_db:
         print("Pobieranie grup z bazy danych...")
-        result = supabase.table('grupy').select('*').limit(args.limit or 10).execute()
-        grupy = result.data
+        grupy = get_storage().select('grupy', limit=args.limit or 10)
         print(f"Pobrano {len(grupy)} grup z bazy")
-        wszystkie_id_grup = [g.get("grupa_id") for g in grupy if g.get("grupa_id")]
         grupa_map = {g.get("grupa_id"): g for g in grupy if g.get("grupa_id")}
     else:
+        from scraper.scrapers.kierunki_scraper import scrape_kierunki
+        from scraper.scrapers.grupy_scraper import scrape_grupy_for_kierunki
         print("Pobieranie grup z UZ...")
         kierunki = scrape_kierunki()
         grupy = scrape_grupy_for_kierunki(kierunki)[:args.limit or 10]
         print(f"Pobrano {len(grupy)} grup z UZ (z limitem {args.limit or 10})")
-        wszystkie_id_grup = [g.get("grupa_id") for g in grupy if g.get("grupa_id")]
         grupa_map = {g.get("grupa_id"): g for g in grupy if g.get("grupa_id")}
 
+    wszystkie_id_grup = [g.get("grupa_id") for g in podziel(grupy, args.shard, klucz_grupy) if g.get("grupa_id")]
     print(f"Pobieranie ICS dla {len(wszystkie_id_grup)} grup...")
     wyniki = download_ics_for_groups_async(wszystkie_id_grup)
     wszystkie_zajecia_grupy = []
@@ -211,42 +175,30 @@ def test_zajecia_grupy(args):
         print(f"Pobrano {len(grupa_uuid_map)} mapowań UUID grup")
         saved = save_zajecia_grupy(wszystkie_zajecia_grupy, grupa_uuid_map)
         print(f"Zapisano {saved} zajęć grup do bazy")
-        result = supabase.table('zajecia_grupy').select('count').execute()
-        count = result.data[0]['count'] if result.data else 0
+        count = get_storage().policz('zajecia_grupy')
         print(f"W bazie znajduje się {count} zajęć grup")
 
 
 def test_zajecia_nauczycieli(args):
     print("Test ETAP 5: Pobieranie i zapisywanie zajęć nauczycieli...")
+    from scraper.db import save_zajecia_nauczyciela, get_uuid_map, get_storage
+    from scraper.ics_updater import pobierz_plan_ics_nauczyciela, parse_ics_file
+    from scraper.shards import podziel, klucz_nauczyciela
     if args.from_db:
         print("Pobieranie nauczycieli z bazy danych...")
-        result = supabase.table('nauczyciele').select('*').limit(args.limit or 10).execute()
-        nauczyciele = result.data
+        nauczyciele = get_storage().select('nauczyciele', limit=args.limit or 10)
         print(f"Pobrano {len(nauczyciele)} nauczycieli z bazy")
     else:
+        from scraper.scrapers.kierunki_scraper import scrape_kierunki
+        from scraper.scrapers.grupy_scraper import scrape_grupy_for_kierunki
+        from scraper.crawler import crawl_nauczyciele
         print("Pobieranie nauczycieli z UZ...")
         kierunki = scrape_kierunki()
         grupy = scrape_grupy_for_kierunki(kierunki)[:args.limit or 20]
-        nauczyciele_dict = {}
-        for grupa in grupy:
-            html = fetch_page(grupa.get("link_strony_grupy"))
-            nauczyciele = parse_nauczyciele_from_group_page(html, grupa_id=grupa.get("grupa_id"))
-            for n in nauczyciele:
-                link = n.get("link")
-                if link and link not in nauczyciele_dict:
-                    html_n = fetch_page(link)
-                    details = parse_nauczyciel_details(html_n, n.get("nauczyciel_id")) if html_n else {}
-                    nauczyciele_dict[link] = {
-                        "nazwa": n.get("nazwa"),
-                        "instytut": details.get("instytut"),
-                        "email": details.get("email"),
-                        "link_strony_nauczyciela": link,
-                        "link_ics_nauczyciela": details.get("link_ics_nauczyciela"),
-                        "nauczyciel_id": n.get("nauczyciel_id"),
-                    }
-        nauczyciele = list(nauczyciele_dict.values())[:args.limit or 10]
+        nauczyciele = crawl_nauczyciele(grupy)[:args.limit or 10]
         print(f"Pobrano {len(nauczyciele)} nauczycieli z UZ (z limitem {args.limit or 10})")
 
+    nauczyciele = podziel(nauczyciele, args.shard, klucz_nauczyciela)
     nauczyciel_uuid_map = get_uuid_map("nauczyciele", "link_strony_nauczyciela", "id")
     print(f"Pobrano {len(nauczyciel_uuid_map)} mapowań UUID nauczycieli")
     wszystkie_zajecia_nauczyciela = []
@@ -290,12 +242,13 @@ def test_zajecia_nauczycieli(args):
     if args.save:
         saved = save_zajecia_nauczyciela(wszystkie_zajecia_nauczyciela, nauczyciel_uuid_map)
         print(f"Zapisano {saved} zajęć nauczycieli do bazy")
-        result = supabase.table('zajecia_nauczyciela').select('count').execute()
-        count = result.data[0]['count'] if result.data else 0
+        count = get_storage().policz('zajecia_nauczyciela')
         print(f"W bazie znajduje się {count} zajęć nauczycieli")
 
 
 def main():
+    from scraper.shards import parse_shard
+
     parser = argparse.ArgumentParser(description='Tester poszczególnych etapów scrapera')
     parser.add_argument('etap', choices=['kierunki', 'grupy', 'nauczyciele', 'zajecia_grupy', 'zajecia_nauczycieli'],
                         help='Etap do przetestowania')
@@ -303,6 +256,11 @@ def main():
     parser.add_argument('--from-db', action='store_true', help='Pobierz dane z bazy zamiast scrapować')
     parser.add_argument('--verbose', action='store_true', help='Wyświetl więcej informacji')
     parser.add_argument('--limit', type=int, help='Limit liczby rekordów')
+    parser.add_argument('--serial', action='store_true',
+                        help='ETAP 3: szeregowa pętla zamiast crawlera asyncio (do porównań)')
+    parser.add_argument('--shard', type=parse_shard, metavar='i/N',
+                        help='Etapy nauczyciele/zajecia_grupy/zajecia_nauczycieli: tylko część grup lub nauczycieli '
+                             '(stabilny hash grupa_id / id nauczyciela)')
     args = parser.parse_args()
 
     if args.etap == 'kierunki':
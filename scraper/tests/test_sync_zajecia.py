@@ -0,0 +1,95 @@
+"""
+Synchronizacja zajęć (db.sync_zajecia) na SQLiteBackend w pliku tymczasowym:
+podział na dodane / zmienione / usunięte / bez zmian i zgłaszanie błędów usuwania.
+
+Uruchomienie z katalogu repozytorium: python -m pytest scraper/tests
+"""
+import os
+import tempfile
+import unittest
+
+from scraper.db import sync_zajecia
+from scraper.storage import SQLiteBackend
+
+
+class _BlednyDelete(SQLiteBackend):
+    """Magazyn odrzucający każde usunięcie (błąd danych, nie przejściowy – bez ponowień)."""
+
+    def delete(self, table, kolumna, wartosci):
+        raise ValueError("delete odrzucony")
+
+
+def _zajecia(grupa, uid, przedmiot="Analiza", od="2025-03-03T08:00:00"):
+    return {
+        "grupa_id": grupa, "uid": uid, "przedmiot": przedmiot, "od": od, "do_": "2025-03-03T09:30:00",
+        "rz": "W", "podgrupa": None, "nauczyciel": "dr Jan Kowalski", "miejsce": "A-29 s. 1",
+        "link_ics_zrodlowy": f"https://plan.uz.zgora.pl/grupy_ics.php?ID={grupa[:4]}&KIND=GG",
+    }
+
+
+class SyncZajeciaTest(unittest.TestCase):
+    def setUp(self):
+        self.katalog = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.katalog.name, "sync.sqlite3")
+        self.backend = SQLiteBackend(self.path)
+        kierunek = self.backend.upsert("kierunki", [{"nazwa": "Informatyka", "wydzial": "WIEA"}],
+                                       "nazwa,wydzial", zwroc=True)[0]["id"]
+        grupy = self.backend.upsert("grupy", [
+            {"kod_grupy": kod, "kierunek_id": kierunek, "tryb_studiow": "stacjonarne", "grupa_id": kod[-1]}
+            for kod in ("21INF-SP1", "21INF-SP2")
+        ], "kod_grupy,kierunek_id", zwroc=True)
+        id_grupy = {g["kod_grupy"]: g["id"] for g in grupy}
+        self.g1, self.g2 = id_grupy["21INF-SP1"], id_grupy["21INF-SP2"]
+        stan = [_zajecia(self.g1, "a"), _zajecia(self.g1, "b"), _zajecia(self.g2, "c")]
+        self.assertEqual(sync_zajecia("zajecia_grupy", stan, {self.g1, self.g2}, verbose=False,
+                                      backend=self.backend)["dodane"], 3)
+
+    def tearDown(self):
+        self.backend._conn.close()
+        self.katalog.cleanup()
+
+    def _uid(self, grupa, backend=None):
+        return {r["uid"]: r for r in (backend or self.backend).select("zajecia_grupy", in_=("grupa_id", [grupa]))}
+
+    def test_zmieniony_wiersz_jest_zapisywany_a_niezmieniony_pomijany(self):
+        nowe = [_zajecia(self.g1, "a", przedmiot="Algebra"), _zajecia(self.g1, "b")]
+        stats = sync_zajecia("zajecia_grupy", nowe, {self.g1}, verbose=False, backend=self.backend)
+        self.assertEqual((stats["dodane"], stats["zmienione"], stats["bez_zmian"], stats["usuniete"]), (0, 1, 1, 0))
+        self.assertEqual(self._uid(self.g1)["a"]["przedmiot"], "Algebra")
+
+    def test_usuniety_wiersz_znika_tylko_u_wlasciciela(self):
+        stats = sync_zajecia("zajecia_grupy", [_zajecia(self.g1, "a")], {self.g1}, verbose=False,
+                             backend=self.backend)
+        self.assertEqual((stats["usuniete"], stats["bez_zmian"], stats["bledy"]), (1, 1, 0))
+        self.assertEqual(set(self._uid(self.g1)), {"a"})
+        self.assertEqual(set(self._uid(self.g2)), {"c"})
+
+    def test_pusty_plan_usuwa_wszystkie_zajecia_wlasciciela(self):
+        stats = sync_zajecia("zajecia_grupy", [], {self.g1}, verbose=False, backend=self.backend)
+        self.assertEqual(stats["usuniete"], 2)
+        self.assertEqual(self._uid(self.g1), {})
+        self.assertEqual(set(self._uid(self.g2)), {"c"})
+
+    def test_wiersze_bez_kompletnego_planu_nie_sa_usuwane(self):
+        stats = sync_zajecia("zajecia_grupy", [_zajecia(self.g1, "d")], set(), verbose=False, backend=self.backend)
+        self.assertEqual((stats["dodane"], stats["usuniete"]), (1, 0))
+        self.assertEqual(set(self._uid(self.g1)), {"a", "b", "d"})
+
+    def test_nieudane_usuniecie_jest_zgloszone_z_id_wlascicielem_i_zrodlem(self):
+        self.backend._conn.close()
+        backend = _BlednyDelete(self.path)
+        self.backend = backend
+        b = self._uid(self.g1)["b"]
+        bledy = []
+        stats = sync_zajecia("zajecia_grupy", [_zajecia(self.g1, "a")], {self.g1}, bledy=bledy, verbose=False,
+                             backend=backend)
+        self.assertEqual((stats["usuniete"], stats["bledy"]), (0, 1))
+        self.assertEqual(len(bledy), 1)
+        self.assertEqual({k: bledy[0][k] for k in ("id", "grupa_id", "uid", "link_ics_zrodlowy")},
+                         {"id": b["id"], "grupa_id": self.g1, "uid": "b", "link_ics_zrodlowy": b["link_ics_zrodlowy"]})
+        self.assertIn("delete odrzucony", bledy[0]["blad"])
+        self.assertIn("b", self._uid(self.g1))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,7 +1,9 @@
-import requests
 import datetime
 import time
 
+from scraper.http_client import get_client
+from scraper.metrics import get_metryki
+
 
 def sanitize_string(text: str) -> str:
     """
@@ -16,17 +18,20 @@ def sanitize_string(text: str) -> str:
 def fetch_page(url: str, max_retries: int = 3, sleep_time: float = 2) -> str:
     """
     Pobiera zawartość strony HTML z obsługą błędów i automatycznymi retry.
+    Korzysta z dyskowego cache (zapytania warunkowe ETag/Last-Modified).
     """
     for attempt in range(max_retries):
         try:
-            response = requests.get(url, timeout=15)
+            response = get_client().get(url, timeout=15, use_cache=True)
             response.raise_for_status()
             return response.text
         except Exception as e:
             print(f"❌ Błąd pobierania strony: {url} — {e}")
             if attempt < max_retries - 1:
+                get_metryki().licz("ponowienia", zrodlo="strona")
                 time.sleep(sleep_time)
     # Wszystkie próby się nie powiodły:
+    get_metryki().licz("nieudane", zrodlo="strona")
     return None
 
 
@@ -0,0 +1,73 @@
+import json
+import os
+import threading
+import time
+
+# Warianty adresu ICS grupy w kolejności domyślnej (letni, zimowy, bez parametru s)
+WARIANTY = ["&s=0", "&s=1", ""]
+
+VARIANTS_PATH = os.getenv("SCRAPER_VARIANTS_PATH", os.path.join(".cache", "ics_variants.json"))
+# Co ile dni wykonywać pełne sondowanie w kolejności domyślnej (wykrycie zmiany semestru)
+REPROBE_DAYS = float(os.getenv("SCRAPER_VARIANTS_REPROBE_DAYS", "7"))
+
+
+class VariantStore:
+    """
+    Zapamiętuje, który wariant URL-a ICS (&s=0, &s=1, bez s) zadziałał dla każdej
+    grupy i globalnie, żeby w kolejnych przebiegach zaczynać od najbardziej
+    prawdopodobnego. Co REPROBE_DAYS dni przebieg wraca do kolejności domyślnej.
+    """
+
+    def __init__(self, path: str = VARIANTS_PATH, reprobe_days: float = REPROBE_DAYS):
+        self.path = path
+        self._lock = threading.Lock()
+        self.grupy: dict[str, str] = {}
+        self.globalnie: dict[str, float] = {}
+        self.ostatnie_pelne = 0.0
+        self._load()
+        self.pelne_sondowanie = time.time() - self.ostatnie_pelne > reprobe_days * 86400
+        self._biezace: dict[str, int] = {}
+
+    def _load(self):
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                dane = json.load(f)
+        except (OSError, ValueError):
+            return
+        self.grupy = dane.get("grupy", {})
+        self.globalnie = dane.get("globalnie", {})
+        self.ostatnie_pelne = dane.get("ostatnie_pelne", 0.0)
+
+    def kolejnosc(self, grupa_id: str) -> list[str]:
+        """Warianty do sprawdzenia dla grupy, od najbardziej prawdopodobnego."""
+        if self.pelne_sondowanie:
+            return list(WARIANTY)
+        ranking = sorted(WARIANTY, key=lambda w: (-self.globalnie.get(w, 0), WARIANTY.index(w)))
+        znany = self.grupy.get(str(grupa_id))
+        if znany in WARIANTY:
+            ranking.remove(znany)
+            ranking.insert(0, znany)
+        return ranking
+
+    def zapisz_wynik(self, grupa_id: str, wariant: str):
+        with self._lock:
+            self.grupy[str(grupa_id)] = wariant
+            self._biezace[wariant] = self._biezace.get(wariant, 0) + 1
+
+    def save(self):
+        """Utrwala wyniki przebiegu (statystyki globalne z wygaszaniem starszych przebiegów)."""
+        with self._lock:
+            for w in WARIANTY:
+                self.globalnie[w] = self.globalnie.get(w, 0) * 0.5 + self._biezace.get(w, 0)
+            if self.pelne_sondowanie:
+                self.ostatnie_pelne = time.time()
+            self._biezace = {}
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            tmp = self.path + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump({
+                    "grupy": self.grupy,
+                    "globalnie": self.globalnie,
+                    "ostatnie_pelne": self.ostatnie_pelne,
+                }, f)
+            os.replace(tmp, self.path)